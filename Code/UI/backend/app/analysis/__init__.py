@@ -0,0 +1,43 @@
+"""
+Signal analysis of stored measurements.
+
+This package contains the streaming Welch power spectral density estimator
+and the service that feeds it raw measurements from the database and
+caches the spectra of test segments, the background job that builds the
+spectrogram tile pyramids of finished tests, the wash-cycle phase
+detection that proposes test segments, the background job that
+precomputes the statistics of test segments, and the comparison of
+several tests of one machine type.
+"""
+
+from .comparison import ALIGNMENTS, compare_tests
+from .jobs import queue_spectrogram, requeue_spectrograms, spectrogram_worker, submit_spectrogram_jobs
+from .phases import PHASES
+from .segment_stats import (
+    get_segment_statistics,
+    get_test_segment_statistics,
+    requeue_segment_stats,
+    segment_stats_worker,
+)
+from .segmentation import detect_test_phases
+from .service import compute_spectrum, get_segment_spectrum
+from .spectrum import SPECTRUM_WINDOWS, WelchAccumulator
+
+__all__ = [
+    "ALIGNMENTS",
+    "compare_tests",
+    "queue_spectrogram",
+    "requeue_spectrograms",
+    "spectrogram_worker",
+    "submit_spectrogram_jobs",
+    "get_segment_statistics",
+    "get_test_segment_statistics",
+    "requeue_segment_stats",
+    "segment_stats_worker",
+    "detect_test_phases",
+    "compute_spectrum",
+    "get_segment_spectrum",
+    "PHASES",
+    "SPECTRUM_WINDOWS",
+    "WelchAccumulator"
+]
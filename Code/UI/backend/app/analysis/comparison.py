@@ -0,0 +1,248 @@
+"""
+Comparison of several tests of one machine type.
+
+The tests are aligned either on the start of their data or on the start of
+a wash-cycle phase (the n-th segment with that phase, see
+segmentation.py), cut to a common relative window and read from the 10s
+aggregate tier - avg_abs_value, like the phase detection - a few tests at
+a time in parallel. The series are overlaid on one grid of at most
+`points` bins per sensor type and channel, with the median and the 5th -
+95th percentile envelope across tests (see overlay.py, computed in the
+shared process pool).
+
+Results are cached in metadata.comparison_cache, keyed by the tests and
+the alignment and stamped with the alignment origins and the measurement
+data version of every test, so a comparison is only recomputed after new
+data, crops, deletes or edited segments. Identical requests that arrive
+while a comparison is being computed wait for it.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+from datetime import timedelta
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import orjson
+
+import database.analysis as analysis_db
+import database.measurements as measurements_db
+from app.core.process_pool import get_process_pool
+from app.core.serialization import DEFAULT_CHANNEL, dumps
+from database import get_test_relations
+from database import test_segments as segments_db
+from .overlay import overlay_envelope
+
+logger = logging.getLogger(__name__)
+
+ALIGNMENTS = ("start", "phase")
+
+# Bucket width of timeseries.measurements_avg_10s
+AGG_BUCKET_SECONDS = 10
+
+# Tests read from the database at the same time
+COMPARISON_CONCURRENCY = int(os.getenv("COMPARISON_CONCURRENCY", 4))
+
+# Cached comparisons not requested for this long are pruned
+COMPARISON_CACHE_MAX_AGE = timedelta(days=int(os.getenv("COMPARISON_CACHE_DAYS", 7)))
+
+_in_flight: Dict[Tuple[str, str], asyncio.Task] = {}
+
+
+async def _gather_limited(calls) -> List:
+    """Await the coroutines with at most COMPARISON_CONCURRENCY running at a time, keeping their order."""
+    semaphore = asyncio.Semaphore(COMPARISON_CONCURRENCY)
+
+    async def run(call):
+        async with semaphore:
+            return await call
+
+    return await asyncio.gather(*(run(call) for call in calls))
+
+
+async def _test_origin(test: Dict, align: str, phase: Optional[str], occurrence: int) -> Dict:
+    """Relations, data bounds and alignment origin of one test."""
+    relations = await get_test_relations(test["id"])
+    bounds = await measurements_db.get_measurement_avg_time_bounds([r["id"] for r in relations])
+    if bounds is None:
+        raise ValueError(f"Test '{test['test_name']}' has no aggregated measurements")
+
+    anchor = None
+    if align == "phase":
+        matches = [s for s in await segments_db.get_segments_by_test_id(test["id"]) if s["phase"] == phase]
+        if len(matches) < occurrence:
+            raise ValueError(
+                f"Test '{test['test_name']}' has {len(matches)} '{phase}' segment(s), occurrence {occurrence} requested"
+            )
+        anchor = matches[occurrence - 1]
+
+    return {
+        "test": test,
+        "relations": relations,
+        "origin": anchor["start_time"] if anchor else bounds["start_time"],
+        "anchor": anchor,
+        "end_time": bounds["end_time"],
+    }
+
+
+def _default_duration(origins: List[Dict]) -> float:
+    """The longest aligned phase, or the longest test from its origin on."""
+    if origins[0]["anchor"] is not None:
+        return max((o["anchor"]["end_time"] - o["anchor"]["start_time"]).total_seconds() for o in origins)
+    return max((o["end_time"] - o["origin"]).total_seconds() for o in origins) + AGG_BUCKET_SECONDS
+
+
+async def _fetch_groups(windows: List[Dict]) -> Tuple[Dict[str, List], Dict[str, Dict]]:
+    """Read the aggregated series of every test and group them by sensor type and channel."""
+    rows_per_test = await _gather_limited(
+        measurements_db.fetch_measurement_avg_series([r["id"] for r in w["relations"]], w["start_time"], w["end_time"])
+        for w in windows
+    )
+
+    groups: Dict[str, List] = {}
+    labels: Dict[str, Dict] = {}
+    for test_index, (window, rows) in enumerate(zip(windows, rows_per_test)):
+        relations = {r["id"]: r for r in window["relations"]}
+        window_start = window["start_time"].timestamp()
+        for row in rows:
+            relation = relations[row["test_relation_id"]]
+            channel = row["measurement_channel"] or DEFAULT_CHANNEL
+            key = f"{relation['sensor_type_name']}/{channel}"
+            labels.setdefault(key, {
+                "sensor_type_name": relation["sensor_type_name"],
+                "sensor_type_unit": relation["sensor_type_unit"],
+                "channel": channel,
+            })
+            groups.setdefault(key, []).append((
+                test_index,
+                np.array(row["timestamps"]) - window_start,
+                np.array(row["values"], dtype=float),
+            ))
+    return groups, labels
+
+
+async def _compute_comparison(windows: List[Dict], params: Dict, params_key: str, data_key: Optional[str]) -> Dict:
+    bucket_seconds = max(
+        AGG_BUCKET_SECONDS,
+        math.ceil(params["duration_seconds"] / params["points"] / AGG_BUCKET_SECONDS) * AGG_BUCKET_SECONDS,
+    )
+    bins = max(1, math.ceil(params["duration_seconds"] / bucket_seconds))
+
+    groups, labels = await _fetch_groups(windows)
+    loop = asyncio.get_running_loop()
+    overlays = await loop.run_in_executor(
+        get_process_pool(), partial(overlay_envelope, groups, len(windows), bins, bucket_seconds)
+    )
+
+    tests = [w["test"] for w in windows]
+    comparison = {
+        **params,
+        "machine_type_id": tests[0]["machine_type_id"],
+        "machine_type_name": tests[0]["machine_type_name"],
+        "bucket_seconds": bucket_seconds,
+        "time_offsets": [params["offset_seconds"] + i * bucket_seconds for i in range(bins)],
+        "tests": [
+            {
+                "test_id": w["test"]["id"],
+                "test_name": w["test"]["test_name"],
+                "machine_name": w["test"]["machine_name"],
+                "origin": w["origin"],
+                "start_time": w["start_time"],
+                "end_time": w["end_time"],
+                "segment_id": w["anchor"]["id"] if w["anchor"] else None,
+            }
+            for w in windows
+        ],
+        "sensor_types": [{**labels[key], **overlays[key]} for key in sorted(overlays)],
+    }
+
+    if data_key is not None:
+        try:
+            await analysis_db.save_cached_comparison(
+                params_key, [t["id"] for t in tests], data_key, dumps(comparison), COMPARISON_CACHE_MAX_AGE
+            )
+        except Exception as e:
+            logger.warning(f"Could not cache comparison of tests {[t['id'] for t in tests]}: {e}")
+    # The cached body and a fresh result must look the same
+    return orjson.loads(dumps(comparison))
+
+
+async def compare_tests(
+    tests: List[Dict],
+    align: str = "start",
+    phase: Optional[str] = None,
+    occurrence: int = 1,
+    offset_seconds: float = 0.0,
+    duration_seconds: Optional[float] = None,
+    points: int = 500,
+) -> Tuple[Dict, bool]:
+    """
+    Overlay the aggregated series of several tests of one machine type.
+
+    tests are rows of database.get_tests_by_ids. With align 'start' every
+    test's window starts offset_seconds after its first aggregate bucket,
+    with align 'phase' after the start of its occurrence-th phase segment.
+    duration_seconds defaults to the longest aligned phase, or the longest
+    test. Raises ValueError if a test has no data or no such phase.
+    Returns (comparison, cached).
+    """
+    origins = await _gather_limited(_test_origin(test, align, phase, occurrence) for test in tests)
+
+    duration_seconds = duration_seconds or _default_duration(origins)
+    windows = [
+        {
+            **o,
+            "start_time": o["origin"] + timedelta(seconds=offset_seconds),
+            "end_time": o["origin"] + timedelta(seconds=offset_seconds + duration_seconds),
+        }
+        for o in origins
+    ]
+
+    params = {
+        "test_ids": [t["id"] for t in tests],
+        "align": align,
+        "phase": phase if align == "phase" else None,
+        "occurrence": occurrence if align == "phase" else None,
+        "offset_seconds": offset_seconds,
+        "duration_seconds": duration_seconds,
+        "points": points,
+    }
+    params_key = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+    versions = await _gather_limited(
+        measurements_db.get_measurement_data_version([r["id"] for r in w["relations"]], w["start_time"], w["end_time"])
+        for w in windows
+    )
+    stamp = [
+        {
+            "test_id": w["test"]["id"],
+            "start_time": w["start_time"],
+            "relations": [r["id"] for r in w["relations"]],
+            "max_timestamp": v["max_timestamp"],
+            "num_samples": v["num_samples"],
+            "data_generation": v["data_generation"],
+        }
+        for w, v in zip(windows, versions)
+    ]
+    # Unsettled data (running test, fresh crop) is neither cached nor read from the cache
+    data_key = None
+    if all(v["settled"] for v in versions):
+        data_key = hashlib.sha256(json.dumps(stamp, default=str, sort_keys=True).encode()).hexdigest()
+
+        cached = await analysis_db.get_cached_comparison(params_key)
+        if cached and cached["data_key"] == data_key:
+            return orjson.loads(cached["result"]), True
+
+    key = (params_key, data_key)
+    task = _in_flight.get(key)
+    if task is None:
+        task = asyncio.create_task(_compute_comparison(windows, params, params_key, data_key))
+        _in_flight[key] = task
+        task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    # shield: a disconnecting client must not cancel the computation for the others
+    return await asyncio.shield(task), False
@@ -0,0 +1,164 @@
+"""
+Background computation of spectrogram tile pyramids.
+
+When a test is stopped, the spectrograms of its relations whose sensor type
+is listed in SPECTROGRAM_SENSOR_TYPES (accelerometers by default) are
+queued in metadata.spectrograms and start SPECTROGRAM_DELAY later, once
+the samples still in flight were written. A worker streams each relation's raw
+samples from the first to the last measurement, builds the tiles of all
+zoom levels in the shared process pool (see spectrogram.py) and writes
+every tile as soon as it is finished, so memory stays bounded by one tile
+per level and channel.
+
+A crop queues the affected spectrograms again; deleted relations take
+their tiles with them.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+import database.analysis as analysis_db
+import database.measurements as measurements_db
+from app.core.job_workers import JobWorkerPool
+from app.core.process_pool import get_process_pool
+from .service import block_sample_rate, iter_channel_blocks
+from .spectrogram import SpectrogramBuilder, SpectrogramTile, spectrogram_finish, spectrogram_update
+
+logger = logging.getLogger(__name__)
+
+# Sensor types (sensor_type_name) whose relations get a spectrogram when a test stops
+SPECTROGRAM_SENSOR_TYPES = [
+    name.strip() for name in os.getenv("SPECTROGRAM_SENSOR_TYPES", "Accelerometer").split(",") if name.strip()
+]
+
+# Time given to samples still in flight (sensor buffers, MQTT worker) after a stop
+SPECTROGRAM_DELAY = timedelta(seconds=float(os.getenv("SPECTROGRAM_DELAY_SECONDS", 30)))
+
+# STFT frame length and hop in resampled samples (frequency bins = nperseg / 2)
+SPECTROGRAM_NPERSEG = int(os.getenv("SPECTROGRAM_NPERSEG", 512))
+SPECTROGRAM_HOP = int(os.getenv("SPECTROGRAM_HOP", SPECTROGRAM_NPERSEG))
+
+# Frame columns per tile
+SPECTROGRAM_TILE_FRAMES = int(os.getenv("SPECTROGRAM_TILE_FRAMES", 256))
+
+# Attempts before a job that keeps getting interrupted is failed
+SPECTROGRAM_MAX_ATTEMPTS = 3
+
+# Minimum interval between progress writes of one job
+PROGRESS_UPDATE_SECONDS = 1.0
+
+
+def _tile_rows(tiles: List[SpectrogramTile]) -> List[tuple]:
+    return [(channel, level, index, data.tobytes()) for channel, level, index, data in tiles]
+
+
+async def run_spectrogram_job(job: Dict):
+    """Compute and store the tile pyramid of one claimed relation."""
+    relation_id = job["test_relation_id"]
+    loop = asyncio.get_running_loop()
+    last_update = time.monotonic()
+
+    try:
+        bounds = await measurements_db.get_measurement_time_bounds([relation_id])
+        if not bounds:
+            raise ValueError("No raw measurements")
+        origin_us = bounds["start_time"].timestamp() * 1e6
+        duration_us = bounds["end_time"].timestamp() * 1e6 - origin_us
+
+        builder = None
+        in_flight = None
+        async for block in iter_channel_blocks(relation_id):
+            if in_flight is not None:
+                builder, tiles = await in_flight
+                await analysis_db.insert_spectrogram_tiles(relation_id, _tile_rows(tiles))
+
+            if builder is None:
+                rate = block_sample_rate(block)
+                if not rate:
+                    raise ValueError("Not enough samples to estimate the sample rate")
+                total_frames = int(math.ceil(duration_us * rate / 1e6 / SPECTROGRAM_HOP)) + 1
+                builder = SpectrogramBuilder(
+                    rate, origin_us, total_frames,
+                    nperseg=SPECTROGRAM_NPERSEG, hop=SPECTROGRAM_HOP, tile_frames=SPECTROGRAM_TILE_FRAMES
+                )
+                await analysis_db.start_spectrogram(relation_id, {
+                    "origin": bounds["start_time"],
+                    "sample_rate_hz": rate,
+                    "nperseg": builder.nperseg,
+                    "hop": builder.hop,
+                    "tile_frames": builder.tile_frames,
+                    "frequency_bins": builder.bins,
+                    "levels": builder.levels,
+                })
+
+            in_flight = loop.run_in_executor(get_process_pool(), spectrogram_update, builder, block)
+
+            now = time.monotonic()
+            if now - last_update >= PROGRESS_UPDATE_SECONDS and duration_us > 0:
+                last_update = now
+                last_us = max(timestamps[-1] for timestamps, _ in block.values())
+                await analysis_db.update_spectrogram_progress(
+                    relation_id, min(99, int((last_us - origin_us) / duration_us * 100))
+                )
+
+        if in_flight is None:
+            raise ValueError("No raw measurements")
+        builder, tiles = await in_flight
+        tiles += await loop.run_in_executor(get_process_pool(), spectrogram_finish, builder)
+        await analysis_db.insert_spectrogram_tiles(relation_id, _tile_rows(tiles))
+
+        await analysis_db.complete_spectrogram(relation_id, builder.frames, builder.channels)
+        logger.info(
+            f"Spectrogram of relation {relation_id} completed: {builder.frames} frames, "
+            f"{builder.levels} levels, channels {builder.channels}"
+        )
+
+    except asyncio.CancelledError:
+        # Shutdown: the job stays 'processing' and is requeued on the next start
+        raise
+    except Exception as e:
+        logger.error(f"Spectrogram of relation {relation_id} failed: {e}")
+        await analysis_db.fail_spectrogram(relation_id, str(e))
+
+
+async def submit_spectrogram_jobs(relations: List[Dict], delay: Optional[timedelta] = None) -> List[int]:
+    """
+    Queue the spectrograms of the given test relations whose sensor type gets one.
+
+    relations are rows of get_test_relations (with sensor_type_name). The
+    jobs start after SPECTROGRAM_DELAY unless delay is given. Returns the
+    queued relation IDs.
+    """
+    relation_ids = [r["id"] for r in relations if r.get("sensor_type_name") in SPECTROGRAM_SENSOR_TYPES]
+    if relation_ids:
+        await analysis_db.queue_spectrograms(relation_ids, SPECTROGRAM_DELAY if delay is None else delay)
+        spectrogram_worker.notify()
+    return relation_ids
+
+
+async def queue_spectrogram(test_relation_id: int):
+    """Queue one relation's spectrogram right away, whatever its sensor type."""
+    await analysis_db.queue_spectrograms([test_relation_id])
+    spectrogram_worker.notify()
+
+
+async def requeue_spectrograms(relation_ids: List[int]):
+    """Recompute the existing spectrograms of relations whose measurements changed."""
+    if await analysis_db.requeue_stale_spectrograms(relation_ids):
+        spectrogram_worker.notify()
+
+
+# One relation at a time: the FFTs run in the shared process pool anyway
+spectrogram_worker = JobWorkerPool(
+    "spectrogram",
+    claim=analysis_db.claim_next_spectrogram_job,
+    run=run_spectrogram_job,
+    requeue=analysis_db.requeue_interrupted_spectrogram_jobs,
+    workers=1,
+    max_attempts=SPECTROGRAM_MAX_ATTEMPTS,
+)
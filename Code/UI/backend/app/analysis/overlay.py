@@ -0,0 +1,69 @@
+"""
+Overlay of several tests' aggregated series on one relative time axis.
+
+Every test contributes series as (test index, seconds since the start of
+its comparison window, values). They are averaged into bins of a common
+grid - several sensors or channels of one kind in a test are averaged
+too - and the spread across tests is summarised per bin as the median and
+the 5th / 95th percentile. Bins without data are None, so the result is
+ready to be encoded as JSON.
+"""
+
+import warnings
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# (test index, seconds since the window start, values)
+Series = Tuple[int, np.ndarray, np.ndarray]
+
+ENVELOPE_PERCENTILES = (5, 50, 95)
+
+
+def _to_list(values: np.ndarray) -> List[Optional[float]]:
+    return [None if v != v else v for v in values.tolist()]
+
+
+def bin_tests(series: List[Series], num_tests: int, bins: int, bucket_seconds: float) -> np.ndarray:
+    """Mean of the series of every test per bin; returns a (num_tests x bins) array, NaN without data."""
+    sums = np.zeros(num_tests * bins)
+    counts = np.zeros(num_tests * bins)
+    for test_index, offsets, values in series:
+        index = np.floor(offsets / bucket_seconds).astype(np.int64)
+        valid = (index >= 0) & (index < bins) & np.isfinite(values)
+        flat = test_index * bins + index[valid]
+        sums += np.bincount(flat, weights=values[valid], minlength=sums.size)
+        counts += np.bincount(flat, minlength=counts.size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (sums / counts).reshape(num_tests, bins)
+
+
+def overlay_envelope(
+    groups: Dict[str, List[Series]],
+    num_tests: int,
+    bins: int,
+    bucket_seconds: float,
+) -> Dict[str, Dict]:
+    """
+    Bin the series of every group (sensor type and channel) and compute their envelope.
+
+    Returns per group the binned series of every test (in test order), the
+    p05 / median / p95 across tests and the number of tests with data per
+    bin.
+    """
+    result = {}
+    for key, series in groups.items():
+        binned = bin_tests(series, num_tests, bins, bucket_seconds)
+        tests_per_bin = np.isfinite(binned).sum(axis=0)
+        with warnings.catch_warnings():
+            # Bins no test has data for
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            p05, median, p95 = np.nanpercentile(binned, ENVELOPE_PERCENTILES, axis=0)
+        result[key] = {
+            "series": [_to_list(row) for row in binned],
+            "median": _to_list(median),
+            "p05": _to_list(p05),
+            "p95": _to_list(p95),
+            "tests_per_bin": tests_per_bin.tolist(),
+        }
+    return result
@@ -0,0 +1,219 @@
+"""
+Wash-cycle phase detection on aggregated RPM, current and water-flow series.
+
+The signals are put on one grid of aggregate buckets and smoothed over
+about a minute, so the drum's tumble / pause rhythm does not show up as
+separate phases. The series are scaled by their noise level and split
+where the means of the windows before and after a bucket differ most (see
+change_points); unlike a global segmentation this also finds the borders
+of hundreds of repeated cycles in a long endurance test.
+
+Each resulting piece is labelled from its mean levels:
+
+- spin:  drum faster than spin_rpm
+- fill:  water flowing in (flow above fill_flow)
+- wash / rinse: drum tumbling (above tumble_rpm); tumbling before the first
+  spin of a program is wash, after it rinse. A standby of at least
+  cycle_gap_seconds starts a new program (endurance tests run many).
+- drain: drum still, no inflow, but the drain pump draws current
+- everything else (standby, pauses) is not a phase
+
+Adjacent pieces with the same label are merged and phases shorter than
+min_phase_seconds are dropped. A missing signal (no sensor of that kind in
+the test) simply disables the labels that depend on it.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+PHASES = ("fill", "wash", "rinse", "drain", "spin")
+
+# Signals used for detection, in feature column order
+SIGNALS = ("rpm", "current", "flow")
+
+IDLE = "idle"
+
+
+def _fill_gaps(values: np.ndarray) -> np.ndarray:
+    """Carry the last value over NaN buckets (the first value backwards)."""
+    valid = np.isfinite(values)
+    if not valid.any():
+        return values
+    index = np.where(valid, np.arange(values.size), 0)
+    np.maximum.accumulate(index, out=index)
+    filled = values[index]
+    filled[:np.argmax(valid)] = values[np.argmax(valid)]
+    return filled
+
+
+def _moving_mean(values: np.ndarray, width: int) -> np.ndarray:
+    """Centered moving mean over width buckets (shrinking at the edges)."""
+    if width <= 1 or values.size == 0:
+        return values
+    sums = np.concatenate(([0.0], np.cumsum(values)))
+    half = width // 2
+    index = np.arange(values.size)
+    lo = np.maximum(index - half, 0)
+    hi = np.minimum(index + width - half, values.size)
+    return (sums[hi] - sums[lo]) / (hi - lo)
+
+
+def _noise_scale(values: np.ndarray) -> float:
+    """Robust standard deviation of the bucket-to-bucket noise."""
+    diffs = np.abs(np.diff(values))
+    scale = float(np.median(diffs)) / (0.6745 * np.sqrt(2)) if diffs.size else 0.0
+    # Flat signals (e.g. a sensor reading 0 the whole time) must not blow up
+    floor = 1e-3 * max(float(np.ptp(values)) if values.size else 0.0, 1e-9)
+    return max(scale, floor)
+
+
+def change_points(features: np.ndarray, window: int, threshold: float) -> List[int]:
+    """
+    Mean-shift change points of a (buckets x signals) series.
+
+    For every bucket the means of the window buckets before and after it
+    are compared at once (cumulative sums); buckets where the squared,
+    window-scaled distance of the two means is a local maximum above
+    threshold are change points. Returns the sorted segment borders,
+    including 0 and the length.
+    """
+    n = features.shape[0]
+    if n < 2 * window:
+        return [0, n]
+
+    sums = np.vstack((np.zeros(features.shape[1]), np.cumsum(features, axis=0)))
+    index = np.arange(window, n - window + 1)
+    before = (sums[index] - sums[index - window]) / window
+    after = (sums[index + window] - sums[index]) / window
+    distance = ((after - before) ** 2).sum(axis=1) * (window / 2)
+
+    padded = np.pad(distance, window, constant_values=-np.inf)
+    local_max = np.lib.stride_tricks.sliding_window_view(padded, 2 * window + 1).max(axis=1)
+    peaks = index[(distance >= threshold) & (distance == local_max)]
+    # A flat maximum yields several neighbouring peaks: keep the first one
+    if peaks.size:
+        peaks = peaks[np.concatenate(([True], np.diff(peaks) > window))]
+    return [0, *peaks.tolist(), n]
+
+
+def _label(levels: Dict[str, float], spin_rpm: float, tumble_rpm: float, fill_flow: float, drain_current: float) -> str:
+    rpm, current, flow = levels.get("rpm"), levels.get("current"), levels.get("flow")
+    if rpm is not None and rpm >= spin_rpm:
+        return "spin"
+    if flow is not None and flow >= fill_flow:
+        return "fill"
+    if rpm is not None and rpm >= tumble_rpm:
+        return "tumble"
+    if rpm is not None and current is not None and current >= drain_current:
+        return "drain"
+    return IDLE
+
+
+def _merge(pieces: List[Dict]) -> List[Dict]:
+    merged: List[Dict] = []
+    for piece in pieces:
+        if merged and merged[-1]["phase"] == piece["phase"]:
+            merged[-1]["end"] = piece["end"]
+        else:
+            merged.append(dict(piece))
+    return merged
+
+
+def detect_phases(
+    timestamps: np.ndarray,
+    signals: Dict[str, Optional[np.ndarray]],
+    bucket_seconds: float = 10.0,
+    spin_rpm: float = 300.0,
+    tumble_rpm: float = 15.0,
+    fill_flow: float = 0.5,
+    drain_current: float = 0.3,
+    min_phase_seconds: float = 30.0,
+    smoothing_seconds: float = 60.0,
+    cycle_gap_seconds: float = 120.0,
+    penalty: float = 25.0,
+) -> List[Dict]:
+    """
+    Label the wash-cycle phases of aggregated signals.
+
+    timestamps are the bucket starts (epoch seconds, increasing, on a
+    bucket_seconds grid with NaN values for missing buckets); signals maps
+    the names in SIGNALS to value arrays of the same length or None.
+    Returns phases as {"phase", "start", "end", "rpm", "current", "flow"}
+    with epoch seconds (end exclusive) and the mean level of each signal.
+    """
+    names = [name for name in SIGNALS if signals.get(name) is not None and np.isfinite(signals[name]).any()]
+    if not names or timestamps.size == 0:
+        return []
+
+    width = max(1, int(round(smoothing_seconds / bucket_seconds)))
+    raw = {name: _fill_gaps(np.asarray(signals[name], dtype=float)) for name in names}
+    smooth = {name: _moving_mean(raw[name], width) for name in names}
+    features = np.column_stack([smooth[name] / _noise_scale(smooth[name]) for name in names])
+
+    window = max(2, int(round(min_phase_seconds / bucket_seconds)))
+    borders = change_points(features, window, penalty * len(names))
+
+    pieces = []
+    for start, end in zip(borders[:-1], borders[1:]):
+        # Median: the smoothing blurs the borders with a few buckets of the neighbouring phases
+        levels = {name: float(np.median(smooth[name][start:end])) for name in names}
+        pieces.append({
+            "phase": _label(levels, spin_rpm, tumble_rpm, fill_flow, drain_current),
+            "start": start,
+            "end": end,
+        })
+    pieces = _merge(pieces)
+
+    # Too short to be a phase: idle blips between two equal phases are bridged, other blips dropped
+    min_buckets = min_phase_seconds / bucket_seconds
+    for i, piece in enumerate(pieces):
+        if piece["end"] - piece["start"] >= min_buckets:
+            continue
+        neighbours = pieces[i - 1]["phase"] if i > 0 else None, pieces[i + 1]["phase"] if i + 1 < len(pieces) else None
+        if piece["phase"] == IDLE and neighbours[0] == neighbours[1] and neighbours[0] is not None:
+            piece["phase"] = neighbours[0]
+        elif piece["phase"] != IDLE:
+            piece["phase"] = IDLE
+    pieces = _merge(pieces)
+
+    phases = []
+    spun = False
+    for piece in pieces:
+        if piece["phase"] == "spin":
+            spun = True
+        if piece["phase"] == IDLE:
+            if piece["end"] - piece["start"] >= cycle_gap_seconds / bucket_seconds:
+                # Standby between two programs: the next tumbling is a main wash again
+                spun = False
+            continue
+        start, end = piece["start"], piece["end"]
+        phases.append({
+            "phase": ("rinse" if spun else "wash") if piece["phase"] == "tumble" else piece["phase"],
+            "start": float(timestamps[start]),
+            "end": float(timestamps[end - 1]) + bucket_seconds,
+            **{name: float(np.nanmean(signals[name][start:end])) if name in names else None for name in SIGNALS},
+        })
+    return phases
+
+
+def bucket_grid(series: List[Tuple[np.ndarray, np.ndarray]], bucket_seconds: float) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """
+    Put (epoch seconds, values) series on one common bucket grid.
+
+    Returns the grid and every series' values on it (NaN where a series has
+    no bucket).
+    """
+    present = [t for t, _ in series if t.size]
+    if not present:
+        return np.empty(0), [np.empty(0) for _ in series]
+    first = min(float(t[0]) for t in present)
+    last = max(float(t[-1]) for t in present)
+    grid = first + bucket_seconds * np.arange(int(round((last - first) / bucket_seconds)) + 1)
+
+    aligned = []
+    for timestamps, values in series:
+        on_grid = np.full(grid.size, np.nan)
+        on_grid[np.rint((timestamps - first) / bucket_seconds).astype(np.int64)] = values
+        aligned.append(on_grid)
+    return grid, aligned
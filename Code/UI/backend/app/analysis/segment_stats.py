@@ -0,0 +1,170 @@
+"""
+Precomputed statistics of test segments.
+
+For every segment, relation and channel metadata.segment_stats holds the
+sample count, mean, RMS, standard deviation, min/max, the 5/50/95th
+percentiles and the dominant frequency, so segment views and comparisons
+read one indexed table instead of scanning raw data.
+
+Creating or editing a segment queues its statistics (database/
+test_segments.py), a crop queues the segments of the cropped test. A
+background worker computes them: the moments and percentiles in one
+grouped query over the raw rows, the dominant frequency as the peak of the
+segment's Welch spectrum (which lands in the spectrum cache on the way) -
+only for vibration sensors (SPECTROGRAM_SENSOR_TYPES); RPM, current or
+flow sensors have no meaningful peak and would double the raw scan.
+The stored data_key tells whether measurements arrived or were deleted
+since; reading such a segment returns the old values flagged stale and
+queues it again. Keys only exist once the data settled (see
+get_measurement_data_version): statistics of still changing data are
+stored without one and read as stale until then.
+"""
+
+import asyncio
+import logging
+from typing import Dict, List
+
+import database.analysis as analysis_db
+import database.measurements as measurements_db
+from app.core.job_workers import JobWorkerPool
+from app.core.serialization import DEFAULT_CHANNEL
+from database import get_test_relations
+from database import test_segments as segments_db
+from .jobs import SPECTROGRAM_SENSOR_TYPES
+from .service import get_segment_spectrum, segment_data_key
+
+logger = logging.getLogger(__name__)
+
+# The percentile query sorts every raw row of the segment
+SEGMENT_STATS_TIMEOUT_SECONDS = 3600
+
+# Attempts before a job that keeps getting interrupted is failed
+SEGMENT_STATS_MAX_ATTEMPTS = 3
+
+
+async def _dominant_frequencies(relation_ids: List[int], segment: Dict) -> Dict[tuple, float]:
+    """Peak frequency per (relation, channel) of vibration sensors; relations with too few samples are left out."""
+    peaks = {}
+    for relation_id in relation_ids:
+        try:
+            spectrum, _ = await get_segment_spectrum(relation_id, segment)
+        except ValueError:
+            continue
+        for channel, stats in spectrum["channels"].items():
+            peaks[(relation_id, channel)] = stats["peak_frequency_hz"]
+    return peaks
+
+
+async def run_segment_stats_job(segment: Dict):
+    """Compute and store the statistics of one claimed segment."""
+    segment_id = segment["id"]
+    try:
+        relations = await get_test_relations(segment["test_id"])
+        relation_ids = [r["id"] for r in relations]
+        vibration_ids = {r["id"] for r in relations if r.get("sensor_type_name") in SPECTROGRAM_SENSOR_TYPES}
+        data_key = await segment_data_key(relation_ids, segment)
+        if data_key is None:
+            # Fresh samples or a crop: wait for the aggregates once instead of scanning twice
+            await asyncio.sleep(measurements_db.AGGREGATE_SETTLE_SECONDS)
+            data_key = await segment_data_key(relation_ids, segment)
+
+        rows = []
+        if relation_ids:
+            rows = await measurements_db.get_measurement_summary_stats(
+                relation_ids, segment["start_time"], segment["end_time"], timeout=SEGMENT_STATS_TIMEOUT_SECONDS
+            )
+        peaks = await _dominant_frequencies(
+            sorted({row["test_relation_id"] for row in rows} & vibration_ids), segment
+        )
+
+        stats = []
+        for row in rows:
+            channel = row["measurement_channel"] or DEFAULT_CHANNEL
+            p05, p50, p95 = row["percentiles"] or (None, None, None)
+            stats.append({
+                **row,
+                "measurement_channel": channel,
+                "p05_value": p05,
+                "p50_value": p50,
+                "p95_value": p95,
+                "dominant_frequency_hz": peaks.get((row["test_relation_id"], channel)),
+            })
+
+        if await analysis_db.complete_segment_stats(segment_id, data_key, stats):
+            logger.info(f"Statistics of segment {segment_id} completed: {len(stats)} channel(s)")
+
+    except asyncio.CancelledError:
+        # Shutdown: the job stays 'processing' and is requeued on the next start
+        raise
+    except Exception as e:
+        logger.error(f"Statistics of segment {segment_id} failed: {e}")
+        await analysis_db.fail_segment_stats(segment_id, str(e))
+
+
+async def requeue_segment_stats(relation_ids: List[int]):
+    """Recompute the statistics of the segments of tests whose measurements changed."""
+    if await analysis_db.requeue_segment_stats_of_relations(relation_ids):
+        segment_stats_worker.notify()
+
+
+async def get_segment_statistics(segment: Dict) -> Dict:
+    """
+    Stored statistics of a segment.
+
+    If the measurements changed since they were computed, they are
+    returned with stale set and the segment is queued again.
+    """
+    result = await analysis_db.get_segment_stats(segment["id"])
+    if result is None:
+        await segments_db.queue_segment_stats([segment["id"]])
+        segment_stats_worker.notify()
+        result = {"status": "queued", "data_key": None, "completed_at": None, "error": None, "stats": []}
+
+    stale = False
+    if result["status"] == "completed":
+        relation_ids = [r["id"] for r in await get_test_relations(segment["test_id"])]
+        data_key = await segment_data_key(relation_ids, segment)
+        stale = data_key is None or data_key != result["data_key"]
+        if data_key is not None and stale and await analysis_db.requeue_segment_stats([segment["id"]]):
+            segment_stats_worker.notify()
+
+    return {
+        "segment_id": segment["id"],
+        "status": result["status"],
+        "stale": stale,
+        "error": result["error"],
+        "completed_at": result["completed_at"],
+        "stats": result["stats"],
+    }
+
+
+async def get_test_segment_statistics(test_id: int) -> List[Dict]:
+    """Stored statistics of all segments of a test, one entry per segment in time order."""
+    segments: Dict[int, Dict] = {}
+    for row in await analysis_db.get_test_segment_stats(test_id):
+        segment = segments.get(row["segment_id"])
+        if segment is None:
+            segment = segments[row["segment_id"]] = {
+                "segment_id": row["segment_id"],
+                "segment_name": row["segment_name"],
+                "start_time": row["start_time"],
+                "end_time": row["end_time"],
+                "status": row["status"],
+                "completed_at": row["completed_at"],
+                "stats": [],
+            }
+        if row["test_relation_id"] is not None:
+            segment["stats"].append({
+                key: row[key] for key in ("test_relation_id", "measurement_channel", *analysis_db.SEGMENT_STATS_COLUMNS)
+            })
+    return list(segments.values())
+
+
+segment_stats_worker = JobWorkerPool(
+    "segment statistics",
+    claim=analysis_db.claim_next_segment_stats_job,
+    run=run_segment_stats_job,
+    requeue=analysis_db.requeue_interrupted_segment_stats_jobs,
+    workers=1,
+    max_attempts=SEGMENT_STATS_MAX_ATTEMPTS,
+)
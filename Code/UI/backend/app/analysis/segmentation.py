@@ -0,0 +1,118 @@
+"""
+Wash-cycle phases of a test as segments.
+
+Reads the 10s aggregates of a test's tachometer (RPM), current and water
+flow sensors - a 48-hour endurance test is about 17,000 buckets per sensor
+instead of tens of millions of raw samples - labels the phases in the
+shared process pool (see phases.py) and stores them in
+metadata.test_segments as 'detected' candidates, replacing the candidates
+of an earlier detection. Segments created or edited by hand are kept.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from functools import partial
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import database.measurements as measurements_db
+from app.core.process_pool import get_process_pool
+from database import get_test_relations
+from database import test_segments as segments_db
+from .phases import SIGNALS, bucket_grid, detect_phases
+
+logger = logging.getLogger(__name__)
+
+
+def _sensor_types(variable: str, default: str) -> List[str]:
+    return [name.strip() for name in os.getenv(variable, default).split(",") if name.strip()]
+
+
+# Sensor types (sensor_type_name) providing each detection signal
+PHASE_SENSOR_TYPES = {
+    "rpm": _sensor_types("PHASE_RPM_SENSOR_TYPES", "Infrared Sensor"),
+    "current": _sensor_types("PHASE_CURRENT_SENSOR_TYPES", "Current Sensor"),
+    "flow": _sensor_types("PHASE_FLOW_SENSOR_TYPES", "Flow Sensor"),
+}
+
+# Labelling thresholds (see phases.detect_phases)
+PHASE_THRESHOLDS = {
+    "spin_rpm": float(os.getenv("PHASE_SPIN_RPM", 300)),
+    "tumble_rpm": float(os.getenv("PHASE_TUMBLE_RPM", 15)),
+    "fill_flow": float(os.getenv("PHASE_FILL_FLOW_LPM", 0.5)),
+    "drain_current": float(os.getenv("PHASE_DRAIN_CURRENT_A", 0.3)),
+    "min_phase_seconds": float(os.getenv("PHASE_MIN_SECONDS", 30)),
+}
+
+# Bucket width of timeseries.measurements_avg_10s
+AGG_BUCKET_SECONDS = 10.0
+
+
+def _signal_relations(relations: List[Dict]) -> Dict[str, List[int]]:
+    return {
+        signal: [r["id"] for r in relations if r.get("sensor_type_name") in PHASE_SENSOR_TYPES[signal]]
+        for signal in SIGNALS
+    }
+
+
+async def detect_test_phases(
+    test_id: int,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    save: bool = True,
+) -> Dict:
+    """
+    Detect the wash-cycle phases of a test from its aggregated sensor data.
+
+    With save the phases replace the test's detected segments in the range.
+    Returns the relations used per signal and the segments (stored rows if
+    saved, otherwise the candidates). Raises ValueError if the test has no
+    RPM, current or flow sensor or no aggregated data for them.
+    """
+    relations = await get_test_relations(test_id)
+    signal_relations = _signal_relations(relations)
+    relation_ids = [rid for ids in signal_relations.values() for rid in ids]
+    if not relation_ids:
+        raise ValueError("The test has no RPM, current or flow sensor")
+
+    rows = await measurements_db.fetch_measurement_avg_series(relation_ids, start_time, end_time)
+    if not rows:
+        raise ValueError("No aggregated measurements of the RPM, current and flow sensors")
+
+    series = [(np.array(row["timestamps"]), np.array(row["values"], dtype=float)) for row in rows]
+    grid, aligned = bucket_grid(series, AGG_BUCKET_SECONDS)
+
+    # Several sensors / channels of one kind: the strongest reading counts
+    signals = {}
+    for signal, ids in signal_relations.items():
+        columns = [values for row, values in zip(rows, aligned) if row["test_relation_id"] in ids]
+        signals[signal] = np.fmax.reduce(columns) if columns else None
+
+    loop = asyncio.get_running_loop()
+    phases = await loop.run_in_executor(
+        get_process_pool(), partial(detect_phases, grid, signals, AGG_BUCKET_SECONDS, **PHASE_THRESHOLDS)
+    )
+
+    counts: Dict[str, int] = {}
+    segments = []
+    for phase in phases:
+        counts[phase["phase"]] = counts.get(phase["phase"], 0) + 1
+        segments.append({
+            "segment_name": f"{phase['phase'].capitalize()} {counts[phase['phase']]}",
+            "start_time": datetime.fromtimestamp(phase["start"], tz=timezone.utc),
+            "end_time": datetime.fromtimestamp(phase["end"], tz=timezone.utc),
+            "phase": phase["phase"],
+            "mean_levels": {signal: phase[signal] for signal in SIGNALS},
+        })
+
+    if save:
+        stored = await segments_db.replace_detected_segments(test_id, segments, start_time, end_time)
+        logger.info(f"Detected {len(stored)} wash-cycle phases in test {test_id}")
+        for segment, levels in zip(stored, (s["mean_levels"] for s in segments)):
+            segment["mean_levels"] = levels
+        segments = stored
+
+    return {"test_id": test_id, "signals": signal_relations, "segments": segments}
@@ -0,0 +1,263 @@
+"""
+Spectral analysis of stored raw measurements.
+
+iter_channel_blocks reads a test relation's raw samples for a time range
+in keyset pages that the database already splits into per-channel arrays,
+and hands them on as per-channel NumPy blocks. compute_spectrum feeds them
+one by one to a WelchAccumulator in the shared process pool; while one
+block is being transformed, the next one is already read from the
+database. At most SPECTRUM_CONCURRENCY spectra are computed at a time,
+further requests wait for a free slot.
+
+Spectra of test segments are cached in metadata.spectrum_cache, keyed by
+the analysis parameters and stamped with the segment bounds and the
+measurement data version, so they are only recomputed when the data or the
+segment changed. Identical requests that arrive while a spectrum is being
+computed wait for that computation instead of starting their own.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import orjson
+
+import database.analysis as analysis_db
+import database.measurements as measurements_db
+from app.core.process_pool import get_process_pool
+from app.core.serialization import dumps
+from .spectrum import ChannelBlock, WelchAccumulator, estimate_sample_rate, welch_update
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per database round trip
+SPECTRUM_PAGE_SIZE = 50_000
+
+# Rows handed to the process pool at a time
+SPECTRUM_BLOCK_ROWS = int(os.getenv("SPECTRUM_BLOCK_ROWS", 500_000))
+
+# Spectra computed at the same time; each reads raw pages and feeds the process pool
+SPECTRUM_CONCURRENCY = int(os.getenv("SPECTRUM_CONCURRENCY", 2))
+
+_spectrum_slots = asyncio.Semaphore(max(1, SPECTRUM_CONCURRENCY))
+
+# Spectra being computed, by cache key
+_in_flight: Dict[Tuple, asyncio.Task] = {}
+
+
+def page_to_channels(page: List, channels: Optional[Set[str]] = None) -> Dict[str, ChannelBlock]:
+    """Turn a page of per-channel arrays (page_sensor_measurement_arrays) into (epoch us, value) blocks."""
+    blocks = {}
+    for row in page:
+        channel = row["measurement_channel"] or "value"
+        if channels and channel not in channels:
+            continue
+        blocks[channel] = (
+            np.array(row["timestamps_us"], dtype=float),
+            np.array(row["measurement_values"], dtype=float),
+        )
+    return blocks
+
+
+def _merge_blocks(pages: List[Dict[str, ChannelBlock]]) -> Dict[str, ChannelBlock]:
+    merged = {}
+    for channel in {c for page in pages for c in page}:
+        parts = [page[channel] for page in pages if channel in page]
+        merged[channel] = (np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts]))
+    return merged
+
+
+def block_sample_rate(block: Dict[str, ChannelBlock]) -> Optional[float]:
+    """Median of the sample rates estimated for every channel of a block."""
+    rates = [rate for rate in (estimate_sample_rate(t) for t, _ in block.values()) if rate]
+    return float(np.median(rates)) if rates else None
+
+
+async def iter_channel_blocks(
+    test_relation_id: int,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    channels: Optional[List[str]] = None,
+) -> AsyncIterator[Dict[str, ChannelBlock]]:
+    """
+    Stream a relation's raw samples as per-channel arrays of about SPECTRUM_BLOCK_ROWS rows.
+
+    Pages are only read while the caller asks for the next block, so a
+    caller that submits a block to the process pool and awaits it after
+    requesting the next one overlaps the database read with the computation.
+    """
+    wanted = set(channels) if channels else None
+    pages: List[Dict[str, ChannelBlock]] = []
+    rows = 0
+
+    async for page in measurements_db.page_sensor_measurement_arrays(
+        test_relation_id, start_time=start_time, end_time=end_time, page_size=SPECTRUM_PAGE_SIZE
+    ):
+        pages.append(page_to_channels(page, wanted))
+        rows += sum(row["num_rows"] for row in page)
+        if rows >= SPECTRUM_BLOCK_ROWS:
+            yield _merge_blocks(pages)
+            pages, rows = [], 0
+
+    if pages:
+        yield _merge_blocks(pages)
+
+
+async def compute_spectrum(
+    test_relation_id: int,
+    start_time: Optional[datetime],
+    end_time: Optional[datetime],
+    nperseg: int = 4096,
+    overlap: float = 0.5,
+    window: str = "hann",
+    sample_rate_hz: Optional[float] = None,
+    channels: Optional[List[str]] = None,
+) -> Dict:
+    """
+    Welch PSD of a test relation's raw measurements in [start_time, end_time].
+
+    Without sample_rate_hz the rate is estimated from the first block.
+    Raises ValueError if there is not enough data for one segment.
+    """
+    async with _spectrum_slots:
+        return await _compute_spectrum(
+            test_relation_id, start_time, end_time, nperseg, overlap, window, sample_rate_hz, channels
+        )
+
+
+async def _compute_spectrum(
+    test_relation_id: int,
+    start_time: Optional[datetime],
+    end_time: Optional[datetime],
+    nperseg: int,
+    overlap: float,
+    window: str,
+    sample_rate_hz: Optional[float],
+    channels: Optional[List[str]],
+) -> Dict:
+    loop = asyncio.get_running_loop()
+    accumulator: Optional[WelchAccumulator] = None
+    in_flight: Optional[asyncio.Future] = None
+
+    async for block in iter_channel_blocks(test_relation_id, start_time, end_time, channels):
+        if in_flight is not None:
+            accumulator = await in_flight
+        if accumulator is None:
+            rate = sample_rate_hz or block_sample_rate(block)
+            if not rate:
+                raise ValueError("Not enough samples to estimate the sample rate")
+            accumulator = WelchAccumulator(rate, nperseg, int(nperseg * overlap), window)
+        in_flight = loop.run_in_executor(get_process_pool(), welch_update, accumulator, block)
+
+    if in_flight is not None:
+        accumulator = await in_flight
+
+    result = accumulator.result() if accumulator else {"channels": {}}
+    if not result["channels"]:
+        raise ValueError(f"Not enough raw samples for one segment of {nperseg} samples")
+
+    return {
+        "test_relation_id": test_relation_id,
+        "start_time": start_time,
+        "end_time": end_time,
+        "sample_rate_hz": accumulator.sample_rate_hz,
+        "nperseg": nperseg,
+        "noverlap": accumulator.noverlap,
+        "window": window,
+        "frequency_resolution_hz": accumulator.sample_rate_hz / nperseg,
+        "frequencies": result["frequencies"].tolist(),
+        "channels": {
+            channel: {**stats, "psd": stats["psd"].tolist()}
+            for channel, stats in result["channels"].items()
+        },
+    }
+
+
+def _params_key(**params) -> str:
+    return json.dumps(params, sort_keys=True)
+
+
+async def segment_data_key(test_relation_ids: List[int], segment: Dict) -> Optional[str]:
+    """
+    Hash of a segment's bounds and the version of its measurements; changes with either.
+
+    None while the measurements have not settled: the aggregate sample count
+    may still change, so such a key must not be stored or compared.
+    """
+    version = await measurements_db.get_measurement_data_version(
+        test_relation_ids, segment["start_time"], segment["end_time"]
+    )
+    if not version["settled"]:
+        return None
+    stamp = {
+        "start_time": segment["start_time"],
+        "end_time": segment["end_time"],
+        "max_timestamp": version["max_timestamp"],
+        "num_samples": version["num_samples"],
+        "data_generation": version["data_generation"],
+    }
+    return hashlib.sha256(json.dumps(stamp, default=str, sort_keys=True).encode()).hexdigest()
+
+
+async def _compute_segment_spectrum(
+    test_relation_id: int,
+    segment: Dict,
+    params_key: str,
+    data_key: Optional[str],
+    **params
+) -> Dict:
+    spectrum = await compute_spectrum(test_relation_id, segment["start_time"], segment["end_time"], **params)
+    spectrum["segment_id"] = segment["id"]
+    if data_key is None:
+        return spectrum
+    try:
+        await analysis_db.save_cached_spectrum(test_relation_id, segment["id"], params_key, data_key, dumps(spectrum))
+    except Exception as e:
+        logger.warning(f"Could not cache spectrum of segment {segment['id']}: {e}")
+    return spectrum
+
+
+async def get_segment_spectrum(
+    test_relation_id: int,
+    segment: Dict,
+    nperseg: int = 4096,
+    overlap: float = 0.5,
+    window: str = "hann",
+    sample_rate_hz: Optional[float] = None,
+    channels: Optional[List[str]] = None,
+) -> Tuple[Dict, bool]:
+    """
+    Welch PSD of a test segment, from the cache when its data did not change.
+
+    Returns (spectrum, cached).
+    """
+    params = {
+        "nperseg": nperseg,
+        "overlap": overlap,
+        "window": window,
+        "sample_rate_hz": sample_rate_hz,
+        "channels": sorted(channels) if channels else None,
+    }
+    params_key = _params_key(**params)
+    data_key = await segment_data_key([test_relation_id], segment)
+
+    if data_key is not None:
+        cached = await analysis_db.get_cached_spectrum(test_relation_id, segment["id"], params_key)
+        if cached and cached["data_key"] == data_key:
+            return orjson.loads(cached["result"]), True
+
+    key = (test_relation_id, segment["id"], params_key, data_key)
+    task = _in_flight.get(key)
+    if task is None:
+        task = asyncio.create_task(
+            _compute_segment_spectrum(test_relation_id, segment, params_key, data_key, **params)
+        )
+        _in_flight[key] = task
+        task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    # shield: a disconnecting client must not cancel the computation for the others
+    return await asyncio.shield(task), False
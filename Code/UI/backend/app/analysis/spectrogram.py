@@ -0,0 +1,205 @@
+"""
+Spectrogram (STFT) tile pyramid of raw measurements.
+
+Every channel is resampled onto a uniform grid anchored at the start of
+the relation's data (see spectrum.UniformResampler), and frame k of the
+STFT covers grid samples [k * hop, k * hop + nperseg). Frame columns hold
+the one-sided PSD without the Nyquist bin, so a column has nperseg / 2
+frequency bins.
+
+Columns are grouped into tiles of tile_frames columns. Level 0 has one
+column per frame; every further level averages the power of two columns of
+the level below, so the top level shows the whole recording in one tile.
+Tiles are stored as little-endian float16 arrays of dB values (shape
+tile_frames x bins, time major): float16 cannot hold the tiny linear PSD
+values of an accelerometer, but has plenty of resolution in dB. Columns
+without data (gaps, before the first or after the last frame) are NaN.
+
+Frames arrive in time order, so every level only keeps the tile being
+filled; finished tiles are returned as soon as a later frame starts the
+next one. All state is picklable so blocks can be processed in the shared
+process pool.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .spectrum import ChannelBlock, UniformResampler, spectral_window
+
+# A finished tile: (channel, level, tile index, float16 dB array)
+SpectrogramTile = Tuple[str, int, int, np.ndarray]
+
+
+def pyramid_levels(total_frames: int, tile_frames: int) -> int:
+    """Number of levels needed until the top level fits in one tile."""
+    levels = 1
+    while total_frames > tile_frames << (levels - 1):
+        levels += 1
+    return levels
+
+
+class ChannelSTFT:
+    """Streaming short-time Fourier transform of one channel."""
+
+    def __init__(self, sample_rate_hz: float, origin_us: float, nperseg: int, hop: int, scale: float):
+        self.nperseg = nperseg
+        self.hop = hop
+        # PSD density scaling: 1 / (fs * sum(window^2))
+        self.scale = scale
+        self.resampler = UniformResampler(sample_rate_hz, origin_us)
+        # Resampled values not consumed by a frame yet, starting at grid index _start
+        self._buffer = np.empty(0)
+        self._start = 0
+        # Frames before this one were emitted already (the sensor clock can jump back)
+        self._next_frame = 0
+
+    def add(self, timestamps_us: np.ndarray, values: np.ndarray, window: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Resample a time-ordered block; returns (frame indices, PSD columns) of all complete frames."""
+        indices, columns = [], []
+        for start, run in self.resampler.add(timestamps_us, values):
+            if start != self._start + self._buffer.size:
+                # Frames never span a gap
+                self._buffer, self._start = run, start
+            else:
+                self._buffer = np.concatenate((self._buffer, run))
+            frames = self._take_frames(window)
+            if frames is not None:
+                indices.append(frames[0])
+                columns.append(frames[1])
+
+        if not indices:
+            return np.empty(0, dtype=np.int64), np.empty((0, self.nperseg // 2))
+        return np.concatenate(indices), np.concatenate(columns)
+
+    def _take_frames(self, window: np.ndarray) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        first = max(-(-self._start // self.hop), self._next_frame)
+        last = (self._start + self._buffer.size - self.nperseg) // self.hop
+        if last < first:
+            return None
+
+        offsets = np.arange(first, last + 1) * self.hop - self._start
+        segments = np.lib.stride_tricks.sliding_window_view(self._buffer, self.nperseg)[offsets]
+        segments = (segments - segments.mean(axis=1, keepdims=True)) * window
+        spectra = np.fft.rfft(segments, axis=1)[:, :-1]
+        power = (spectra.real ** 2 + spectra.imag ** 2) * self.scale
+        power[:, 1:] *= 2
+
+        next_offset = (last + 1) * self.hop - self._start
+        self._buffer = self._buffer[next_offset:].copy()
+        self._start += next_offset
+        self._next_frame = last + 1
+        return np.arange(first, last + 1), power
+
+
+class TilePyramid:
+    """Averages frame columns into the tiles of every zoom level."""
+
+    def __init__(self, levels: int, tile_frames: int, bins: int):
+        self.levels = levels
+        self.tile_frames = tile_frames
+        self.bins = bins
+        # Per level: index of the tile being filled, its power sums and column counts
+        self._tile: List[Optional[int]] = [None] * levels
+        self._sums = [np.zeros((tile_frames, bins)) for _ in range(levels)]
+        self._counts = [np.zeros(tile_frames, dtype=np.int64) for _ in range(levels)]
+
+    def add(self, frame_indices: np.ndarray, power: np.ndarray) -> List[Tuple[int, int, np.ndarray]]:
+        """Add frame columns (increasing frame indices); returns finished (level, tile, dB) tiles."""
+        finished = []
+        for level in range(self.levels):
+            columns = frame_indices >> level
+            tiles = columns // self.tile_frames
+            for tile in np.unique(tiles):
+                if tile != self._tile[level]:
+                    if self._tile[level] is not None:
+                        finished.append(self._flush(level))
+                    self._tile[level] = int(tile)
+                mask = tiles == tile
+                positions = columns[mask] % self.tile_frames
+                np.add.at(self._sums[level], positions, power[mask])
+                np.add.at(self._counts[level], positions, 1)
+        return finished
+
+    def finish(self) -> List[Tuple[int, int, np.ndarray]]:
+        """Flush the partially filled tiles of every level."""
+        return [self._flush(level) for level in range(self.levels) if self._tile[level] is not None]
+
+    def _flush(self, level: int) -> Tuple[int, int, np.ndarray]:
+        counts = self._counts[level]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            db = 10 * np.log10(self._sums[level] / counts[:, None])
+        db[counts == 0] = np.nan
+        tile = (level, self._tile[level], db.astype("<f2"))
+        self._sums[level] = np.zeros((self.tile_frames, self.bins))
+        self._counts[level] = np.zeros(self.tile_frames, dtype=np.int64)
+        self._tile[level] = None
+        return tile
+
+
+class SpectrogramBuilder:
+    """STFT tile pyramids of all channels of one test relation, fed block by block."""
+
+    def __init__(
+        self,
+        sample_rate_hz: float,
+        origin_us: float,
+        total_frames: int,
+        nperseg: int = 512,
+        hop: int = 512,
+        tile_frames: int = 256,
+        window: str = "hann",
+    ):
+        self.sample_rate_hz = sample_rate_hz
+        self.origin_us = origin_us
+        self.nperseg = nperseg
+        self.hop = hop
+        self.tile_frames = tile_frames
+        self.window = window
+        self.bins = nperseg // 2
+        self.levels = pyramid_levels(total_frames, tile_frames)
+        self.frames = 0
+        self._stft: Dict[str, ChannelSTFT] = {}
+        self._pyramids: Dict[str, TilePyramid] = {}
+
+    def update(self, blocks: Dict[str, ChannelBlock]) -> List[SpectrogramTile]:
+        """Add a block; returns the tiles it completed."""
+        window = spectral_window(self.window, self.nperseg)
+        tiles = []
+        for channel, (timestamps_us, values) in blocks.items():
+            if channel not in self._stft:
+                scale = 1.0 / (self.sample_rate_hz * float(np.sum(window ** 2)))
+                self._stft[channel] = ChannelSTFT(self.sample_rate_hz, self.origin_us, self.nperseg, self.hop, scale)
+                self._pyramids[channel] = TilePyramid(self.levels, self.tile_frames, self.bins)
+
+            indices, power = self._stft[channel].add(timestamps_us, values, window)
+            # Frames beyond the top level's single tile (data written meanwhile) are dropped
+            keep = indices < self.tile_frames << (self.levels - 1)
+            indices, power = indices[keep], power[keep]
+            if not indices.size:
+                continue
+            self.frames = max(self.frames, int(indices[-1]) + 1)
+            tiles.extend((channel, *tile) for tile in self._pyramids[channel].add(indices, power))
+        return tiles
+
+    def finish(self) -> List[SpectrogramTile]:
+        """Flush the remaining tiles of every channel."""
+        return [(channel, *tile) for channel, pyramid in self._pyramids.items() for tile in pyramid.finish()]
+
+    @property
+    def channels(self) -> List[str]:
+        return sorted(self._pyramids)
+
+
+def spectrogram_update(
+    builder: SpectrogramBuilder,
+    blocks: Dict[str, ChannelBlock]
+) -> Tuple[SpectrogramBuilder, List[SpectrogramTile]]:
+    """Feed one block to a builder (process pool entry point)."""
+    tiles = builder.update(blocks)
+    return builder, tiles
+
+
+def spectrogram_finish(builder: SpectrogramBuilder) -> List[SpectrogramTile]:
+    """Flush a builder's remaining tiles (process pool entry point)."""
+    return builder.finish()
@@ -0,0 +1,199 @@
+"""
+Welch power spectral density of raw measurements.
+
+Raw samples arrive in time-ordered blocks with irregular timestamps. Every
+channel is resampled onto a uniform grid at the analysis sample rate
+(linear interpolation), cut into overlapping windowed segments, and the
+periodograms of all complete segments of a block are computed with one
+batched rfft. Between blocks only the summed periodograms and the samples
+that do not fill a segment yet are kept, so memory does not grow with the
+length of the analysed range.
+
+A gap in the data (no sample for GAP_INTERVALS sample intervals, or the
+sensor clock jumping back) restarts the segmentation instead of
+interpolating across it.
+
+Everything here is plain NumPy and picklable, so blocks can be processed
+in the shared process pool (app/core/process_pool.py).
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+SPECTRUM_WINDOWS = ("hann", "hamming", "blackman", "boxcar")
+
+# Missing sample intervals after which the signal is treated as interrupted
+GAP_INTERVALS = 10
+
+# One channel's samples: (timestamps in epoch microseconds, values)
+ChannelBlock = Tuple[np.ndarray, np.ndarray]
+
+
+def spectral_window(name: str, nperseg: int) -> np.ndarray:
+    """Periodic (DFT-even) window of length nperseg."""
+    if name == "boxcar":
+        return np.ones(nperseg)
+    functions = {"hann": np.hanning, "hamming": np.hamming, "blackman": np.blackman}
+    if name not in functions:
+        raise ValueError(f"window must be one of {list(SPECTRUM_WINDOWS)}")
+    return functions[name](nperseg + 1)[:-1]
+
+
+def estimate_sample_rate(timestamps_us: np.ndarray) -> Optional[float]:
+    """Sample rate in Hz from the median interval between distinct timestamps."""
+    intervals = np.diff(timestamps_us)
+    intervals = intervals[intervals > 0]
+    if not intervals.size:
+        return None
+    return 1e6 / float(np.median(intervals))
+
+
+class UniformResampler:
+    """
+    Linear interpolation of irregular samples onto the grid origin + k * interval.
+
+    add() returns runs of (first grid index, values). Consecutive runs are
+    contiguous unless the data had a gap, in which case the next run starts
+    at the first grid point after it.
+    """
+
+    def __init__(self, sample_rate_hz: float, origin_us: Optional[float] = None):
+        self.interval_us = 1e6 / sample_rate_hz
+        self.origin_us = origin_us
+        self.samples = 0
+        self.gaps = 0
+        self._next_index: Optional[int] = None
+        self._last: Optional[Tuple[float, float]] = None
+
+    def add(self, timestamps_us: np.ndarray, values: np.ndarray) -> List[Tuple[int, np.ndarray]]:
+        valid = np.isfinite(values)
+        t, v = timestamps_us[valid], values[valid]
+        if not t.size:
+            return []
+        self.samples += t.size
+        if self.origin_us is None:
+            self.origin_us = float(t[0])
+
+        if self._last is not None:
+            # Interpolate across the block border from the previous block's last sample
+            t = np.concatenate(([self._last[0]], t))
+            v = np.concatenate(([self._last[1]], v))
+        self._last = (t[-1], v[-1])
+
+        distinct = np.concatenate(([True], np.diff(t) != 0))
+        t, v = t[distinct], v[distinct]
+
+        intervals = np.diff(t)
+        breaks = np.flatnonzero((intervals < 0) | (intervals > GAP_INTERVALS * self.interval_us)) + 1
+        edges = [0, *breaks.tolist(), t.size]
+
+        runs = []
+        for i, (first, last) in enumerate(zip(edges[:-1], edges[1:])):
+            piece_t, piece_v = t[first:last], v[first:last]
+            if i > 0 or self._next_index is None:
+                if i > 0:
+                    self.gaps += 1
+                self._next_index = int(np.ceil((piece_t[0] - self.origin_us) / self.interval_us))
+
+            end_index = int((piece_t[-1] - self.origin_us) // self.interval_us) + 1
+            if end_index <= self._next_index:
+                continue
+            grid = self.origin_us + self.interval_us * np.arange(self._next_index, end_index)
+            runs.append((self._next_index, np.interp(grid, piece_t, piece_v)))
+            self._next_index = end_index
+        return runs
+
+
+class ChannelWelch:
+    """Running Welch estimate of one channel."""
+
+    def __init__(self, sample_rate_hz: float, nperseg: int, noverlap: int):
+        self.nperseg = nperseg
+        self.step = nperseg - noverlap
+        self.psd_sum = np.zeros(nperseg // 2 + 1)
+        self.segments = 0
+        self.resampler = UniformResampler(sample_rate_hz)
+        # Resampled values not part of a complete segment yet, and the grid index after them
+        self._pending = np.empty(0)
+        self._pending_end: Optional[int] = None
+
+    def add(self, timestamps_us: np.ndarray, values: np.ndarray, window: np.ndarray):
+        """Resample a time-ordered block and add its complete segments."""
+        for start, run in self.resampler.add(timestamps_us, values):
+            if start != self._pending_end:
+                # Segments never span a gap
+                self._pending = np.empty(0)
+            self._pending_end = start + run.size
+            self._add_uniform(run, window)
+
+    def _add_uniform(self, values: np.ndarray, window: np.ndarray):
+        buffer = np.concatenate((self._pending, values))
+        if buffer.size < self.nperseg:
+            self._pending = buffer
+            return
+
+        count = (buffer.size - self.nperseg) // self.step + 1
+        segments = np.lib.stride_tricks.sliding_window_view(buffer, self.nperseg)[::self.step][:count]
+        # Constant detrend per segment, then all periodograms in one rfft
+        segments = (segments - segments.mean(axis=1, keepdims=True)) * window
+        spectra = np.fft.rfft(segments, axis=1)
+        self.psd_sum += (spectra.real ** 2 + spectra.imag ** 2).sum(axis=0)
+        self.segments += count
+        self._pending = buffer[count * self.step:].copy()
+
+
+class WelchAccumulator:
+    """Welch estimates of all channels of one test relation, fed block by block."""
+
+    def __init__(self, sample_rate_hz: float, nperseg: int, noverlap: int, window: str = "hann"):
+        if not 0 <= noverlap < nperseg:
+            raise ValueError("noverlap must be smaller than nperseg")
+        spectral_window(window, 1)
+        self.sample_rate_hz = sample_rate_hz
+        self.nperseg = nperseg
+        self.noverlap = noverlap
+        self.window = window
+        self.channels: Dict[str, ChannelWelch] = {}
+
+    def update(self, blocks: Dict[str, ChannelBlock]):
+        window = spectral_window(self.window, self.nperseg)
+        for channel, (timestamps_us, values) in blocks.items():
+            if channel not in self.channels:
+                self.channels[channel] = ChannelWelch(self.sample_rate_hz, self.nperseg, self.noverlap)
+            self.channels[channel].add(timestamps_us, values, window)
+
+    def result(self) -> Dict:
+        """
+        One-sided PSD (unit^2/Hz) per channel that has at least one segment.
+
+        rms is the RMS of the detrended signal (square root of the integrated
+        PSD) and peak_frequency_hz the strongest non-DC frequency.
+        """
+        window = spectral_window(self.window, self.nperseg)
+        scale = 1.0 / (self.sample_rate_hz * float(np.sum(window ** 2)))
+        frequencies = np.fft.rfftfreq(self.nperseg, d=1.0 / self.sample_rate_hz)
+        resolution = self.sample_rate_hz / self.nperseg
+
+        channels = {}
+        for channel, welch in sorted(self.channels.items()):
+            if not welch.segments:
+                continue
+            psd = welch.psd_sum * (scale / welch.segments)
+            # Fold the negative frequencies in, except DC and (even nperseg) Nyquist
+            psd[1:-1 if self.nperseg % 2 == 0 else None] *= 2
+            channels[channel] = {
+                "psd": psd,
+                "segments": welch.segments,
+                "samples": welch.resampler.samples,
+                "gaps": welch.resampler.gaps,
+                "rms": float(np.sqrt(psd.sum() * resolution)),
+                "peak_frequency_hz": float(frequencies[1:][np.argmax(psd[1:])]) if psd.size > 1 else 0.0,
+            }
+        return {"frequencies": frequencies, "channels": channels}
+
+
+def welch_update(accumulator: WelchAccumulator, blocks: Dict[str, ChannelBlock]) -> WelchAccumulator:
+    """Feed one block to an accumulator (process pool entry point)."""
+    accumulator.update(blocks)
+    return accumulator
@@ -4,49 +4,106 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+SCHEMA_DIR = "/app/schemas"
+
+# Schema files that made up the database before applied files were tracked.
+# Databases that already have metadata.sensors are assumed to contain these.
+BASELINE_SCHEMA_FILES = [
+    "01_schema_base.sql",
+    "02_schema_agg.sql",
+    "03_schema_segments.sql",
+    "04_schema_machine_type_templates.sql",
+]
+
+# Schema files that cannot run inside a transaction block (they create
+# continuous aggregates and end the implicit transaction with COMMIT).
+# They are recorded only after they ran completely and must be safe to
+# run again (IF NOT EXISTS), since a failure leaves their first part applied.
+NON_TRANSACTIONAL_SCHEMA_FILES = [
+    "02_schema_agg.sql",
+    "14_schema_measurement_stats.sql",
+]
+
+
 async def init_db(pool: asyncpg.Pool):
     """
-    Initialize the database by running SQL schema files if tables are missing.
+    Initialize the database by running SQL schema files that were not applied yet.
+
+    Applied files are recorded in metadata.schema_migrations, so schema files
+    added later are also applied (once) to existing databases. Each file runs
+    in one transaction with its record, so a failing file leaves nothing
+    behind and is applied again on the next start.
     """
     try:
-        # Simple check: if 'sensors' table exists, assume DB is initialized.
-        # In a real migration system, we would check a migrations table.
         async with pool.acquire() as connection:
             table_exists = await connection.fetchval("""
                 SELECT EXISTS (
-                    SELECT FROM information_schema.tables 
-                    WHERE table_schema = 'metadata' 
+                    SELECT FROM information_schema.tables
+                    WHERE table_schema = 'metadata'
                     AND table_name = 'sensors'
                 );
             """)
 
-            if table_exists:
-                logger.info("✅ Database already initialized (table 'sensors' found).")
-                return
+            await connection.execute("""
+                CREATE SCHEMA IF NOT EXISTS metadata;
+                CREATE TABLE IF NOT EXISTS metadata.schema_migrations (
+                    filename TEXT PRIMARY KEY,
+                    applied_at TIMESTAMPTZ DEFAULT now()
+                );
+            """)
 
-            logger.info("⚠️ Database empty or missing tables. Starting initialization...")
+            applied = {
+                row["filename"]
+                for row in await connection.fetch("SELECT filename FROM metadata.schema_migrations")
+            }
 
-            schema_dir = "/app/schemas"
-            if not os.path.exists(schema_dir):
-                logger.error(f"❌ Schema directory not found: {schema_dir}")
+            if table_exists and not applied:
+                # Database created before schema files were tracked
+                logger.info("✅ Existing database found, recording baseline schema files.")
+                await connection.executemany(
+                    "INSERT INTO metadata.schema_migrations (filename) VALUES ($1) ON CONFLICT DO NOTHING",
+                    [(f,) for f in BASELINE_SCHEMA_FILES]
+                )
+                applied = set(BASELINE_SCHEMA_FILES)
+
+            if not os.path.exists(SCHEMA_DIR):
+                logger.error(f"❌ Schema directory not found: {SCHEMA_DIR}")
                 return
 
             # List of schema files in order
-            schema_files = sorted([f for f in os.listdir(schema_dir) if f.endswith(".sql")])
-            
+            schema_files = sorted([f for f in os.listdir(SCHEMA_DIR) if f.endswith(".sql")])
+
             if not schema_files:
-                logger.warning(f"⚠️ No SQL files found in {schema_dir}")
+                logger.warning(f"⚠️ No SQL files found in {SCHEMA_DIR}")
+                return
+
+            pending = [f for f in schema_files if f not in applied]
+            if not pending:
+                logger.info("✅ Database schema is up to date.")
                 return
 
-            for filename in schema_files:
-                file_path = os.path.join(schema_dir, filename)
+            logger.info(f"⚠️ Applying {len(pending)} schema file(s)...")
+
+            for filename in pending:
+                file_path = os.path.join(SCHEMA_DIR, filename)
                 logger.info(f"📜 Executing {filename}...")
-                
+
                 with open(file_path, "r") as f:
                     sql_content = f.read()
-                    
-                # Execute the SQL script
-                await connection.execute(sql_content)
+
+                if filename in NON_TRANSACTIONAL_SCHEMA_FILES:
+                    await connection.execute(sql_content)
+                    await connection.execute(
+                        "INSERT INTO metadata.schema_migrations (filename) VALUES ($1)",
+                        filename
+                    )
+                else:
+                    async with connection.transaction():
+                        await connection.execute(sql_content)
+                        await connection.execute(
+                            "INSERT INTO metadata.schema_migrations (filename) VALUES ($1)",
+                            filename
+                        )
                 logger.info(f"✅ Executed {filename}")
 
             logger.info("🎉 Database initialization complete.")
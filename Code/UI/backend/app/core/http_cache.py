@@ -0,0 +1,180 @@
+"""
+Conditional GET and response caching of measurement queries.
+
+The measurements of a finished test (not running, relation inactive) only
+change through a crop or raw data retention. A relation's data version -
+its last raw timestamp, its sample count from the 10s aggregate and its
+data_generation, which crops and retention bump - is therefore a complete
+validator of any query over it:
+
+- responses carry an ETag derived from the version, the endpoint and its
+  query parameters, plus Last-Modified; If-None-Match / If-Modified-Since
+  are answered with 304 without running the query
+- bodies are kept in a size-bounded in-process LRU keyed by the ETag, so
+  reopening a dashboard of a finished test neither queries nor serializes
+
+Responses of running tests change with every ingest flush and are built
+as before, without validators. So are responses of tests whose last change
+is more recent than AGGREGATE_SETTLE_SECONDS (database/measurements.py):
+the refresh policy of the 10s aggregates may still fill in their final
+buckets, which changes /avg and /stats bodies without moving Last-Modified.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+import database.measurements as measurements_db
+from database import get_test_by_id, get_test_relation_by_id
+
+logger = logging.getLogger(__name__)
+
+# Test states in which no new measurements arrive
+FINISHED_TEST_STATUSES = ("idle", "archived")
+
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_MB", 256)) * 1024 * 1024
+
+# Larger bodies would evict most of the cache for a single response
+RESPONSE_CACHE_MAX_ENTRY_BYTES = RESPONSE_CACHE_MAX_BYTES // 8
+
+
+class ResponseCache:
+    """LRU of response bodies, bounded by their total size."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, body: bytes, media_type: str):
+        if len(body) > min(self.max_bytes, RESPONSE_CACHE_MAX_ENTRY_BYTES) or key in self.entries:
+            return
+        self.entries[key] = (body, media_type)
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, (evicted, _) = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.entries),
+            "size_bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_BYTES)
+
+
+async def finished_data_version(test_relation_ids: List[int]) -> Optional[Dict]:
+    """
+    Data version of relations of finished tests, None if their data may still change.
+
+    That includes the aggregate settle window after the last sample or crop.
+    """
+    for test_relation_id in test_relation_ids:
+        relation = await get_test_relation_by_id(test_relation_id)
+        if relation is None or relation["active"] or relation["test_id"] is None:
+            return None
+        test = await get_test_by_id(relation["test_id"])
+        if test is None or test["test_status"] not in FINISHED_TEST_STATUSES:
+            return None
+
+    version = await measurements_db.get_measurement_data_version(test_relation_ids)
+    if not version["settled"]:
+        return None
+    return version
+
+
+def _etag(request: Request, test_relation_ids: List[int], version: Dict) -> str:
+    stamp = {
+        "path": request.url.path,
+        "query": sorted(request.query_params.multi_items()),
+        "test_relation_ids": test_relation_ids,
+        "max_timestamp": version["max_timestamp"],
+        "num_samples": version["num_samples"],
+        "data_generation": version["data_generation"],
+    }
+    return '"' + hashlib.sha256(json.dumps(stamp, default=str).encode()).hexdigest()[:32] + '"'
+
+
+def _not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-Modified-Since is ignored when If-None-Match is present (RFC 9110)
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+
+async def conditional_response(
+    request: Request,
+    test_relation_ids: List[int],
+    build: Callable[[], Awaitable[Response]],
+) -> Response:
+    """
+    Answer a measurement query of relations with validators and from the cache where possible.
+
+    build runs the query and returns the response; it is only called when
+    the client's copy is outdated and the body is not cached.
+    """
+    try:
+        version = await finished_data_version(test_relation_ids)
+    except Exception as e:
+        logger.warning(f"Could not get the data version of relations {test_relation_ids}: {e}")
+        version = None
+    if version is None:
+        return await build()
+
+    etag = _etag(request, test_relation_ids, version)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if version["last_modified"] is not None:
+        headers["Last-Modified"] = format_datetime(version["last_modified"].astimezone(timezone.utc), usegmt=True)
+
+    if _not_modified(request, etag, version["last_modified"]):
+        return Response(status_code=304, headers=headers)
+
+    cached = response_cache.get(etag)
+    if cached is not None:
+        body, media_type = cached
+        return Response(content=body, media_type=media_type, headers=headers)
+
+    response = await build()
+    if response.status_code == 200:
+        response_cache.put(etag, bytes(response.body), response.media_type)
+        response.headers.update(headers)
+    return response
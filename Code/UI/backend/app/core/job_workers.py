@@ -0,0 +1,88 @@
+"""
+Worker pool for database-backed job queues.
+
+Jobs are rows in a queue table; workers claim them with
+FOR UPDATE SKIP LOCKED (see database/export_jobs.py), so the queue
+survives restarts and several workers never run the same job.
+
+On start, every job still marked 'processing' is requeued, as it can only
+have been left by a previous process. That assumes a single backend
+process runs the job workers (the compose setup starts one uvicorn
+process); with several backend replicas only one of them may start the
+worker pools, or it would requeue jobs another replica is running.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Idle workers re-check the queue at this interval even without a wakeup
+QUEUE_POLL_SECONDS = 5
+
+
+class JobWorkerPool:
+    """Fixed set of asyncio workers that process one job queue."""
+
+    def __init__(
+        self,
+        name: str,
+        claim: Callable[[], Awaitable[Optional[Dict]]],
+        run: Callable[[Dict], Awaitable[None]],
+        requeue: Callable[[int], Awaitable[int]],
+        workers: int = 1,
+        max_attempts: int = 3,
+    ):
+        self.name = name
+        self.workers = max(1, workers)
+        self.max_attempts = max_attempts
+        self._claim = claim
+        self._run = run
+        self._requeue = requeue
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        """Requeue jobs interrupted by the previous process and start the workers (see module docstring)."""
+        requeued = await self._requeue(self.max_attempts)
+        if requeued:
+            logger.info(f"Requeued {requeued} interrupted {self.name} job(s)")
+
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancel the workers; running jobs are picked up again after restart."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Wake idle workers after a job was queued."""
+        self._wakeup.set()
+
+    async def _worker(self):
+        while True:
+            # Cleared before claiming, so a job queued meanwhile still wakes us
+            self._wakeup.clear()
+            try:
+                job = await self._claim()
+            except Exception as e:
+                logger.error(f"Could not claim {self.name} job: {e}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), QUEUE_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._run(job)
+            except Exception:
+                # The run functions record failures themselves; this is a failure
+                # of that bookkeeping (e.g. a lost connection). The job stays
+                # 'processing' until the next start, the worker goes on.
+                logger.exception(f"Unhandled error in {self.name} job {job.get('id')}")
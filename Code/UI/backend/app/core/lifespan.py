@@ -10,7 +10,7 @@ import os
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
-from database import set_db_pool
+from database import metadata_cache, set_db_pool
 from database import (
     get_all_sensor_types, create_sensor_type,
     get_all_machine_types, create_machine_type, 
@@ -19,6 +19,11 @@ from database import (
 )
 from app.core.db_init import init_db
 from app.mqtt_client import connect_mqtt, disconnect_mqtt
+from app.export import export_worker_pool
+from app.maintenance import delete_worker, storage_maintenance
+from app.live import live_hub
+from app.analysis import segment_stats_worker, spectrogram_worker
+from app.core.process_pool import shutdown_process_pool
 
 
 async def create_default_data():
@@ -199,12 +204,29 @@ async def lifespan(app: FastAPI):
         
         # Initialize database schema
         await init_db(db_pool)
+
+        # Serve metadata reads from memory, invalidated by change notifications
+        await metadata_cache.start(database_url)
         
         # Create default data
         print("📝 Creating default data...")
         await create_default_data()
         print("✅ Default data initialized")
 
+        # Apply chunking / compression policies and start the raw data retention
+        await storage_maintenance.start()
+        print("✅ Measurement storage policies applied")
+
+        # Start export, delete, spectrogram and segment statistics job workers
+        await export_worker_pool.start()
+        await delete_worker.start()
+        await spectrogram_worker.start()
+        await segment_stats_worker.start()
+        print("✅ Export, delete, spectrogram and segment statistics workers started")
+
+        # Fan out live samples from the MQTT worker (subscribes on connect)
+        live_hub.start()
+
         # Connect to MQTT broker
         print("🔌 Connecting to MQTT broker...")
         connect_mqtt()
@@ -227,6 +249,16 @@ async def lifespan(app: FastAPI):
         disconnect_mqtt()
         print("✅ MQTT disconnected")
 
+        # Stop background workers and worker processes
+        await export_worker_pool.stop()
+        await delete_worker.stop()
+        await spectrogram_worker.stop()
+        await segment_stats_worker.stop()
+        await storage_maintenance.stop()
+        await metadata_cache.stop()
+        shutdown_process_pool()
+        print("✅ Process pool stopped")
+
         # Close database pool
         if 'db_pool' in locals():
             await db_pool.close()
@@ -0,0 +1,38 @@
+"""
+Process pool for CPU-heavy work.
+
+Export block conversion and spectral analysis run here instead of on the
+event loop that serves the API and the live dashboards. One pool is shared
+by all of them, so the number of busy cores stays bounded.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+# Worker processes (EXPORT_PROCESSES is the older name of this setting)
+PROCESS_POOL_WORKERS = int(os.getenv("PROCESS_POOL_WORKERS", os.getenv("EXPORT_PROCESSES", 2)))
+
+# Created on first use
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Get the shared process pool, creating it on first use."""
+    global _process_pool
+    if _process_pool is None:
+        # spawn: forking a process that runs uvicorn and the MQTT thread is unsafe
+        _process_pool = ProcessPoolExecutor(
+            max_workers=PROCESS_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_pool
+
+
+def shutdown_process_pool():
+    """Shut down the shared process pool (called on application shutdown)."""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
@@ -0,0 +1,142 @@
+"""
+Serialization helpers for measurement responses.
+
+These functions turn asyncpg records into wire formats (JSON, NDJSON and
+columnar JSON) with orjson, without building a Pydantic model per sample.
+
+orjson cannot encode asyncpg.Record itself, so the row formats (JSON, NDJSON)
+still convert every record to a dict, in orjson's default hook. The columnar
+format is the fast path: every column is read from the records once and
+encoded as a NumPy array, with no per-sample object on the way.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+import asyncpg
+import numpy as np
+import orjson
+from fastapi.responses import Response
+
+# Key used for samples stored without a measurement_channel
+DEFAULT_CHANNEL = "value"
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_ONE_MS = timedelta(milliseconds=1)
+
+
+def to_epoch_ms(ts: datetime) -> int:
+    """Convert a datetime to integer milliseconds since the Unix epoch."""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return (ts - _EPOCH) // _ONE_MS
+
+
+def to_epoch_ms_array(timestamps: List[datetime]) -> np.ndarray:
+    """Convert datetimes to an int64 array of epoch milliseconds, like to_epoch_ms."""
+    if not timestamps or timestamps[0].tzinfo is None:
+        # datetime.timestamp() would read naive datetimes as local time
+        return np.array([to_epoch_ms(ts) for ts in timestamps], dtype=np.int64)
+    seconds = np.fromiter((ts.timestamp() for ts in timestamps), dtype=np.float64, count=len(timestamps))
+    # Rounded to whole microseconds first, the precision of timestamptz
+    return np.rint(seconds * 1e6).astype(np.int64) // 1000
+
+
+# UTC datetimes as "...Z" to match Pydantic's JSON output
+_ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, asyncpg.Record):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode an object (asyncpg records included) as compact UTF-8 JSON."""
+    return orjson.dumps(obj, default=_json_default, option=_ORJSON_OPTIONS)
+
+
+def records_to_ndjson(records: Iterable[Mapping[str, Any]]) -> bytes:
+    """Encode records as newline-delimited JSON, one object per record."""
+    options = _ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE
+    return b"".join(orjson.dumps(record, default=_json_default, option=options) for record in records)
+
+
+class RecordJSONResponse(Response):
+    """
+    JSON response rendered with orjson.
+
+    Accepts asyncpg records (or lists of them) directly, so endpoints can
+    return query results without per-row response_model validation and
+    stdlib json encoding. Records are still converted to dicts one by one
+    in the default hook; large series should use records_to_columnar.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def records_to_columnar(
+    records: Iterable[Mapping[str, Any]],
+    value_field: str = "measurement_value",
+    extra_fields: Optional[Dict[str, str]] = None,
+    timestamp_field: str = "measurement_timestamp",
+) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Group records by channel into {channel: {"t": [...], "v": [...]}}.
+
+    Timestamps are epoch-ms integers. extra_fields maps output keys to record
+    fields for additional per-sample arrays (e.g. {"min": "min_value"}).
+    The arrays are NumPy arrays (int64 timestamps, float64 values, missing
+    values as NaN), which orjson encodes as JSON arrays (NaN as null).
+    Channels appear in the order of their first record.
+    """
+    records = records if isinstance(records, list) else list(records)
+    if not records:
+        return {}
+
+    fields = {"v": value_field, **(extra_fields or {})}
+    channels = [record["measurement_channel"] or DEFAULT_CHANNEL for record in records]
+    columns = {"t": to_epoch_ms_array([record[timestamp_field] for record in records])}
+    for key, field in fields.items():
+        columns[key] = np.array([record[field] for record in records], dtype=np.float64)
+
+    names = list(dict.fromkeys(channels))
+    if len(names) == 1:
+        return {names[0]: columns}
+
+    index = {name: i for i, name in enumerate(names)}
+    codes = np.fromiter((index[channel] for channel in channels), dtype=np.int32, count=len(channels))
+    result: Dict[str, Dict[str, np.ndarray]] = {}
+    for i, name in enumerate(names):
+        mask = codes == i
+        result[name] = {key: column[mask] for key, column in columns.items()}
+    return result
+
+
+def records_to_grouped_columnar(
+    records: Iterable[Mapping[str, Any]],
+    group_ids: Iterable[int],
+    value_field: str = "measurement_value",
+    extra_fields: Optional[Dict[str, str]] = None,
+    group_field: str = "test_relation_id",
+) -> Dict[str, Dict[str, Dict[str, np.ndarray]]]:
+    """
+    Group records of several relations into {"relation_id": {channel: {"t": [...], "v": [...]}}}.
+
+    The ids are string keys, as JSON object keys are. Every id of group_ids
+    is present, relations without records map to {}. The records of one
+    relation need not be contiguous.
+    """
+    grouped: Dict[str, List[Mapping[str, Any]]] = {str(group_id): [] for group_id in group_ids}
+    for record in records:
+        grouped.setdefault(str(record[group_field]), []).append(record)
+    return {
+        group_id: records_to_columnar(group, value_field=value_field, extra_fields=extra_fields)
+        for group_id, group in grouped.items()
+    }
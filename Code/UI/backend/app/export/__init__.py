@@ -0,0 +1,26 @@
+"""
+Measurement export components.
+
+This package contains the streaming export engine used by the
+measurement export endpoints, the time alignment of multi-sensor
+exports, the export file writers and the persistent export job queue.
+"""
+
+from .alignment import ALIGNMENT_STRATEGIES
+from .engine import export_measurements, iter_export_blocks
+from .jobs import EXPORT_DIR, export_slots, export_worker_pool, load_export_scope, submit_export_job
+from .writers import EXPORT_FORMATS, get_export_writer, stream_csv
+
+__all__ = [
+    "ALIGNMENT_STRATEGIES",
+    "export_measurements",
+    "iter_export_blocks",
+    "EXPORT_DIR",
+    "export_slots",
+    "export_worker_pool",
+    "load_export_scope",
+    "submit_export_job",
+    "EXPORT_FORMATS",
+    "get_export_writer",
+    "stream_csv"
+]
@@ -0,0 +1,152 @@
+"""
+Time alignment of multi-sensor export blocks.
+
+Every ESP32 samples on its own clock, so joining sensors on exact timestamp
+equality yields one row per distinct timestamp with mostly empty columns.
+The strategies below put all sensors on a common time axis instead:
+
+- exact:    outer join on timestamp (no alignment)
+- resample: mean per bin of a common sample rate (min/max for aggregate bounds)
+- asof:     timestamps of a reference sensor; every other sensor contributes
+            its nearest sample within a tolerance
+- ffill:    outer join with every column forward filled, optionally only
+            while the last real sample is younger than a tolerance
+
+The export engine hands over one time-ordered block at a time. Strategies
+that look across block borders (asof, ffill) return a small carry that is
+passed back with the next block, so blocks stay independent of each other
+and can be built in the shared process pool.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+ALIGNMENT_STRATEGIES = ["exact", "resample", "asof", "ffill"]
+
+# Resample aggregation per value field (default: mean)
+RESAMPLE_AGGREGATIONS = {"min_value": "min", "max_value": "max"}
+
+# Carry key of the reference rows held back by asof
+_PENDING = "pending"
+
+
+def resample_period(rate_hz: float) -> pd.Timedelta:
+    return pd.Timedelta(int(round(1e9 / rate_hz)), unit="ns")
+
+
+def align_cut(strategy: str, watermark: Optional[pd.Timestamp], rate_hz: Optional[float]) -> Optional[pd.Timestamp]:
+    """
+    Timestamp before which buffered rows may be handed to align_block.
+
+    Resampling cuts on a bin border so that no bin is split over two blocks.
+    """
+    if watermark is None or strategy != "resample":
+        return watermark
+    return watermark.floor(resample_period(rate_hz))
+
+
+def _join(frames: List[pd.DataFrame], column_names: List[str]) -> pd.DataFrame:
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=column_names, dtype="float64")
+    return pd.concat(frames, axis=1, join="outer").sort_index().reindex(columns=column_names)
+
+
+def align_resample(frames: Dict[int, pd.DataFrame], aggregations: Dict[str, str], column_names: List[str],
+                   rate_hz: float) -> pd.DataFrame:
+    period = resample_period(rate_hz)
+    binned = [
+        frame.groupby(frame.index.floor(period)).agg({c: aggregations.get(c, "mean") for c in frame.columns})
+        for frame in frames.values() if not frame.empty
+    ]
+    return _join(binned, column_names)
+
+
+def align_asof(frames: Dict[int, pd.DataFrame], column_names: List[str], reference_id: int,
+               tolerance: pd.Timedelta, carry: Optional[Dict[Any, pd.DataFrame]],
+               emit_before: Optional[pd.Timestamp]):
+    """
+    Nearest-sample join onto the reference timestamps.
+
+    A reference row's nearest sample can lie in the next block, so reference
+    rows within tolerance of the block end are held back, and the other
+    sensors' last samples within reach of them are carried along as context.
+    """
+    carry = carry or {}
+    # Prepend the context of the previous block
+    frames = {
+        key: pd.concat([carry[key], frames[key]]) if key in carry and key in frames else frames.get(key, carry.get(key))
+        for key in set(frames) | (set(carry) - {_PENDING})
+    }
+
+    reference = frames.pop(reference_id, None)
+    if _PENDING in carry:
+        reference = carry[_PENDING] if reference is None else pd.concat([carry[_PENDING], reference])
+    if reference is None:
+        reference = pd.DataFrame(index=pd.DatetimeIndex([], tz="UTC"))
+
+    new_carry: Dict[Any, pd.DataFrame] = {}
+    if emit_before is not None:
+        new_carry[_PENDING] = reference[reference.index >= emit_before]
+        reference = reference[reference.index < emit_before]
+        context_start = emit_before - tolerance
+        for key, frame in frames.items():
+            new_carry[key] = frame[frame.index >= context_start]
+
+    block = reference.copy()
+    for frame in frames.values():
+        if frame.empty or block.empty:
+            continue
+        matched = pd.merge_asof(
+            block.index.to_frame(name="_t"), frame,
+            left_index=True, right_index=True, direction="nearest", tolerance=tolerance
+        )
+        block[frame.columns] = matched[frame.columns]
+
+    return block.reindex(columns=column_names), new_carry
+
+
+def align_ffill(frames: Dict[int, pd.DataFrame], column_names: List[str], tolerance: Optional[pd.Timedelta],
+                carry: Optional[Dict[str, pd.DataFrame]]):
+    """Outer join with forward-filled columns; the carry is the last filled row."""
+    block = _join(list(frames.values()), column_names)
+    if block.empty:
+        return block, carry
+
+    times = block.index.to_series()
+    seen = pd.DataFrame({c: times.where(block[c].notna()) for c in column_names}, index=block.index)
+    if carry:
+        block = pd.concat([carry["values"], block])
+        seen = pd.concat([carry["seen"], seen])
+
+    block = block.ffill()
+    seen = seen.ffill()
+    new_carry = {"values": block.iloc[-1:], "seen": seen.iloc[-1:]}
+    if carry:
+        block, seen = block.iloc[1:], seen.iloc[1:]
+
+    if tolerance is not None:
+        age = seen.rsub(block.index.to_series(), axis=0)
+        block = block.where(age <= tolerance)
+    return block, new_carry
+
+
+def align_block(frames: Dict[int, pd.DataFrame], column_names: List[str], aggregations: Dict[str, str],
+                alignment: Dict[str, Any], carry: Any = None, emit_before: Optional[pd.Timestamp] = None):
+    """
+    Align the wide per-relation frames of one block.
+
+    alignment is the resolved ExportAlignment as a dict (reference_relation_id
+    and tolerance_ms filled in for asof). Returns (block, carry).
+    """
+    strategy = alignment["strategy"]
+    tolerance = pd.Timedelta(milliseconds=alignment["tolerance_ms"]) if alignment.get("tolerance_ms") else None
+
+    if strategy == "resample":
+        return align_resample(frames, aggregations, column_names, alignment["rate_hz"]), None
+    if strategy == "asof":
+        return align_asof(frames, column_names, alignment["reference_relation_id"], tolerance, carry, emit_before)
+    if strategy == "ffill":
+        return align_ffill(frames, column_names, tolerance, carry)
+    return _join(list(frames.values()), column_names), None
@@ -0,0 +1,415 @@
+"""
+Streaming export engine.
+
+Every test relation is read in time order with keyset pagination: each page
+is one short query on a pooled connection, and no cursor stays open between
+pages. Sensors are aligned on timestamp with a block-wise k-way merge: at each step
+all rows older than the smallest "last buffered timestamp" of the open streams
+are final, so they are pivoted, joined and appended to the output, while the
+remainder stays buffered. Peak memory is therefore bounded by page size times
+the number of sensors, not by the length of the test.
+
+Pages of all relations are read ahead concurrently (at most
+EXPORT_CONCURRENCY fetches in flight), the pivot/join/Arrow conversion runs
+in the shared process pool and file encoding in a thread, so exports do not stall
+the event loop that serves the live dashboards.
+
+Connection budget: a connection is only held while a page is fetched, so
+an export uses at most EXPORT_CONCURRENCY pool connections regardless of
+its number of sensors. Queued exports and streamed downloads share
+EXPORT_WORKERS slots (see jobs.export_slots), so together they hold at most
+EXPORT_WORKERS * EXPORT_CONCURRENCY connections (8 with the defaults) of
+the pool's 20, leaving the rest to the API and the maintenance workers.
+
+iter_export_blocks yields the merged result as Arrow tables; export_measurements
+feeds them to one of the format writers in app.export.writers.
+"""
+
+import asyncio
+import inspect
+import logging
+import os
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+import database.measurements as measurements_db
+from app.core.process_pool import get_process_pool
+from app.models import ExportAlignment
+from .alignment import RESAMPLE_AGGREGATIONS, align_block, align_cut
+from .writers import TIMESTAMP_COLUMN, get_export_writer
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per database round trip, per sensor
+PAGE_SIZE = 50_000
+
+# Minimum rows per block handed to the writer (parquet row group, CSV chunk)
+BLOCK_ROWS = 100_000
+
+# Maximum number of page fetches - and so pool connections - in flight per export
+EXPORT_CONCURRENCY = int(os.getenv("EXPORT_CONCURRENCY", 4))
+
+# Exported value fields per data type, mapped to their column-name suffix
+VALUE_FIELDS: Dict[str, Dict[str, Optional[str]]] = {
+    "raw": {"measurement_value": None},
+    "aggregated": {"avg_value": "avg", "min_value": "min", "max_value": "max"},
+}
+
+
+def column_name(relation: Dict, channel: str, suffix: Optional[str]) -> str:
+    """Build an export column name like 'Accelerometer 1_drum_x_avg_g'."""
+    parts = [relation["sensor_name"], relation.get("sensor_location") or "N/A"]
+    if channel:
+        parts.append(channel)
+    if suffix:
+        parts.append(suffix)
+    parts.append(relation.get("sensor_type_unit") or "")
+    return "_".join(parts)
+
+
+# A slice of one relation's long-format rows plus what is needed to pivot it:
+# (relation id, rows, value fields, (field, channel) columns, output column names)
+BlockSlice = Tuple[int, pd.DataFrame, List[str], List[Tuple[str, str]], List[str]]
+
+
+def pivot_wide(
+    taken: pd.DataFrame,
+    value_fields: List[str],
+    columns: List[Tuple[str, str]],
+    column_names: List[str],
+) -> pd.DataFrame:
+    """Pivot long rows (timestamp, channel, fields) to one row per timestamp."""
+    wide = taken.groupby([TIMESTAMP_COLUMN, "channel"])[value_fields].first().unstack("channel")
+    wide = wide.reindex(columns=pd.MultiIndex.from_tuples(columns))
+    wide.columns = column_names
+    return wide
+
+
+def build_block(
+    slices: List[BlockSlice],
+    column_names: List[str],
+    schema: pa.Schema,
+    alignment: Dict[str, Any],
+    carry: Any = None,
+    emit_before: Optional[pd.Timestamp] = None,
+) -> Tuple[pa.Table, Any]:
+    """
+    Pivot every relation slice and align them on a common time axis.
+
+    Runs in the shared process pool, so it only takes picklable arguments;
+    the alignment carry is returned to be passed in with the next block.
+    """
+    frames = {}
+    aggregations = {}
+    for relation_id, taken, value_fields, columns, names in slices:
+        frames[relation_id] = pivot_wide(taken, value_fields, columns, names)
+        for (field, _), name in zip(columns, names):
+            if field in RESAMPLE_AGGREGATIONS:
+                aggregations[name] = RESAMPLE_AGGREGATIONS[field]
+
+    block, carry = align_block(frames, column_names, aggregations, alignment, carry, emit_before)
+    block.index.name = TIMESTAMP_COLUMN
+    return pa.Table.from_pandas(block.reset_index(), schema=schema, preserve_index=False), carry
+
+
+class RelationStream:
+    """Time-ordered, page-buffered reader over one test relation's measurements."""
+
+    def __init__(
+        self,
+        relation: Dict,
+        data_type: str,
+        semaphore: asyncio.Semaphore,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        page_size: int = PAGE_SIZE,
+    ):
+        self.relation = relation
+        self.value_fields = VALUE_FIELDS[data_type]
+        self.exhausted = False
+        self.rows_read = 0
+        self.columns: List[Tuple[str, str]] = []
+        self.column_names: List[str] = []
+        self.buffer = pd.DataFrame()
+        self._semaphore = semaphore
+        self._read_ahead: Optional[asyncio.Task] = None
+
+        if data_type == "aggregated":
+            self._pages = measurements_db.page_sensor_measurements_avg(
+                relation["id"], start_time=start_time, end_time=end_time, page_size=page_size
+            )
+        else:
+            self._pages = measurements_db.page_sensor_measurements_raw(
+                relation["id"], start_time=start_time, end_time=end_time, page_size=page_size
+            )
+
+    @property
+    def last_timestamp(self) -> Optional[pd.Timestamp]:
+        if self.buffer.empty:
+            return None
+        return self.buffer[TIMESTAMP_COLUMN].iloc[-1]
+
+    def progress(self) -> Dict:
+        """Per-relation progress entry for job status reporting."""
+        return {
+            "test_relation_id": self.relation["id"],
+            "sensor_name": self.relation["sensor_name"],
+            "rows_read": self.rows_read,
+            "finished": self.exhausted,
+        }
+
+    async def _read_page(self) -> Optional[pd.DataFrame]:
+        async with self._semaphore:
+            try:
+                page = await self._pages.__anext__()
+            except StopAsyncIteration:
+                return None
+        self.rows_read += len(page)
+        return self.page_to_frame(page)
+
+    async def fetch(self):
+        """
+        Append the next page to the buffer, or mark the stream exhausted.
+
+        The page after it is requested right away in the background, so the
+        database keeps working while the current block is being converted.
+        """
+        if self._read_ahead is None:
+            self._read_ahead = asyncio.create_task(self._read_page())
+        frame = await self._read_ahead
+        self._read_ahead = None
+
+        if frame is None:
+            self.exhausted = True
+            return
+
+        self.buffer = frame if self.buffer.empty else pd.concat([self.buffer, frame], ignore_index=True)
+        self._read_ahead = asyncio.create_task(self._read_page())
+
+    def page_to_frame(self, page) -> pd.DataFrame:
+        """Convert a page of records into a long frame (timestamp, channel, value fields)."""
+        data = {
+            TIMESTAMP_COLUMN: pd.to_datetime([r["measurement_timestamp"] for r in page], utc=True),
+            "channel": [r["measurement_channel"] or "" for r in page],
+        }
+        for field in self.value_fields:
+            data[field] = [r[field] for r in page]
+        return pd.DataFrame(data)
+
+    def init_columns(self, channels: List[str]):
+        """
+        Fix the output columns from the given channels and those of the first page.
+
+        channels come from the 10s aggregate of the exported range, the first
+        page adds those of the not yet materialized tail. A channel that still
+        shows up later fails the export rather than changing the file schema.
+        """
+        if not self.buffer.empty:
+            channels = [*channels, *self.buffer["channel"].unique()]
+        channels = sorted(set(channels))
+        self.columns = [(field, channel) for field in self.value_fields for channel in channels]
+        self.column_names = [
+            column_name(self.relation, channel, self.value_fields[field])
+            for field, channel in self.columns
+        ]
+
+    def sample_interval(self) -> Optional[pd.Timedelta]:
+        """Median interval between buffered timestamps (None if unknown)."""
+        timestamps = self.buffer[TIMESTAMP_COLUMN].drop_duplicates() if not self.buffer.empty else None
+        if timestamps is None or len(timestamps) < 2:
+            return None
+        return timestamps.diff().median()
+
+    def take_before(self, watermark: Optional[pd.Timestamp]) -> Optional[BlockSlice]:
+        """
+        Remove buffered rows older than watermark (all rows if None) and return
+        them as a slice for build_block, or None if there is nothing to take.
+        """
+        if self.buffer.empty:
+            return None
+        if watermark is None:
+            taken, self.buffer = self.buffer, pd.DataFrame()
+        else:
+            idx = int(self.buffer[TIMESTAMP_COLUMN].searchsorted(watermark, side="left"))
+            taken, self.buffer = self.buffer.iloc[:idx], self.buffer.iloc[idx:]
+
+        if taken.empty or not self.columns:
+            return None
+
+        known = {channel for _, channel in self.columns}
+        unknown = set(taken["channel"].unique()) - known
+        if unknown:
+            raise ValueError(f"Relation {self.relation['id']}: channels {sorted(unknown)} appeared during the export")
+
+        return self.relation["id"], taken, list(self.value_fields), self.columns, self.column_names
+
+    async def close(self):
+        if self._read_ahead is not None:
+            self._read_ahead.cancel()
+            try:
+                await self._read_ahead
+            except (asyncio.CancelledError, Exception):
+                pass
+        await self._pages.aclose()
+
+
+async def _report(on_progress: Callable, fraction: float, streams: List[RelationStream]):
+    result = on_progress(fraction, [s.progress() for s in streams])
+    if inspect.isawaitable(result):
+        await result
+
+
+def resolve_alignment(alignment: Optional[ExportAlignment], streams: List[RelationStream]) -> Dict[str, Any]:
+    """
+    Fill in the asof defaults from the first pages: the reference is the
+    sensor with the shortest sample interval and the tolerance one sample
+    interval of the reference.
+    """
+    settings = (alignment or ExportAlignment()).model_dump()
+    if settings["strategy"] != "asof":
+        return settings
+
+    candidates = [s for s in streams if s.column_names]
+    reference = next((s for s in candidates if s.relation["id"] == settings["reference_relation_id"]), None)
+    if reference is None:
+        timed = [(s.sample_interval(), s) for s in candidates]
+        reference = min(
+            (pair for pair in timed if pair[0] is not None), key=lambda pair: pair[0], default=(None, candidates[0])
+        )[1]
+    settings["reference_relation_id"] = reference.relation["id"]
+
+    if not settings["tolerance_ms"]:
+        interval = reference.sample_interval()
+        settings["tolerance_ms"] = interval.total_seconds() * 1000 if interval is not None else 1000.0
+    return settings
+
+
+async def iter_export_blocks(
+    relations: List[Dict],
+    data_type: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    on_progress: Optional[Callable[[float, List[Dict]], Any]] = None,
+    page_size: int = PAGE_SIZE,
+    block_rows: int = BLOCK_ROWS,
+    concurrency: int = EXPORT_CONCURRENCY,
+    alignment: Optional[ExportAlignment] = None,
+) -> AsyncIterator[pa.Table]:
+    """
+    Merge the measurements of the given test relations into wide Arrow tables.
+
+    Tables have a 'timestamp' column plus one float column per sensor, channel
+    and value field, at least block_rows rows each (except the last), in time
+    order. alignment selects how the sensors' timestamps are combined (see
+    app.export.alignment); the default is an exact outer join. on_progress is
+    called with the completed fraction (0..1), estimated from the merge
+    position within the test's time span, and a per-relation progress list
+    (see RelationStream.progress). It may be a coroutine function.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    streams = [RelationStream(r, data_type, semaphore, start_time, end_time, page_size) for r in relations]
+
+    try:
+        channels = await measurements_db.get_measurement_channels([r["id"] for r in relations], start_time, end_time)
+        await asyncio.gather(*(stream.fetch() for stream in streams))
+        for stream in streams:
+            stream.init_columns(channels.get(stream.relation["id"], []))
+
+        column_names = [name for s in streams for name in s.column_names]
+        if not column_names:
+            return
+
+        bounds = await measurements_db.get_measurement_time_bounds([r["id"] for r in relations])
+        span_start = pd.Timestamp(start_time or bounds["start_time"]) if bounds else None
+        span_end = pd.Timestamp(end_time or bounds["end_time"]) if bounds else None
+
+        settings = resolve_alignment(alignment, streams)
+        lookahead = pd.Timedelta(milliseconds=settings["tolerance_ms"]) if settings["strategy"] == "asof" else None
+
+        schema = pa.schema(
+            [pa.field(TIMESTAMP_COLUMN, pa.timestamp("us", tz="UTC"))]
+            + [pa.field(name, pa.float64()) for name in column_names]
+        )
+        pending: List[pa.Table] = []
+        pending_rows = 0
+        carry = None
+
+        while True:
+            active = [s for s in streams if not s.exhausted]
+            watermark = min((s.last_timestamp for s in active if s.last_timestamp is not None), default=None)
+            cut = align_cut(settings["strategy"], watermark, settings.get("rate_hz"))
+            emit_before = cut - lookahead if lookahead is not None and cut is not None else None
+
+            slices = [piece for piece in (s.take_before(cut) for s in streams) if piece is not None]
+            if slices or (watermark is None and carry):
+                block, carry = await loop.run_in_executor(
+                    get_process_pool(), build_block, slices, column_names, schema, settings, carry, emit_before
+                )
+                if block.num_rows:
+                    pending.append(block)
+                    pending_rows += block.num_rows
+
+            if pending_rows >= block_rows or (watermark is None and pending):
+                yield pa.concat_tables(pending)
+                pending, pending_rows = [], 0
+
+            if watermark is None:
+                break
+
+            # Streams whose buffer ended exactly at the watermark still hold
+            # rows at that timestamp and need the next page to move on
+            await asyncio.gather(*(s.fetch() for s in active if s.last_timestamp == watermark))
+
+            if on_progress and span_start is not None and span_end > span_start:
+                fraction = min(1.0, max(0.0, (watermark - span_start) / (span_end - span_start)))
+                await _report(on_progress, fraction, streams)
+
+        if on_progress:
+            await _report(on_progress, 1.0, streams)
+
+    finally:
+        for stream in streams:
+            await stream.close()
+
+
+async def export_measurements(
+    relations: List[Dict],
+    data_type: str,
+    filepath: str,
+    format: str = "parquet",
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    on_progress: Optional[Callable[[float, List[Dict]], Any]] = None,
+    page_size: int = PAGE_SIZE,
+    block_rows: int = BLOCK_ROWS,
+    concurrency: int = EXPORT_CONCURRENCY,
+    alignment: Optional[ExportAlignment] = None,
+) -> int:
+    """
+    Export the measurements of the given test relations into one file.
+
+    format selects the writer (see app.export.writers.EXPORT_FORMATS); the
+    relations a format does not cover (e.g. non-vibration sensors for WAV)
+    are skipped. Returns the number of rows written.
+    """
+    writer_class = get_export_writer(format)
+    relations = [r for r in relations if writer_class.accepts_relation(r)]
+    writer = writer_class(filepath)
+    blocks = iter_export_blocks(
+        relations, data_type, start_time, end_time, on_progress, page_size, block_rows, concurrency, alignment
+    )
+    rows_written = 0
+
+    try:
+        async for table in blocks:
+            await asyncio.to_thread(writer.write, table)
+            rows_written += table.num_rows
+    finally:
+        await blocks.aclose()
+        await asyncio.to_thread(writer.close)
+
+    return rows_written
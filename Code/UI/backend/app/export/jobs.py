@@ -0,0 +1,345 @@
+"""
+Export job queue.
+
+Export jobs live in metadata.export_jobs, so they survive backend restarts
+and their status can be polled with a primary-key lookup. A fixed pool of
+asyncio workers claims queued jobs (highest priority first) and runs them
+through the streaming export engine; a janitor task evicts finished
+artifacts once their TTL has passed.
+
+Exports are content-addressed (see export_cache_key): a request for data
+that has not changed since an earlier export reuses that job and its file.
+
+Queued jobs and streamed downloads (CSV and Arrow streams, which skip the
+queue) take their slot from the same EXPORT_WORKERS budget (export_slots):
+a job waits for a free slot, a download is refused with 503 when none is
+free, so the exports together never hold more pool connections than
+budgeted in engine.py.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+import weakref
+from datetime import timedelta
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import database.export_jobs as export_jobs_db
+from app.core.job_workers import JobWorkerPool
+from app.models import ExportAlignment
+from .engine import export_measurements
+from .writers import get_export_writer
+
+logger = logging.getLogger(__name__)
+
+# Directory the export artifacts are written to
+EXPORT_DIR = os.getenv("EXPORT_DIR", "/app/data/exports")
+
+# Number of exports (queued and streamed) that run at the same time
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", 2))
+
+# How long a finished export stays downloadable
+EXPORT_TTL_HOURS = float(os.getenv("EXPORT_TTL_HOURS", 24))
+
+# Attempts before a job that keeps getting interrupted is failed
+EXPORT_MAX_ATTEMPTS = 3
+
+# Interval of the expired artifact cleanup
+CLEANUP_INTERVAL_SECONDS = 600
+
+# Minimum interval between progress writes of one job
+PROGRESS_UPDATE_SECONDS = 1.0
+
+
+class ExportSlots:
+    """Export slots shared by the job workers and the streaming download endpoints."""
+
+    def __init__(self, slots: int):
+        self.slots = max(1, slots)
+        self._semaphore = asyncio.Semaphore(self.slots)
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+
+    async def __aexit__(self, *exc_info):
+        self._semaphore.release()
+
+    async def open_stream(
+        self, chunks: AsyncIterator[bytes], *sources: AsyncIterator
+    ) -> Optional[AsyncIterator[bytes]]:
+        """
+        Take a free slot for a streamed download of chunks, None if all slots are busy.
+
+        The slot is released when the returned stream ends, fails or is
+        closed, or when it is dropped without ever being started (client
+        gone before the body was sent). Closing it closes chunks and the
+        sources it reads from (database cursors), so their connections are
+        returned together with the slot.
+        """
+        if self._semaphore.locked():
+            return None
+        await self._semaphore.acquire()
+
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self._semaphore.release()
+
+        async def stream():
+            try:
+                async for chunk in chunks:
+                    yield chunk
+            finally:
+                release()
+                for source in (chunks, *sources):
+                    await source.aclose()
+
+        body = stream()
+        weakref.finalize(body, release)
+        return body
+
+
+export_slots = ExportSlots(EXPORT_WORKERS)
+
+
+async def load_export_scope(test_id: int, time_range: str, segment_id: Optional[int] = None) -> Dict:
+    """
+    Resolve what an export covers: the test's relations and the time range.
+
+    Raises ValueError if the segment does not exist or the test has no sensors.
+    """
+    # Import here to avoid circular dependencies
+    import database.test_relations as test_relations_db
+    import database.test_segments as test_segments_db
+
+    start_time = None
+    end_time = None
+    if time_range == "segment":
+        segment = await test_segments_db.get_segment_by_id(segment_id) if segment_id else None
+        if not segment:
+            raise ValueError("Segment not found")
+        start_time = segment["start_time"]
+        end_time = segment["end_time"]
+
+    relations = await test_relations_db.get_test_relations(test_id)
+    if not relations:
+        raise ValueError("No sensors found for this test")
+
+    return {"relations": relations, "start_time": start_time, "end_time": end_time}
+
+
+async def export_cache_key(job_data: Dict, scope: Dict) -> Optional[str]:
+    """
+    Hash the export parameters together with a version stamp of the data.
+
+    The stamp covers the test's relations, the segment bounds and the last
+    timestamp / sample count / data generation of the exported range, so new
+    data, crops, deletes and edited segments all lead to a different key.
+    None while the data has not settled: the aggregate sample count may
+    still change under an unchanged key.
+    """
+    # Import here to avoid circular dependencies
+    import database.measurements as measurements_db
+
+    relation_ids = sorted(r["id"] for r in scope["relations"])
+    version = await measurements_db.get_measurement_data_version(
+        relation_ids, scope["start_time"], scope["end_time"]
+    )
+    if not version["settled"]:
+        return None
+
+    stamp = {
+        "test_id": job_data["test_id"],
+        "data_type": job_data["data_type"],
+        "format": job_data["format"],
+        "alignment": job_data["alignment"],
+        "time_range": job_data["time_range"],
+        "segment_id": job_data["segment_id"],
+        "start_time": scope["start_time"],
+        "end_time": scope["end_time"],
+        "relations": relation_ids,
+        "max_timestamp": version["max_timestamp"],
+        "num_samples": version["num_samples"],
+        "data_generation": version["data_generation"],
+    }
+    return hashlib.sha256(json.dumps(stamp, default=str, sort_keys=True).encode()).hexdigest()
+
+
+async def submit_export_job(
+    test_id: int,
+    data_type: str,
+    time_range: str,
+    segment_id: Optional[int] = None,
+    priority: int = 0,
+    format: str = "parquet",
+    alignment: Optional[Dict] = None,
+) -> Tuple[Dict, bool]:
+    """
+    Queue an export, or return the cached job for the same unchanged data.
+
+    alignment is an ExportAlignment dict (None for an exact timestamp join).
+    Returns (job, cached). A cached job may still be running; its status is
+    polled like that of a new job.
+    """
+    job_data = {
+        "id": str(uuid.uuid4()),
+        "test_id": test_id,
+        "data_type": data_type,
+        "format": format,
+        "alignment": alignment,
+        "time_range": time_range,
+        "segment_id": segment_id if time_range == "segment" else None,
+        "priority": priority,
+        "cache_key": None,
+    }
+
+    try:
+        scope = await load_export_scope(test_id, time_range, segment_id)
+    except ValueError:
+        # Not cacheable; the job itself reports the error
+        scope = None
+
+    if scope:
+        job_data["cache_key"] = await export_cache_key(job_data, scope)
+
+    if job_data["cache_key"]:
+        job = await export_jobs_db.find_export_job_by_cache_key(
+            job_data["cache_key"], timedelta(hours=EXPORT_TTL_HOURS)
+        )
+        if job and (job["status"] != "completed" or os.path.exists(job["filepath"] or "")):
+            return job, True
+
+    job = await export_jobs_db.create_export_job(job_data)
+    export_worker_pool.notify()
+    return job, False
+
+
+async def run_export_job(job: Dict):
+    """Run one claimed export job in a free export slot and store its outcome."""
+    async with export_slots:
+        await _run_export_job(job)
+
+
+async def _run_export_job(job: Dict):
+    job_id = job["id"]
+    filepath = None
+
+    try:
+        scope = await load_export_scope(job["test_id"], job["time_range"], job["segment_id"])
+
+        await export_jobs_db.update_export_job_progress(job_id, 10)
+        last_update = time.monotonic()
+
+        async def report_progress(fraction: float, relations: List[Dict]):
+            nonlocal last_update
+            now = time.monotonic()
+            if fraction < 1.0 and now - last_update < PROGRESS_UPDATE_SECONDS:
+                return
+            last_update = now
+            await export_jobs_db.update_export_job_progress(job_id, 10 + int(fraction * 85), relations)
+
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        extension = get_export_writer(job["format"]).extension
+        filename = f"test_{job['test_id']}_{job['data_type']}_{job_id}.{extension}"
+        filepath = os.path.join(EXPORT_DIR, filename)
+
+        rows_written = await export_measurements(
+            scope["relations"],
+            job["data_type"],
+            filepath,
+            format=job["format"],
+            start_time=scope["start_time"],
+            end_time=scope["end_time"],
+            on_progress=report_progress,
+            alignment=ExportAlignment(**job["alignment"]) if job.get("alignment") else None
+        )
+
+        if rows_written:
+            await export_jobs_db.complete_export_job(
+                job_id, filename, filepath, rows_written, timedelta(hours=EXPORT_TTL_HOURS)
+            )
+            logger.info(f"Export {job_id} completed: {rows_written} rows")
+        else:
+            _remove_file(filepath)
+            await export_jobs_db.fail_export_job(job_id, "No data to export")
+
+    except asyncio.CancelledError:
+        # Shutdown: the job stays 'processing' and is requeued on the next start
+        _remove_file(filepath)
+        raise
+    except Exception as e:
+        logger.error(f"Export {job_id} failed: {e}")
+        _remove_file(filepath)
+        await export_jobs_db.fail_export_job(job_id, str(e))
+
+
+def _remove_file(filepath: Optional[str]):
+    if filepath and os.path.exists(filepath):
+        try:
+            os.remove(filepath)
+        except OSError as e:
+            logger.warning(f"Could not remove export file {filepath}: {e}")
+
+
+async def evict_expired_exports() -> int:
+    """
+    Expire completed jobs past their TTL and delete their files.
+
+    Files in EXPORT_DIR that no completed job refers to and that are older
+    than the TTL (left behind by crashes) are deleted as well. Returns the
+    number of deleted files.
+    """
+    removed = 0
+    for job in await export_jobs_db.expire_export_jobs():
+        if job.get("filepath") and os.path.exists(job["filepath"]):
+            _remove_file(job["filepath"])
+            removed += 1
+
+    if os.path.isdir(EXPORT_DIR):
+        keep = set(await export_jobs_db.get_export_job_filepaths())
+        cutoff = time.time() - EXPORT_TTL_HOURS * 3600
+        for entry in os.scandir(EXPORT_DIR):
+            if entry.is_file() and entry.path not in keep and entry.stat().st_mtime < cutoff:
+                _remove_file(entry.path)
+                removed += 1
+
+    return removed
+
+
+class ExportWorkerPool(JobWorkerPool):
+    """Export job workers plus the janitor that evicts expired artifacts."""
+
+    def __init__(self, workers: int = EXPORT_WORKERS):
+        super().__init__(
+            "export",
+            claim=export_jobs_db.claim_next_export_job,
+            run=run_export_job,
+            requeue=export_jobs_db.requeue_interrupted_export_jobs,
+            workers=workers,
+            max_attempts=EXPORT_MAX_ATTEMPTS,
+        )
+
+    async def start(self):
+        await super().start()
+        self._tasks.append(asyncio.create_task(self._janitor()))
+
+    async def _janitor(self):
+        while True:
+            try:
+                removed = await evict_expired_exports()
+                if removed:
+                    logger.info(f"Removed {removed} expired export file(s)")
+            except Exception as e:
+                logger.error(f"Export cleanup failed: {e}")
+            await asyncio.sleep(CLEANUP_INTERVAL_SECONDS)
+
+
+# Global worker pool instance
+export_worker_pool = ExportWorkerPool()
@@ -0,0 +1,331 @@
+"""
+Export file writers.
+
+The export engine produces the aligned measurements as a sequence of wide
+Arrow tables ('timestamp' plus one float column per sensor, channel and
+value field). A writer receives these blocks one at a time and appends
+them to its output file, so every format shares the bounded-memory cursor
+pipeline. write() and close() run in a worker thread.
+"""
+
+import io
+import os
+import shutil
+import struct
+import tempfile
+import zipfile
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Type
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from app.analysis.spectrum import UniformResampler, estimate_sample_rate
+
+TIMESTAMP_COLUMN = "timestamp"
+
+# Sample rate written to WAV files whose rate cannot be estimated
+WAV_DEFAULT_SAMPLE_RATE = 1000
+
+# Longest gap of a WAV channel filled with silence; longer ones start a new file
+WAV_MAX_SILENCE_SECONDS = 1.0
+
+
+class ExportWriter(ABC):
+    """Base class of the export writers."""
+
+    extension = ""
+    media_type = "application/octet-stream"
+    # Data types the format makes sense for
+    data_types: Tuple[str, ...] = ("raw", "aggregated")
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+
+    @classmethod
+    def accepts_relation(cls, relation: Dict) -> bool:
+        """Whether a test relation is included in this format's export."""
+        return True
+
+    @abstractmethod
+    def write(self, table: pa.Table):
+        """Append one block of the export."""
+
+    @abstractmethod
+    def close(self):
+        """Finish the output file."""
+
+
+class ParquetExportWriter(ExportWriter):
+    """One parquet file, one row group per block."""
+
+    extension = "parquet"
+
+    def __init__(self, filepath: str):
+        super().__init__(filepath)
+        self._writer: Optional[pq.ParquetWriter] = None
+
+    def write(self, table: pa.Table):
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.filepath, table.schema, compression="snappy")
+        # pyarrow releases the GIL while encoding and compressing
+        self._writer.write_table(table, row_group_size=table.num_rows)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+class FeatherExportWriter(ExportWriter):
+    """Feather v2 (Arrow IPC file), readable with pandas.read_feather / pyarrow.feather."""
+
+    extension = "feather"
+    media_type = "application/vnd.apache.arrow.file"
+
+    def __init__(self, filepath: str):
+        super().__init__(filepath)
+        self._writer: Optional[pa.ipc.RecordBatchFileWriter] = None
+
+    def write(self, table: pa.Table):
+        if self._writer is None:
+            options = pa.ipc.IpcWriteOptions(compression="lz4")
+            self._writer = pa.ipc.new_file(self.filepath, table.schema, options=options)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+class CSVExportWriter(ExportWriter):
+    """Comma-separated text with a header row; missing values are empty."""
+
+    extension = "csv"
+    media_type = "text/csv"
+
+    def __init__(self, filepath: str):
+        super().__init__(filepath)
+        self._writer: Optional[pa_csv.CSVWriter] = None
+
+    def write(self, table: pa.Table):
+        if self._writer is None:
+            self._writer = pa_csv.CSVWriter(self.filepath, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _dataset_name(column: str) -> str:
+    # '/' separates HDF5 groups and shows up in units like 'L/min'
+    return column.replace("/", "_per_")
+
+
+def _column_series(table: pa.Table, column: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Epoch-microsecond timestamps and values of the non-null rows of one column."""
+    values = table.column(column)
+    mask = pc.is_valid(values)
+    timestamps = pc.filter(table.column(TIMESTAMP_COLUMN), mask).cast(pa.int64())
+    return timestamps.to_numpy(), pc.filter(values, mask).to_numpy()
+
+
+class HDF5ExportWriter(ExportWriter):
+    """
+    HDF5 file with one group per sensor channel (and value field).
+
+    Each group holds its own 'timestamp' (int64, microseconds since the epoch,
+    UTC) and 'value' dataset containing only that channel's samples, so no
+    NaN padding from the multi-sensor join ends up in the file.
+    """
+
+    extension = "h5"
+    media_type = "application/x-hdf5"
+
+    def __init__(self, filepath: str):
+        super().__init__(filepath)
+        self._file = None
+        self._groups: Dict[str, object] = {}
+
+    def _open(self):
+        try:
+            import h5py
+        except ImportError:
+            raise RuntimeError("HDF5 export requires the h5py package")
+        self._file = h5py.File(self.filepath, "w")
+        self._file.attrs["timestamp_unit"] = "us since 1970-01-01 UTC"
+
+    def _group(self, column: str):
+        group = self._groups.get(column)
+        if group is None:
+            group = self._file.create_group(_dataset_name(column))
+            group.attrs["column"] = column
+            group.create_dataset("timestamp", shape=(0,), maxshape=(None,), dtype="int64",
+                                 chunks=(65536,), compression="gzip")
+            group.create_dataset("value", shape=(0,), maxshape=(None,), dtype="float64",
+                                 chunks=(65536,), compression="gzip")
+            self._groups[column] = group
+        return group
+
+    def write(self, table: pa.Table):
+        if self._file is None:
+            self._open()
+        for column in table.column_names:
+            if column == TIMESTAMP_COLUMN:
+                continue
+            timestamps, values = _column_series(table, column)
+            if not len(values):
+                continue
+            group = self._group(column)
+            for name, data in (("timestamp", timestamps), ("value", values)):
+                dataset = group[name]
+                start = dataset.shape[0]
+                dataset.resize((start + len(data),))
+                dataset[start:] = data
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def wav_header(sample_rate: int, num_samples: int) -> bytes:
+    """RIFF/WAVE header of a mono 32-bit IEEE float file."""
+    data_size = num_samples * 4
+    return b"".join([
+        b"RIFF", struct.pack("<I", 4 + 26 + 12 + 8 + data_size), b"WAVE",
+        # fmt chunk: WAVE_FORMAT_IEEE_FLOAT, 1 channel, 32 bits, cbSize 0
+        b"fmt ", struct.pack("<IHHIIHHH", 18, 3, 1, sample_rate, sample_rate * 4, 4, 32, 0),
+        b"fact", struct.pack("<II", 4, num_samples),
+        b"data", struct.pack("<I", data_size),
+    ])
+
+
+class _WAVChannel:
+    """Uniformly resampled samples of one channel, split into parts at long gaps."""
+
+    def __init__(self, directory: str, sample_rate: int):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.resampler = UniformResampler(sample_rate)
+        # [sample file, sample count] per part
+        self.parts: List[List] = []
+        self._next_index: Optional[int] = None
+
+    def add(self, timestamps: np.ndarray, values: np.ndarray):
+        for index, run in self.resampler.add(timestamps, values.astype(np.float64)):
+            gap = 0 if self._next_index is None else index - self._next_index
+            if self._next_index is None or gap > WAV_MAX_SILENCE_SECONDS * self.sample_rate:
+                self._start_part()
+            else:
+                self._write_silence(gap)
+            self._write(run)
+            self._next_index = index + len(run)
+
+    def _start_part(self):
+        path = os.path.join(self.directory, f"{id(self)}_{len(self.parts)}.f32")
+        self.parts.append([open(path, "wb"), 0])
+
+    def _write(self, samples: np.ndarray):
+        part = self.parts[-1]
+        part[0].write(samples.astype("<f4").tobytes())
+        part[1] += len(samples)
+
+    def _write_silence(self, count: int):
+        while count > 0:
+            chunk = min(count, 1 << 20)
+            self._write(np.zeros(chunk))
+            count -= chunk
+
+    def close(self):
+        for samples, _ in self.parts:
+            samples.close()
+
+
+class WAVExportWriter(ExportWriter):
+    """
+    Zip archive with mono float32 WAV files of the accelerometer channels.
+
+    Every channel is resampled (linear interpolation) onto a uniform grid at
+    the sample rate estimated from the median sample interval of its first
+    block, so the files open directly in acoustic analysis tools and their
+    time axis matches the measurement. Gaps of up to WAV_MAX_SILENCE_SECONDS
+    are filled with silence; a longer gap starts a new file, numbered
+    '<channel>_part2.wav' and so on. Samples go to temporary files first
+    because the WAV header needs the final length.
+    """
+
+    extension = "zip"
+    media_type = "application/zip"
+    data_types = ("raw",)
+
+    def __init__(self, filepath: str):
+        super().__init__(filepath)
+        self._tmpdir: Optional[str] = None
+        self._channels: Dict[str, _WAVChannel] = {}
+
+    @classmethod
+    def accepts_relation(cls, relation: Dict) -> bool:
+        return "accelerometer" in (relation.get("sensor_type_name") or "").lower()
+
+    def write(self, table: pa.Table):
+        if self._tmpdir is None:
+            self._tmpdir = tempfile.mkdtemp(prefix="wav_", dir=os.path.dirname(self.filepath) or None)
+        for column in table.column_names:
+            if column == TIMESTAMP_COLUMN:
+                continue
+            timestamps, values = _column_series(table, column)
+            if not len(values):
+                continue
+            channel = self._channels.get(column)
+            if channel is None:
+                sample_rate = estimate_sample_rate(timestamps) or WAV_DEFAULT_SAMPLE_RATE
+                channel = self._channels[column] = _WAVChannel(self._tmpdir, max(1, int(round(sample_rate))))
+            channel.add(timestamps, values)
+
+    def close(self):
+        if self._tmpdir is None:
+            return
+        try:
+            with zipfile.ZipFile(self.filepath, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+                for column, channel in self._channels.items():
+                    channel.close()
+                    for i, (samples, count) in enumerate(channel.parts):
+                        suffix = f"_part{i + 1}" if i else ""
+                        with archive.open(f"{_dataset_name(column)}{suffix}.wav", "w", force_zip64=True) as entry:
+                            entry.write(wav_header(channel.sample_rate, count))
+                            with open(samples.name, "rb") as f:
+                                shutil.copyfileobj(f, entry)
+        finally:
+            for channel in self._channels.values():
+                channel.close()
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+
+EXPORT_FORMATS: Dict[str, Type[ExportWriter]] = {
+    "parquet": ParquetExportWriter,
+    "csv": CSVExportWriter,
+    "feather": FeatherExportWriter,
+    "hdf5": HDF5ExportWriter,
+    "wav": WAVExportWriter,
+}
+
+
+def get_export_writer(format: str) -> Type[ExportWriter]:
+    """Get the writer class of an export format."""
+    try:
+        return EXPORT_FORMATS[format]
+    except KeyError:
+        raise ValueError(f"Unknown export format '{format}', expected one of {list(EXPORT_FORMATS)}")
+
+
+async def stream_csv(blocks: AsyncIterator[pa.Table]) -> AsyncIterator[bytes]:
+    """Encode export blocks as CSV chunks for a StreamingResponse (header in the first chunk)."""
+    header = True
+    async for table in blocks:
+        buffer = io.BytesIO()
+        pa_csv.write_csv(table, buffer, write_options=pa_csv.WriteOptions(include_header=header))
+        header = False
+        yield buffer.getvalue()
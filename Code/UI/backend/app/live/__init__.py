@@ -0,0 +1,13 @@
+"""
+Live measurement streaming.
+
+This package fans out the samples published by the MQTT worker to
+WebSocket and Server-Sent Events clients, without database reads.
+"""
+
+from .hub import LiveSubscription, live_hub
+
+__all__ = [
+    "LiveSubscription",
+    "live_hub"
+]
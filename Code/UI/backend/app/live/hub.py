@@ -0,0 +1,143 @@
+"""
+Fan-out of live measurements to WebSocket / SSE clients.
+
+The MQTT worker publishes every test relation's samples, decimated to
+LIVE_PUBLISH_HZ, on live/<test_relation_id>. The hub subscribes to these
+topics and hands each message to the clients watching that relation, so
+live dashboards never query the database.
+
+Every client has its own sample rate (downsampled further from the worker's
+rate) and a bounded queue. A client that cannot keep up loses its oldest
+messages instead of slowing down the others or growing memory; the number
+of dropped messages is sent along with every message.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Dict, Iterable, List, Optional, Set
+
+import orjson
+
+from app.mqtt_client import subscribe_mqtt
+
+logger = logging.getLogger(__name__)
+
+LIVE_TOPIC_PREFIX = "live"
+
+# Messages buffered per client before the oldest are dropped
+LIVE_CLIENT_QUEUE = int(os.getenv("LIVE_CLIENT_QUEUE", 64))
+
+
+class LiveSubscription:
+    """The live feed of one client: its relations, sample rate and queue."""
+
+    def __init__(self, relation_ids: Iterable[int], rate_hz: Optional[float] = None,
+                 max_queue: int = LIVE_CLIENT_QUEUE):
+        self.relation_ids = frozenset(relation_ids)
+        self.interval_ms = 1000.0 / rate_hz if rate_hz else 0.0
+        self.dropped = 0
+        self._queue: asyncio.Queue = asyncio.Queue(max_queue)
+        # relation id -> timestamp (ms) of the last sample passed on
+        self._last_ts: Dict[int, float] = {}
+
+    def offer(self, message: Dict):
+        """Downsample a message for this client and queue it (never blocks)."""
+        message = self._downsample(message)
+        if message is None:
+            return
+        if self._queue.full():
+            # Only fresh data matters in a live view
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(message)
+
+    async def get(self) -> Dict:
+        """Wait for the next message, with the client's drop count."""
+        message = await self._queue.get()
+        return {**message, "dropped": self.dropped}
+
+    def _downsample(self, message: Dict) -> Optional[Dict]:
+        if not self.interval_ms:
+            return message
+
+        relation_id = message["relation_id"]
+        last_ts = self._last_ts.get(relation_id, float("-inf"))
+        timestamps: List[float] = []
+        values: List = []
+        for ts, sample in zip(message["timestamps"], message["values"]):
+            if ts < last_ts - 1000:
+                # Sensor clock jumped back
+                last_ts = float("-inf")
+            if ts < last_ts + self.interval_ms:
+                continue
+            timestamps.append(ts)
+            values.append(sample)
+            last_ts = ts
+
+        if not timestamps:
+            return None
+        self._last_ts[relation_id] = last_ts
+        return {**message, "timestamps": timestamps, "values": values}
+
+
+class LiveHub:
+    """Routes live MQTT messages to the subscriptions of their test relation."""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscriptions: Dict[int, Set[LiveSubscription]] = {}
+
+    def start(self):
+        """Subscribe to the live topics; call from the event loop before connecting MQTT."""
+        self._loop = asyncio.get_running_loop()
+        subscribe_mqtt(f"{LIVE_TOPIC_PREFIX}/+", self._on_mqtt_message)
+
+    def subscribe(self, relation_ids: Iterable[int], rate_hz: Optional[float] = None) -> LiveSubscription:
+        subscription = LiveSubscription(relation_ids, rate_hz)
+        for relation_id in subscription.relation_ids:
+            self._subscriptions.setdefault(relation_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: LiveSubscription):
+        for relation_id in subscription.relation_ids:
+            subscribers = self._subscriptions.get(relation_id)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscriptions[relation_id]
+
+    def publish(self, message: Dict):
+        """Hand a message to every subscription of its relation (event loop only)."""
+        for subscription in list(self._subscriptions.get(message["relation_id"], ())):
+            subscription.offer(message)
+
+    def stats(self) -> Dict:
+        clients = {s for subscribers in self._subscriptions.values() for s in subscribers}
+        return {
+            "clients": len(clients),
+            "relations": len(self._subscriptions),
+            "dropped": sum(s.dropped for s in clients),
+        }
+
+    def _on_mqtt_message(self, topic: str, payload: bytes):
+        # MQTT network thread: skip decoding when nobody watches the relation
+        try:
+            relation_id = int(topic.rsplit("/", 1)[1])
+        except ValueError:
+            return
+        if self._loop is None or relation_id not in self._subscriptions:
+            return
+
+        try:
+            message = orjson.loads(payload)
+        except orjson.JSONDecodeError:
+            logger.warning(f"Invalid live message on {topic}")
+            return
+        message["relation_id"] = relation_id
+        self._loop.call_soon_threadsafe(self.publish, message)
+
+
+# Global hub instance
+live_hub = LiveHub()
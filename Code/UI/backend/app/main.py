@@ -9,6 +9,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.lifespan import lifespan
+from app.core.serialization import RecordJSONResponse
 from app.routers import (
     sensors,
     sensor_types,
@@ -20,7 +21,9 @@ from app.routers import (
     test_segments,
     measurements,
     mqtt,
-    system
+    system,
+    live,
+    analysis
 )
 
 
@@ -33,7 +36,8 @@ def create_app() -> FastAPI:
         version="2.0.0",
         docs_url="/docs",
         redoc_url="/redoc",
-        lifespan=lifespan
+        lifespan=lifespan,
+        default_response_class=RecordJSONResponse
     )
 
     # Add CORS middleware
@@ -112,6 +116,18 @@ def create_app() -> FastAPI:
         tags=["MQTT"]
     )
     
+    app.include_router(
+        live.router,
+        prefix="/api/live",
+        tags=["Live"]
+    )
+
+    app.include_router(
+        analysis.router,
+        prefix="/api/analysis",
+        tags=["Analysis"]
+    )
+    
     app.include_router(
         system.router,
         prefix="/api",
@@ -0,0 +1,16 @@
+"""
+Database maintenance components.
+
+This package contains the background jobs that maintain the measurement
+hypertable, such as the chunked delete engine and the storage policies
+(chunking, compression, raw data retention).
+"""
+
+from .deletion import delete_worker, submit_delete_job
+from .storage import storage_maintenance
+
+__all__ = [
+    "delete_worker",
+    "submit_delete_job",
+    "storage_maintenance"
+]
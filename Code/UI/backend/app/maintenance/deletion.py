@@ -0,0 +1,335 @@
+"""
+Chunked measurement delete engine.
+
+Crops and test / test relation deletions used to run one DELETE over the
+whole hypertable in a single transaction, which locked it for minutes,
+bloated WAL and hit the 60s command timeout. Deletes now run as tracked
+background jobs (metadata.delete_jobs) that go through the hypertable
+chunk by chunk:
+
+- a chunk fully inside the deleted range that holds no other test's data
+  (and cannot receive inserts anymore) is dropped as a whole;
+- everywhere else rows are deleted in batches of DELETE_BATCH_ROWS, each
+  its own short transaction, with a pause in between so ingest keeps going.
+
+Afterwards the 10s continuous aggregates are refreshed over just the deleted
+windows (clipped to the relations' data and widened to bucket borders), in
+slices of AGG_REFRESH_SLICE, instead of deleting from the aggregate views.
+Ranges whose raw data was dropped by retention (see storage.py) cannot be
+refreshed; there the relations' aggregate rows are deleted directly.
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import database.analysis as analysis_db
+import database.delete_jobs as delete_jobs_db
+import database.measurements as measurements_db
+import database.storage as storage_db
+from app.analysis import requeue_segment_stats, requeue_spectrograms
+from app.core.job_workers import JobWorkerPool
+
+logger = logging.getLogger(__name__)
+
+# Rows deleted per statement
+DELETE_BATCH_ROWS = int(os.getenv("DELETE_BATCH_ROWS", 50_000))
+
+# Pause between delete batches, leaves room for ingest and queries
+DELETE_BATCH_PAUSE_SECONDS = float(os.getenv("DELETE_BATCH_PAUSE_SECONDS", 0.05))
+
+# Longest window recomputed by one continuous aggregate refresh
+AGG_REFRESH_SLICE = timedelta(hours=float(os.getenv("AGG_REFRESH_SLICE_HOURS", 6)))
+
+# Bucket width of the measurement aggregates (measurements_avg_10s, measurements_stats_10s)
+AGG_BUCKET = timedelta(seconds=10)
+
+# Chunks ending less than this before now may still receive inserts
+ACTIVE_CHUNK_MARGIN = timedelta(minutes=5)
+
+# Attempts before a job that keeps getting interrupted is failed
+DELETE_MAX_ATTEMPTS = 3
+
+# Minimum interval between progress writes of one job
+PROGRESS_UPDATE_SECONDS = 1.0
+
+# A deleted time range: rows with after < timestamp < before (None = unbounded)
+DeleteWindow = Tuple[Optional[datetime], Optional[datetime]]
+
+# A range of aggregate buckets: start <= bucket < end
+AggregateWindow = Tuple[datetime, datetime]
+
+
+def delete_windows(job: Dict) -> List[DeleteWindow]:
+    """Time ranges a job deletes: everything outside the kept range for crops, else all."""
+    if job["kind"] == "crop":
+        return [(None, job["keep_start"]), (job["keep_end"], None)]
+    return [(None, None)]
+
+
+def _floor_bucket(ts: datetime) -> datetime:
+    return ts - (ts - datetime(1970, 1, 1, tzinfo=timezone.utc)) % AGG_BUCKET
+
+
+def aggregate_refresh_windows(
+    windows: List[DeleteWindow],
+    bounds: Dict[str, datetime],
+    retained: Sequence[Dict] = (),
+) -> Tuple[List[AggregateWindow], List[AggregateWindow]]:
+    """
+    Bucket-aligned [start, end) ranges of the aggregate touched by a delete.
+
+    Unbounded window ends are clipped to the deleted relations' data, every
+    window is widened to the buckets its borders fall into and overlapping
+    windows are merged. Returns (refresh, retained): the parts outside the
+    retained ranges (raw data dropped by retention), split into
+    AGG_REFRESH_SLICE slices, and the parts inside them.
+    """
+    ranges = []
+    for after, before in windows:
+        start = max(after, bounds["start_time"]) if after is not None else bounds["start_time"]
+        end = min(before, bounds["end_time"]) if before is not None else bounds["end_time"]
+        if start > end:
+            continue
+        ranges.append((_floor_bucket(start), _floor_bucket(end) + AGG_BUCKET))
+
+    merged: List[List[datetime]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    refresh: List[AggregateWindow] = []
+    kept: List[AggregateWindow] = []
+    for start, end in merged:
+        for r in retained:
+            if r["range_end"] <= start or r["range_start"] >= end:
+                continue
+            if r["range_start"] > start:
+                refresh.append((start, r["range_start"]))
+            kept.append((max(start, r["range_start"]), min(end, r["range_end"])))
+            start = r["range_end"]
+            if start >= end:
+                break
+        if start < end:
+            refresh.append((start, end))
+
+    slices = []
+    for start, end in refresh:
+        while start < end:
+            slices.append((start, min(_floor_bucket(start + AGG_REFRESH_SLICE), end)))
+            start = slices[-1][1]
+    return slices, kept
+
+
+async def refresh_aggregates(
+    relation_ids: List[int],
+    windows: List[AggregateWindow],
+    retained_windows: Sequence[AggregateWindow] = (),
+    on_progress: Optional[Callable[[float], object]] = None,
+) -> int:
+    """
+    Refresh the continuous aggregates over the given windows.
+
+    In retained windows there is no raw data left to refresh from; the
+    relations' buckets are deleted from the materialized aggregates instead.
+    Returns the number of aggregated rows of the relations that disappeared.
+    """
+    removed = 0
+    for start, end in retained_windows:
+        removed += await measurements_db.delete_measurement_aggregates_materialized(relation_ids, start, end)
+
+    for done, (start, end) in enumerate(windows, start=1):
+        before = await measurements_db.count_measurements_avg(relation_ids, start, end)
+        await measurements_db.refresh_measurement_aggregates(start, end)
+        removed += before - await measurements_db.count_measurements_avg(relation_ids, start, end)
+        if on_progress:
+            await on_progress(done / len(windows))
+    return removed
+
+
+def _union_bounds(*bounds: Optional[Dict[str, datetime]]) -> Optional[Dict[str, datetime]]:
+    bounds = [b for b in bounds if b]
+    if not bounds:
+        return None
+    return {
+        "start_time": min(b["start_time"] for b in bounds),
+        "end_time": max(b["end_time"] for b in bounds),
+    }
+
+
+def _overlaps(window: DeleteWindow, chunk: Dict) -> bool:
+    after, before = window
+    return (after is None or chunk["range_end"] > after) and (before is None or chunk["range_start"] < before)
+
+
+def _covers(window: DeleteWindow, chunk: Dict) -> bool:
+    after, before = window
+    return (after is None or chunk["range_start"] > after) and (before is None or chunk["range_end"] <= before)
+
+
+async def delete_measurements(
+    relation_ids: List[int],
+    windows: List[DeleteWindow],
+    bounds: Optional[Dict[str, datetime]],
+    on_progress: Optional[Callable[[float, Dict], object]] = None,
+) -> Dict[str, int]:
+    """
+    Delete the raw measurements of the given relations inside the windows.
+
+    bounds are the relations' first and last timestamps
+    (get_measurement_time_bounds); nothing is deleted if they are None.
+    on_progress(fraction, totals) is awaited after every chunk. Returns
+    {'raw_deleted', 'chunks_dropped'}; rows of dropped chunks are counted
+    from the planner's estimate.
+    """
+    totals = {"raw_deleted": 0, "chunks_dropped": 0}
+    if not bounds:
+        return totals
+
+    chunks = await measurements_db.get_measurement_chunks(bounds["start_time"], bounds["end_time"])
+    work = [(chunk, [w for w in windows if _overlaps(w, chunk)]) for chunk in chunks]
+    work = [(chunk, overlapping) for chunk, overlapping in work if overlapping]
+    active_after = datetime.now(timezone.utc) - ACTIVE_CHUNK_MARGIN
+
+    for done, (chunk, overlapping) in enumerate(work, start=1):
+        dropped = None
+        if (
+            any(_covers(w, chunk) for w in overlapping)
+            and chunk["range_end"] < active_after
+            and not await measurements_db.chunk_has_other_relations(chunk, relation_ids)
+        ):
+            dropped = await measurements_db.drop_measurement_chunk(chunk)
+
+        if dropped is not None:
+            totals["chunks_dropped"] += 1
+            totals["raw_deleted"] += dropped
+        else:
+            for after, before in overlapping:
+                while True:
+                    deleted = await measurements_db.delete_measurements_batch(
+                        chunk, relation_ids, after, before, DELETE_BATCH_ROWS
+                    )
+                    totals["raw_deleted"] += deleted
+                    if chunk["is_compressed"] or deleted < DELETE_BATCH_ROWS:
+                        break
+                    await asyncio.sleep(DELETE_BATCH_PAUSE_SECONDS)
+
+        if on_progress:
+            await on_progress(done / len(work), totals)
+
+    return totals
+
+
+async def run_delete_job(job: Dict):
+    """Run one claimed delete job and store its outcome."""
+    # Import here to avoid circular dependencies
+    import database.test_relations as test_relations_db
+    import database.tests as tests_db
+
+    job_id = job["id"]
+    relation_ids = job["relation_ids"]
+    totals = {"raw_deleted": 0, "chunks_dropped": 0}
+    avg_deleted = 0
+    last_update = time.monotonic()
+
+    async def report_progress(progress: int):
+        nonlocal last_update
+        now = time.monotonic()
+        if now - last_update < PROGRESS_UPDATE_SECONDS:
+            return
+        last_update = now
+        await delete_jobs_db.update_delete_job_progress(
+            job_id, progress, totals["raw_deleted"], avg_deleted, totals["chunks_dropped"]
+        )
+
+    async def report_delete_progress(fraction: float, deleted: Dict):
+        totals.update(deleted)
+        await report_progress(int(fraction * 80))
+
+    async def report_refresh_progress(fraction: float):
+        await report_progress(80 + int(fraction * 15))
+
+    try:
+        windows = delete_windows(job)
+        # Bounds before the delete: they limit the aggregate refresh afterwards
+        bounds = _union_bounds(
+            await measurements_db.get_measurement_time_bounds(relation_ids),
+            await measurements_db.get_measurement_avg_time_bounds(relation_ids),
+        )
+        totals = await delete_measurements(relation_ids, windows, bounds, report_delete_progress)
+
+        if bounds:
+            retained = await storage_db.get_raw_retention_ranges(bounds["start_time"], bounds["end_time"])
+            refresh_windows, retained_windows = aggregate_refresh_windows(windows, bounds, retained)
+            avg_deleted = await refresh_aggregates(
+                relation_ids, refresh_windows, retained_windows, report_refresh_progress
+            )
+
+        if job["kind"] == "test":
+            await tests_db.delete_test(job["test_id"])
+        elif job["kind"] == "relation":
+            for relation_id in relation_ids:
+                await test_relations_db.delete_test_relation_for_single_relation_id(relation_id)
+        else:
+            # The spectrograms and segment statistics of cropped relations still include the deleted data
+            await requeue_spectrograms(relation_ids)
+            await requeue_segment_stats(relation_ids)
+            # New ETags for the measurement responses of the cropped relations
+            await test_relations_db.bump_data_generation(relation_ids)
+            await analysis_db.delete_anomaly_events_outside(relation_ids, job["keep_start"], job["keep_end"])
+
+        await delete_jobs_db.update_delete_job_progress(
+            job_id, 100, totals["raw_deleted"], avg_deleted, totals["chunks_dropped"]
+        )
+        await delete_jobs_db.complete_delete_job(job_id)
+        logger.info(f"Delete job {job_id} ({job['kind']}) completed: {totals}")
+
+    except asyncio.CancelledError:
+        # Shutdown: the job stays 'processing' and is requeued on the next start
+        raise
+    except Exception as e:
+        logger.error(f"Delete job {job_id} failed: {e}")
+        await delete_jobs_db.fail_delete_job(job_id, str(e))
+
+
+async def submit_delete_job(
+    kind: str,
+    relation_ids: List[int],
+    test_id: Optional[int] = None,
+    keep_start: Optional[datetime] = None,
+    keep_end: Optional[datetime] = None,
+) -> Dict:
+    """
+    Queue a delete job.
+
+    kind is 'crop' (delete outside [keep_start, keep_end]), 'test' (all
+    measurements, then the test) or 'relation' (all measurements, then the
+    relations).
+    """
+    job = await delete_jobs_db.create_delete_job({
+        "id": str(uuid.uuid4()),
+        "kind": kind,
+        "test_id": test_id,
+        "relation_ids": relation_ids,
+        "keep_start": keep_start,
+        "keep_end": keep_end,
+    })
+    delete_worker.notify()
+    return job
+
+
+# Deletes run one at a time: they are I/O heavy and must not starve ingest
+delete_worker = JobWorkerPool(
+    "delete",
+    claim=delete_jobs_db.claim_next_delete_job,
+    run=run_delete_job,
+    requeue=delete_jobs_db.requeue_interrupted_delete_jobs,
+    workers=1,
+    max_attempts=DELETE_MAX_ATTEMPTS,
+)
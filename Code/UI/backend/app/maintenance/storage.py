@@ -0,0 +1,213 @@
+"""
+Storage policies of the measurements hypertable.
+
+Applied on startup from the environment:
+
+- MEASUREMENT_CHUNK_INTERVAL_HOURS: time range of new chunks. A chunk of
+  the busiest period (all sensors of all running tests) plus its indexes
+  should fit into about a quarter of the database memory.
+- COMPRESS_AFTER_HOURS: chunks are compressed (segmentby relation and
+  channel, see schemas/10_schema_compression.sql) once they are this old;
+  0 disables compression.
+- RAW_RETENTION_DAYS: raw chunks older than this that only hold data of
+  archived tests are dropped; their 10s aggregates are kept. 0 (default)
+  keeps raw data forever.
+- COMPRESS_ON_TEST_STOP: compress a test's chunks right after its run
+  ends instead of waiting for COMPRESS_AFTER_HOURS (default on). Chunks
+  that are still open or hold data of a running test are left alone, so
+  live ingest keeps writing to uncompressed chunks.
+- COLD_TABLESPACE: tablespace the chunks of ended runs are moved to
+  before they are compressed (default: not moved). Chunks compressed by
+  the time-based policy before their run ended stay where they are.
+
+Continuous aggregates added to a database that already holds measurements
+(see metadata.aggregate_backfill) are materialized over the existing data
+in the background, AGG_REFRESH_SLICE at a time, resuming after a restart.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+import database.measurements as measurements_db
+import database.storage as storage_db
+import database.test_relations as test_relations_db
+from .deletion import AGG_REFRESH_SLICE, _floor_bucket
+
+logger = logging.getLogger(__name__)
+
+MEASUREMENT_CHUNK_INTERVAL = timedelta(hours=float(os.getenv("MEASUREMENT_CHUNK_INTERVAL_HOURS", 6)))
+
+COMPRESS_AFTER_HOURS = float(os.getenv("COMPRESS_AFTER_HOURS", 24))
+
+RAW_RETENTION_DAYS = float(os.getenv("RAW_RETENTION_DAYS", 0))
+
+COMPRESS_ON_TEST_STOP = os.getenv("COMPRESS_ON_TEST_STOP", "true").lower() in ("1", "true", "yes")
+
+COLD_TABLESPACE = os.getenv("COLD_TABLESPACE") or None
+
+# Interval of the raw data retention run
+RETENTION_INTERVAL_SECONDS = 3600
+
+# Ended runs whose chunks are still open are re-checked at this interval
+LIFECYCLE_POLL_SECONDS = 600
+
+# Sensors may deliver buffered samples timestamped slightly outside a run
+RUN_MARGIN = timedelta(minutes=5)
+
+# Pause between backfill slices, leaves room for ingest and the refresh policies
+BACKFILL_PAUSE_SECONDS = 1.0
+
+
+async def apply_storage_policies():
+    """Set the chunk interval and compression policy of the measurements hypertable."""
+    await storage_db.set_measurement_chunk_interval(MEASUREMENT_CHUNK_INTERVAL)
+    await storage_db.set_measurement_compression_policy(
+        timedelta(hours=COMPRESS_AFTER_HOURS) if COMPRESS_AFTER_HOURS > 0 else None
+    )
+
+
+async def drop_archived_raw_data(retention: timedelta) -> int:
+    """
+    Drop raw chunks older than retention that only hold data of archived tests.
+
+    The chunk's aggregate buckets are materialized first and the dropped
+    range is recorded, so delete jobs never refresh the aggregate there.
+    Returns the number of dropped chunks.
+    """
+    cutoff = datetime.now(timezone.utc) - retention
+    dropped = 0
+    for chunk in await measurements_db.get_measurement_chunks(None, cutoff):
+        if chunk["range_end"] > cutoff or not await storage_db.chunk_holds_only_archived_tests(chunk):
+            continue
+
+        await measurements_db.refresh_measurement_aggregates(chunk["range_start"], chunk["range_end"])
+        relation_ids = await storage_db.get_chunk_relation_ids(chunk)
+        rows = await measurements_db.drop_measurement_chunk(chunk)
+        if rows is None:
+            continue
+        await storage_db.record_raw_retention(chunk["range_start"], chunk["range_end"], rows)
+        # Raw responses of these relations change
+        await test_relations_db.bump_data_generation(relation_ids)
+        dropped += 1
+    return dropped
+
+
+async def backfill_aggregate(backfill: Dict):
+    """
+    Materialize one continuous aggregate over the measurements before its backfill_end.
+
+    Only this view is refreshed: the other aggregates hold the only copy of
+    retention-dropped ranges, which a refresh would wipe. Later buckets are
+    maintained by the view's refresh policy.
+    """
+    end = _floor_bucket(backfill["backfill_end"])
+    start = backfill["backfilled_until"]
+    if start is None:
+        chunks = await measurements_db.get_measurement_chunks(None, end)
+        start = _floor_bucket(chunks[0]["range_start"]) if chunks else end
+
+    while start < end:
+        slice_end = min(_floor_bucket(start + AGG_REFRESH_SLICE), end)
+        await measurements_db.refresh_measurement_aggregates(start, slice_end, views=[backfill["view_name"]])
+        await storage_db.update_aggregate_backfill(backfill["view_name"], slice_end)
+        start = slice_end
+        await asyncio.sleep(BACKFILL_PAUSE_SECONDS)
+
+    await storage_db.complete_aggregate_backfill(backfill["view_name"])
+    logger.info(f"Backfilled continuous aggregate {backfill['view_name']}")
+
+
+async def compress_test_run(run: Dict) -> bool:
+    """
+    Compress the chunks of an ended test run, moving them to COLD_TABLESPACE first.
+
+    Returns False if some chunk had to be skipped because it is still open
+    or holds data of a running test; the run is tried again later.
+    """
+    now = datetime.now(timezone.utc)
+    done = True
+    chunks = await measurements_db.get_measurement_chunks(
+        run["run_started_at"] - RUN_MARGIN, run["run_ended_at"] + RUN_MARGIN
+    )
+    for chunk in chunks:
+        if chunk["is_compressed"]:
+            continue
+        if chunk["range_end"] > now or await storage_db.chunk_has_running_tests(chunk):
+            done = False
+            continue
+
+        if COLD_TABLESPACE and chunk["chunk_tablespace"] != COLD_TABLESPACE:
+            await storage_db.move_measurement_chunk(chunk, COLD_TABLESPACE)
+        await storage_db.compress_measurement_chunk(chunk)
+    return done
+
+
+class StorageMaintenance:
+    """Applies the storage policies, backfills new aggregates, compresses ended test runs and runs the raw data retention."""
+
+    def __init__(self):
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+
+    async def start(self):
+        try:
+            await apply_storage_policies()
+        except Exception as e:
+            # Keep serving with the previous policies
+            logger.error(f"Could not apply measurement storage policies: {e}")
+
+        self._tasks.append(asyncio.create_task(self._backfill()))
+        if COMPRESS_ON_TEST_STOP:
+            self._tasks.append(asyncio.create_task(self._lifecycle()))
+        if RAW_RETENTION_DAYS > 0:
+            self._tasks.append(asyncio.create_task(self._retention(timedelta(days=RAW_RETENTION_DAYS))))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Wake the lifecycle compression after a test run ended."""
+        self._wakeup.set()
+
+    async def _lifecycle(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                for run in await storage_db.get_pending_compression_runs():
+                    if await compress_test_run(run):
+                        await storage_db.mark_run_compressed(run["id"])
+                        logger.info(f"Compressed the measurements of test {run['test_id']} run {run['id']}")
+            except Exception as e:
+                logger.error(f"Test run compression failed: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), LIFECYCLE_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _backfill(self):
+        try:
+            for backfill in await storage_db.get_pending_aggregate_backfills():
+                await backfill_aggregate(backfill)
+        except Exception as e:
+            # Resumed from backfilled_until on the next start
+            logger.error(f"Continuous aggregate backfill failed: {e}")
+
+    async def _retention(self, retention: timedelta):
+        while True:
+            try:
+                dropped = await drop_archived_raw_data(retention)
+                if dropped:
+                    logger.info(f"Dropped {dropped} raw measurement chunk(s) of archived tests")
+            except Exception as e:
+                logger.error(f"Raw data retention failed: {e}")
+            await asyncio.sleep(RETENTION_INTERVAL_SECONDS)
+
+
+# Global instance
+storage_maintenance = StorageMaintenance()
@@ -25,7 +25,7 @@ from .machine_type_sensor_templates import (
 )
 from .tests import Test, TestCreate, TestUpdate, TestBase
 from .test_relations import TestRelation, TestRelationCreate, TestRelationAllDetails
-from .measurements import MeasurementAveraged, MeasurementRaw
+from .measurements import MeasurementAveraged, MeasurementRaw, MeasurementStats, ExportAlignment
 from .mqtt import MqttConfig, MqttConfigUpdate, MqttConfigBase
 
 __all__ = [
@@ -52,7 +52,7 @@ __all__ = [
     "TestRelation", "TestRelationCreate", "TestRelationAllDetails",
     
     # Measurements
-    "MeasurementAveraged", "MeasurementRaw"
+    "MeasurementAveraged", "MeasurementRaw", "MeasurementStats", "ExportAlignment",
     
     # MQTT
     "MqttConfig", "MqttConfigUpdate", "MqttConfigBase",
@@ -25,4 +25,23 @@ class MeasurementRaw(BaseModel):
     measurement_timestamp: datetime
     test_relation_id: int
     measurement_channel: Optional[str] = None
-    measurement_value: float
\ No newline at end of file
+    measurement_value: float
+
+class ExportAlignment(BaseModel):
+    """How the sensors of a multi-sensor export are put on a common time axis."""
+    strategy: str = "exact"  # "exact", "resample", "asof" or "ffill"
+    rate_hz: Optional[float] = None  # resample: target sample rate
+    tolerance_ms: Optional[float] = None  # asof: max distance to the nearest sample; ffill: max age of a filled value
+    reference_relation_id: Optional[int] = None  # asof: relation whose timestamps form the time axis
+
+class MeasurementStats(BaseModel):
+    """Signal statistics of one channel over a time bucket, from the 10s statistics aggregate."""
+    measurement_timestamp: datetime
+    test_relation_id: int
+    measurement_channel: Optional[str] = None
+    num_samples: int
+    mean_value: Optional[float] = None
+    rms_value: Optional[float] = None
+    std_value: Optional[float] = None
+    max_abs_value: Optional[float] = None
+    crest_factor: Optional[float] = None  # max_abs_value / rms_value
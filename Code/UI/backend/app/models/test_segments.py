@@ -30,5 +30,7 @@ class TestSegment(TestSegmentBase):
     """Complete test segment model with database fields."""
     id: int
     test_id: int
+    segment_source: str = "manual"  # "manual" or "detected"
+    phase: Optional[str] = None  # detected wash-cycle phase: fill, wash, rinse, drain or spin
     created_at: datetime
     last_modified_at: datetime
@@ -13,6 +13,8 @@ class TestStatus(str, Enum):
     running = "running"
     completed = "completed"
     failed = "failed"
+    archived = "archived"
+    deleting = "deleting"
 
 
 class TestBase(BaseModel):
@@ -2,6 +2,7 @@ import json
 import logging
 import threading
 import time
+from typing import Callable, Dict
 import paho.mqtt.client as mqtt
 
 logger = logging.getLogger(__name__)
@@ -14,6 +15,9 @@ mqtt_client: mqtt.Client | None = None
 mqtt_ready = False
 mqtt_lock = threading.Lock()   # ✅ protects publish calls
 
+# topic filter -> callback(topic, payload), called on the MQTT network thread
+_subscriptions: Dict[str, Callable[[str, bytes], None]] = {}
+
 
 # =========================
 # MQTT CALLBACKS
@@ -25,6 +29,9 @@ def _on_connect(client, userdata, flags, rc):
     if rc == 0:
         mqtt_ready = True
         logger.info("✅ MQTT connected")
+        # (Re)subscribe, the session is not kept across reconnects
+        for topic_filter in list(_subscriptions):
+            client.subscribe(topic_filter, qos=0)
     else:
         mqtt_ready = False
         logger.error(f"❌ MQTT failed to connect: {rc}")
@@ -36,6 +43,15 @@ def _on_disconnect(client, userdata, rc):
     logger.warning("⚠️ MQTT disconnected")
 
 
+def _on_message(client, userdata, msg):
+    for topic_filter, callback in list(_subscriptions.items()):
+        if mqtt.topic_matches_sub(topic_filter, msg.topic):
+            try:
+                callback(msg.topic, msg.payload)
+            except Exception as e:
+                logger.error(f"❌ MQTT handler for {topic_filter} failed: {e}")
+
+
 # =========================
 # PUBLIC API
 # =========================
@@ -61,6 +77,7 @@ def connect_mqtt(
 
     client.on_connect = _on_connect
     client.on_disconnect = _on_disconnect
+    client.on_message = _on_message
 
     client.connect(host, port, keepalive)
     client.loop_start()
@@ -107,6 +124,19 @@ def publish_cmd(topic: str, payload: dict):
         logger.info(f"📤 MQTT published → {topic} : {payload}")
 
 
+def subscribe_mqtt(topic_filter: str, callback: Callable[[str, bytes], None]):
+    """
+    Register a handler for incoming messages on a topic filter.
+
+    The callback runs on the MQTT network thread and must not block; hand
+    the message over to the event loop with loop.call_soon_threadsafe.
+    May be called before or after connect_mqtt.
+    """
+    _subscriptions[topic_filter] = callback
+    if mqtt_client is not None and mqtt_ready:
+        mqtt_client.subscribe(topic_filter, qos=0)
+
+
 def disconnect_mqtt():
     """
     Clean shutdown called from FastAPI lifespan.
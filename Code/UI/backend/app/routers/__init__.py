@@ -13,7 +13,9 @@ from . import (
     test_relations,
     mqtt,
     system,
-    measurements
+    measurements,
+    live,
+    analysis
 )
 
 __all__ = [
@@ -25,5 +27,7 @@ __all__ = [
     "test_relations",
     "mqtt",
     "system",
-    "measurements"
+    "measurements",
+    "live",
+    "analysis"
 ]
\ No newline at end of file
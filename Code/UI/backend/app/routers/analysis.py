@@ -0,0 +1,293 @@
+"""
+Signal analysis router.
+
+Power spectral densities of raw measurements, computed on demand from the
+database (see app/analysis). Spectra of test segments are cached until the
+segment or its measurements change.
+
+Spectrograms are precomputed when a test stops and served as tiles: binary
+little-endian float16 arrays of dB values, tile_frames columns (time) x
+frequency_bins rows, one tile per channel, zoom level and tile index.
+Columns without data are NaN.
+
+Anomaly events are written by the streaming detectors of the MQTT worker
+and published live on the MQTT topic anomalies/<test_relation_id>.
+
+Comparisons overlay the aggregated series of several tests of one machine
+type, aligned on their start or on a wash-cycle phase, with a median /
+p5-p95 envelope per sensor type (cached until the data changes).
+"""
+
+import math
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Response
+
+import database.analysis as analysis_db
+from app.analysis import (
+    ALIGNMENTS,
+    PHASES,
+    SPECTRUM_WINDOWS,
+    compare_tests,
+    compute_spectrum,
+    get_segment_spectrum,
+    queue_spectrogram,
+)
+from database import get_test_relation_by_id, get_test_relations, get_tests_by_ids
+from database import test_segments as segments_db
+
+router = APIRouter()
+
+
+@router.get("/spectrum/{test_relation_id}", response_model=dict)
+async def get_spectrum(
+    test_relation_id: int,
+    segment_id: Optional[int] = Query(None, description="Analyse this test segment (cached)"),
+    start_time: Optional[datetime] = Query(None, description="Start of the analysed window"),
+    end_time: Optional[datetime] = Query(None, description="End of the analysed window"),
+    nperseg: int = Query(4096, ge=16, le=65536, description="Samples per Welch segment"),
+    overlap: float = Query(0.5, ge=0, le=0.95, description="Overlap of consecutive segments (fraction)"),
+    window: str = Query("hann", description=f"Window function: {', '.join(SPECTRUM_WINDOWS)}"),
+    sample_rate_hz: Optional[float] = Query(None, gt=0, description="Resampling rate (default: estimated from the data)"),
+    channels: Optional[str] = Query(None, description="Comma separated channels (default: all)"),
+):
+    """
+    Welch power spectral density of a test relation's raw measurements.
+
+    Either segment_id or a start_time/end_time window is required. Returns
+    the frequency axis and, per channel, the one-sided PSD (unit^2/Hz), the
+    number of averaged segments, the signal RMS and the peak frequency.
+    """
+    if window not in SPECTRUM_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"window must be one of {list(SPECTRUM_WINDOWS)}")
+    if segment_id is None and (start_time is None or end_time is None):
+        raise HTTPException(status_code=400, detail="Either segment_id or start_time and end_time are required")
+    if segment_id is not None and (start_time is not None or end_time is not None):
+        raise HTTPException(status_code=400, detail="segment_id cannot be combined with start_time/end_time")
+    if start_time is not None and end_time is not None and end_time <= start_time:
+        raise HTTPException(status_code=400, detail="end_time must be after start_time")
+
+    relation = await get_test_relation_by_id(test_relation_id)
+    if not relation:
+        raise HTTPException(status_code=404, detail="Test relation not found")
+
+    params = {
+        "nperseg": nperseg,
+        "overlap": overlap,
+        "window": window,
+        "sample_rate_hz": sample_rate_hz,
+        "channels": [c.strip() for c in channels.split(",") if c.strip()] if channels else None,
+    }
+
+    try:
+        if segment_id is None:
+            spectrum = await compute_spectrum(test_relation_id, start_time, end_time, **params)
+            return {**spectrum, "segment_id": None, "cached": False}
+
+        segment = await segments_db.get_segment_by_id(segment_id)
+        if not segment:
+            raise HTTPException(status_code=404, detail="Segment not found")
+        if segment["test_id"] != relation["test_id"]:
+            raise HTTPException(status_code=400, detail="Segment does not belong to the test of this relation")
+
+        spectrum, cached = await get_segment_spectrum(test_relation_id, segment, **params)
+        return {**spectrum, "cached": cached}
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error computing spectrum: {str(e)}")
+
+
+def _spectrogram_layout(spectrogram: Dict) -> Dict:
+    """Add the time / frequency scale of every zoom level to a spectrogram description."""
+    if not spectrogram["sample_rate_hz"]:
+        return spectrogram
+
+    frame_seconds = spectrogram["hop"] / spectrogram["sample_rate_hz"]
+    return {
+        **spectrogram,
+        "frequency_resolution_hz": spectrogram["sample_rate_hz"] / spectrogram["nperseg"],
+        "frame_seconds": frame_seconds,
+        "tile_format": {
+            "dtype": "float16",
+            "byte_order": "little",
+            "shape": [spectrogram["tile_frames"], spectrogram["frequency_bins"]],
+            "unit": "dB",
+        },
+        "zoom_levels": [
+            {
+                "level": level,
+                "column_seconds": frame_seconds * (1 << level),
+                "tile_seconds": frame_seconds * (spectrogram["tile_frames"] << level),
+                "tiles": math.ceil((spectrogram["frames"] or 0) / (spectrogram["tile_frames"] << level)),
+            }
+            for level in range(spectrogram["levels"])
+        ],
+    }
+
+
+@router.get("/spectrogram/{test_relation_id}", response_model=dict)
+async def get_spectrogram(test_relation_id: int):
+    """Status and tile layout of a test relation's spectrogram."""
+    spectrogram = await analysis_db.get_spectrogram(test_relation_id)
+    if not spectrogram:
+        raise HTTPException(status_code=404, detail="No spectrogram for this test relation")
+    return _spectrogram_layout(spectrogram)
+
+
+@router.post("/spectrogram/{test_relation_id}", response_model=dict)
+async def compute_spectrogram(test_relation_id: int):
+    """(Re)compute a test relation's spectrogram in the background."""
+    relation = await get_test_relation_by_id(test_relation_id)
+    if not relation:
+        raise HTTPException(status_code=404, detail="Test relation not found")
+
+    current = await analysis_db.get_spectrogram(test_relation_id)
+    if current and current["status"] == "processing":
+        raise HTTPException(status_code=409, detail="Spectrogram is being computed")
+
+    await queue_spectrogram(test_relation_id)
+    return await analysis_db.get_spectrogram(test_relation_id)
+
+
+@router.get("/spectrogram/{test_relation_id}/tiles/{level}/{tile_index}")
+async def get_spectrogram_tile(
+    test_relation_id: int,
+    level: int,
+    tile_index: int,
+    channel: Optional[str] = Query(None, description="Channel (required if the relation has several)"),
+):
+    """
+    One spectrogram tile as raw float16 bytes.
+
+    Tile tile_index of level covers tile_frames << level frames starting at
+    origin + tile_index * tile_seconds. Returns 204 for a tile without any
+    data (a gap longer than the tile).
+    """
+    spectrogram = await analysis_db.get_spectrogram(test_relation_id)
+    if not spectrogram:
+        raise HTTPException(status_code=404, detail="No spectrogram for this test relation")
+    if spectrogram["status"] == "processing" or not spectrogram["frames"]:
+        # A queued recomputation keeps serving the previous tiles until it starts
+        raise HTTPException(status_code=409, detail=f"Spectrogram is {spectrogram['status']}")
+
+    if channel is None:
+        if len(spectrogram["channels"]) != 1:
+            raise HTTPException(status_code=400, detail=f"channel is required: one of {spectrogram['channels']}")
+        channel = spectrogram["channels"][0]
+    elif channel not in spectrogram["channels"]:
+        raise HTTPException(status_code=404, detail=f"channel must be one of {spectrogram['channels']}")
+
+    if not 0 <= level < spectrogram["levels"]:
+        raise HTTPException(status_code=400, detail=f"level must be between 0 and {spectrogram['levels'] - 1}")
+    tile_frames = spectrogram["tile_frames"] << level
+    if not 0 <= tile_index < math.ceil(spectrogram["frames"] / tile_frames):
+        raise HTTPException(status_code=404, detail="Tile index out of range")
+
+    frame_seconds = spectrogram["hop"] / spectrogram["sample_rate_hz"]
+    tile_start = spectrogram["origin"] + timedelta(seconds=tile_index * tile_frames * frame_seconds)
+    headers = {
+        "X-Tile-Start": tile_start.isoformat(),
+        "X-Tile-Column-Seconds": str(frame_seconds * (1 << level)),
+        "X-Tile-Shape": f"{spectrogram['tile_frames']},{spectrogram['frequency_bins']}",
+    }
+
+    data = await analysis_db.get_spectrogram_tile(test_relation_id, channel, level, tile_index)
+    if data is None:
+        return Response(status_code=204, headers=headers)
+    return Response(content=data, media_type="application/octet-stream", headers=headers)
+
+
+@router.get("/anomalies/{test_relation_id}", response_model=list)
+async def get_anomalies(
+    test_relation_id: int,
+    start_time: Optional[datetime] = Query(None, description="Start time for data range"),
+    end_time: Optional[datetime] = Query(None, description="End time for data range"),
+    detector: Optional[str] = Query(None, description="Only events of this detector ('ewma', 'limit')"),
+    limit: int = Query(1000, ge=1, le=100_000, description="Maximum number of events"),
+):
+    """Anomaly events of a test relation, oldest first."""
+    try:
+        return await analysis_db.get_anomaly_events([test_relation_id], start_time, end_time, detector, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching anomaly events: {str(e)}")
+
+
+@router.get("/anomalies/test/{test_id}", response_model=list)
+async def get_test_anomalies(
+    test_id: int,
+    start_time: Optional[datetime] = Query(None, description="Start time for data range"),
+    end_time: Optional[datetime] = Query(None, description="End time for data range"),
+    detector: Optional[str] = Query(None, description="Only events of this detector ('ewma', 'limit')"),
+    limit: int = Query(1000, ge=1, le=100_000, description="Maximum number of events"),
+):
+    """Anomaly events of all relations of a test, oldest first."""
+    relations = await get_test_relations(test_id)
+    if not relations:
+        return []
+    try:
+        return await analysis_db.get_anomaly_events(
+            [r["id"] for r in relations], start_time, end_time, detector, limit
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching anomaly events: {str(e)}")
+
+
+# Upper bound of the tests in one comparison
+MAX_COMPARED_TESTS = 100
+
+
+@router.get("/compare", response_model=dict)
+async def get_comparison(
+    test_ids: str = Query(..., description="Comma separated test IDs (all of one machine type)"),
+    align: str = Query("start", description=f"Alignment: {', '.join(ALIGNMENTS)}"),
+    phase: Optional[str] = Query(None, description=f"Phase to align on with align=phase: {', '.join(PHASES)}"),
+    occurrence: int = Query(1, ge=1, description="Align on the n-th segment of the phase"),
+    offset_seconds: float = Query(0, description="Window start relative to the alignment origin"),
+    duration_seconds: Optional[float] = Query(None, gt=0, description="Window length (default: longest phase / test)"),
+    points: int = Query(500, ge=10, le=5000, description="Maximum number of bins"),
+):
+    """
+    Overlay the aggregated series of several tests of one machine type.
+
+    Each test's window starts offset_seconds after its first measurement
+    (align=start) or after the start of its occurrence-th segment of phase
+    (align=phase, see segment detection). Returns the relative time axis,
+    and per sensor type and channel the binned series of every test plus
+    the median and 5th / 95th percentile across tests.
+    """
+    try:
+        ids = list(dict.fromkeys(int(i) for i in test_ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="test_ids must be comma separated integers")
+    if not ids:
+        raise HTTPException(status_code=400, detail="test_ids is required")
+    if len(ids) > MAX_COMPARED_TESTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_COMPARED_TESTS} tests can be compared")
+    if align not in ALIGNMENTS:
+        raise HTTPException(status_code=400, detail=f"align must be one of {list(ALIGNMENTS)}")
+    if align == "phase" and phase not in PHASES:
+        raise HTTPException(status_code=400, detail=f"phase must be one of {list(PHASES)} with align=phase")
+
+    tests = await get_tests_by_ids(ids)
+    missing = sorted(set(ids) - {t["id"] for t in tests})
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Tests not found: {missing}")
+    machine_types = {t["machine_type_id"] for t in tests}
+    if None in machine_types:
+        raise HTTPException(status_code=400, detail="All tests must belong to a machine with a machine type")
+    if len(machine_types) > 1:
+        raise HTTPException(status_code=400, detail="All tests must be of the same machine type")
+
+    try:
+        comparison, cached = await compare_tests(
+            tests, align, phase, occurrence, offset_seconds, duration_seconds, points
+        )
+        return {**comparison, "cached": cached}
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error comparing tests: {str(e)}")
@@ -0,0 +1,120 @@
+"""
+Live measurements router.
+
+WebSocket and Server-Sent Events endpoints that push the samples of running
+tests as they arrive from the MQTT worker (see app/live/hub.py). Clients
+subscribe either to a list of test relations or to all relations of a test
+and may ask for a lower sample rate.
+
+Every message is a JSON object:
+
+    {"relation_id": 12, "channels": ["x", "y", "z"],
+     "timestamps": [<epoch ms>, ...], "values": [[x, y, z], ...],
+     "dropped": <messages dropped so far because the client was too slow>}
+"""
+
+import asyncio
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from app.core.serialization import dumps
+from app.live import live_hub
+from database import get_test_relations
+
+router = APIRouter()
+
+# Comment line sent to idle SSE clients so proxies keep the connection open
+SSE_KEEPALIVE_SECONDS = 15
+
+
+async def _resolve_relation_ids(relation_ids: Optional[str], test_id: Optional[int]) -> List[int]:
+    """Parse relation_ids ('1,2,3') or look up the relations of test_id."""
+    if relation_ids:
+        try:
+            return [int(r) for r in relation_ids.split(",") if r.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="relation_ids must be a comma separated list of integers")
+    if test_id is not None:
+        relations = await get_test_relations(test_id)
+        if not relations:
+            raise HTTPException(status_code=404, detail="No sensors found for this test")
+        return [r["id"] for r in relations]
+    raise HTTPException(status_code=400, detail="Either relation_ids or test_id is required")
+
+
+@router.websocket("/ws")
+async def live_websocket(
+    websocket: WebSocket,
+    relation_ids: Optional[str] = Query(None, description="Comma separated test relation IDs"),
+    test_id: Optional[int] = Query(None, description="Subscribe to all relations of this test"),
+    rate_hz: Optional[float] = Query(None, gt=0, description="Maximum samples per second per relation"),
+):
+    """Push live samples over a WebSocket (one JSON text message per batch)."""
+    try:
+        ids = await _resolve_relation_ids(relation_ids, test_id)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail)
+        return
+
+    await websocket.accept()
+    subscription = live_hub.subscribe(ids, rate_hz)
+
+    async def send():
+        while True:
+            message = await subscription.get()
+            await websocket.send_text(dumps(message).decode())
+
+    async def receive():
+        # Returns when the client disconnects, even while no data arrives
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    tasks = [asyncio.create_task(send()), asyncio.create_task(receive())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        live_hub.unsubscribe(subscription)
+
+
+@router.get("/sse")
+async def live_sse(
+    request: Request,
+    relation_ids: Optional[str] = Query(None, description="Comma separated test relation IDs"),
+    test_id: Optional[int] = Query(None, description="Subscribe to all relations of this test"),
+    rate_hz: Optional[float] = Query(None, gt=0, description="Maximum samples per second per relation"),
+):
+    """Push live samples as Server-Sent Events (one 'data:' event per batch)."""
+    ids = await _resolve_relation_ids(relation_ids, test_id)
+    subscription = live_hub.subscribe(ids, rate_hz)
+
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(subscription.get(), SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                yield b"data: " + dumps(message) + b"\n\n"
+        finally:
+            live_hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/stats", response_model=dict)
+async def live_stats():
+    """Number of live clients, watched relations and dropped messages."""
+    return live_hub.stats()
@@ -1,25 +1,45 @@
-from fastapi import APIRouter, HTTPException, Query, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse, FileResponse
-from typing import List, Optional, Dict
+from typing import List, Optional
 from datetime import datetime, timedelta
 from pydantic import BaseModel
 import database.measurements as measurements_db
-from app.models import MeasurementAveraged, MeasurementRaw
-import io
-import csv
+import database.export_jobs as export_jobs_db
+import database.delete_jobs as delete_jobs_db
+from database import get_test_by_id, get_test_relations
+from app.models import MeasurementAveraged, MeasurementRaw, MeasurementStats, ExportAlignment
+from app.core.arrow_stream import ARROW_STREAM_MEDIA_TYPE, stream_arrow_ipc
+from app.core.http_cache import conditional_response
+from app.core.serialization import (
+    NDJSON_MEDIA_TYPE, RecordJSONResponse, dumps, records_to_ndjson, records_to_columnar, records_to_grouped_columnar
+)
 import os
 import uuid
-import pandas as pd
-import asyncio
+
+from app.maintenance import submit_delete_job
+from app.export import (
+    ALIGNMENT_STRATEGIES, EXPORT_FORMATS, export_slots, get_export_writer, iter_export_blocks, load_export_scope, stream_csv,
+    submit_export_job
+)
 
 router = APIRouter()
 
-# In-memory job tracking (consider using Redis for production)
-export_jobs: Dict[str, dict] = {}
+# Response formats accepted by the /avg and /raw endpoints
+RESPONSE_FORMATS = ["json", "columnar"]
+
+# Data types of the test batch endpoint and their default per-channel limit
+BATCH_DATA_TYPES = {"avg": 1000, "raw": 10000}
+
+# Suggested wait of a streamed download refused for lack of an export slot
+EXPORT_RETRY_AFTER_SECONDS = 30
 
-# Directory to store export files temporarily
-EXPORT_DIR = "/tmp/exports"
-os.makedirs(EXPORT_DIR, exist_ok=True)
+
+def _export_slots_busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="All export slots are busy, try again later or queue the export with POST /export",
+        headers={"Retry-After": str(EXPORT_RETRY_AFTER_SECONDS)}
+    )
 
 
 class CropRequest(BaseModel):
@@ -35,67 +55,125 @@ class ExportRequest(BaseModel):
     data_type: str  # "aggregated" or "raw"
     time_range: str  # "whole" or "segment"
     segment_id: Optional[int] = None
+    priority: int = 0  # higher runs first
+    format: str = "parquet"  # "parquet", "csv", "feather", "hdf5" or "wav"
+    alignment: Optional[ExportAlignment] = None  # default: exact timestamp join
 
 
 @router.get("/avg/{test_relation_id}", response_model=List[MeasurementAveraged])
 async def get_sensor_measurements_avg(
+    request: Request,
+    test_relation_id: int,
+    start_time: Optional[datetime] = Query(None, description="Start time for data range"),
+    end_time: Optional[datetime] = Query(None, description="End time for data range"),
+    limit: Optional[int] = Query(1000, description="Maximum number of data points per channel"),
+    format: str = Query("json", description="'json' (list of MeasurementAveraged) or 'columnar'")
+):
+    """Get measurements for a specific test relation (sensor in a test), grouped by channel.
+
+    format=columnar returns {channel: {"t": [...], "v": [...], "min": [...], "max": [...]}}
+    with epoch-ms timestamps and v = avg_value.
+
+    Responses for finished tests carry an ETag / Last-Modified, answer
+    conditional requests with 304 and are cached (see app/core/http_cache.py).
+    """
+    if format not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'columnar'")
+
+    async def build():
+        try:
+            records = await measurements_db.fetch_sensor_measurements_avg(
+                test_relation_id,
+                start_time=start_time,
+                end_time=end_time,
+                limit=limit
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error fetching measurements: {str(e)}")
+
+        if format == "columnar":
+            return RecordJSONResponse(records_to_columnar(
+                records,
+                value_field="avg_value",
+                extra_fields={"min": "min_value", "max": "max_value"}
+            ))
+
+        # Records are encoded directly; response_model only documents the shape
+        return RecordJSONResponse(records)
+
+    return await conditional_response(request, [test_relation_id], build)
+    
+
+@router.get("/stats/{test_relation_id}", response_model=List[MeasurementStats])
+async def get_sensor_measurement_stats(
+    request: Request,
     test_relation_id: int,
     start_time: Optional[datetime] = Query(None, description="Start time for data range"),
     end_time: Optional[datetime] = Query(None, description="End time for data range"),
-    limit: Optional[int] = Query(1000, description="Maximum number of data points per channel")
+    bucket_seconds: int = Query(10, ge=10, description="Bucket width in seconds (multiple of 10)"),
+    format: str = Query("json", description="'json' (list of MeasurementStats) or 'columnar'")
 ):
-    """Get measurements for a specific test relation (sensor in a test), grouped by channel."""
+    """Get RMS, standard deviation, peak and crest factor per channel and time bucket.
+
+    Computed from the incrementally maintained 10s statistics aggregate, so
+    any range costs the same regardless of the raw sample rate. The most
+    recent ~2 minutes are not materialized yet.
+
+    format=columnar returns {channel: {"t": [...], "v": [...], "std": [...], "peak": [...], "crest": [...]}}
+    with epoch-ms timestamps and v = rms_value.
+    """
+    if format not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'columnar'")
+    if bucket_seconds % 10:
+        raise HTTPException(status_code=400, detail="bucket_seconds must be a multiple of 10")
+
+    async def build():
+        try:
+            records = await measurements_db.fetch_sensor_measurement_stats(
+                test_relation_id,
+                start_time=start_time,
+                end_time=end_time,
+                bucket=timedelta(seconds=bucket_seconds)
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error fetching measurement statistics: {str(e)}")
+
+        if format == "columnar":
+            return RecordJSONResponse(records_to_columnar(
+                records,
+                value_field="rms_value",
+                extra_fields={"std": "std_value", "peak": "max_abs_value", "crest": "crest_factor"}
+            ))
+
+        return RecordJSONResponse(records)
+
+    return await conditional_response(request, [test_relation_id], build)
+
+
+@router.get("/stats/{test_relation_id}/summary", response_model=List[dict])
+async def get_sensor_measurement_stats_summary(
+    test_relation_id: int,
+    start_time: Optional[datetime] = Query(None, description="Start time for data range"),
+    end_time: Optional[datetime] = Query(None, description="End time for data range")
+):
+    """Get RMS, standard deviation, peak and crest factor per channel over the whole range."""
     try:
-        measurements = await measurements_db.get_sensor_measurements_avg(test_relation_id)
-        
-        # Filter by time range if provided
-        if start_time or end_time:
-            filtered_measurements = []
-            for measurement in measurements:
-                measurement_time = measurement.get('measurement_timestamp')
-                if measurement_time:
-                    if isinstance(measurement_time, str):
-                        measurement_time = datetime.fromisoformat(measurement_time.replace('Z', '+00:00'))
-                    
-                    if start_time and measurement_time < start_time:
-                        continue
-                    if end_time and measurement_time > end_time:
-                        continue
-                    
-                    filtered_measurements.append(measurement)
-            measurements = filtered_measurements
-        
-        # Apply limit per channel
-        if limit:
-            # Group by channel
-            channel_groups = {}
-            for measurement in measurements:
-                channel = measurement.get('measurement_channel', 'none')
-                if channel not in channel_groups:
-                    channel_groups[channel] = []
-                channel_groups[channel].append(measurement)
-            
-            # Apply limit to each channel and combine
-            limited_measurements = []
-            for channel, channel_data in channel_groups.items():
-                # Take the most recent measurements per channel
-                limited_measurements.extend(channel_data[-limit:])
-            
-            measurements = limited_measurements
-        
-        return measurements
-        
+        return await measurements_db.get_measurement_stats_summary(
+            [test_relation_id], start_time=start_time, end_time=end_time
+        )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching measurements: {str(e)}")
-    
+        raise HTTPException(status_code=500, detail=f"Error fetching measurement statistics: {str(e)}")
+
 
 @router.get("/raw/{test_relation_id}", response_model=List[MeasurementRaw])
 async def get_sensor_measurements_raw(
+    request: Request,
     test_relation_id: int,
     start_time: Optional[datetime] = Query(None, description="Start time for data range"),
     end_time: Optional[datetime] = Query(None, description="End time for data range"),
     last_minutes: Optional[int] = Query(None, description="Fetch measurements from the last N minutes"),
-    limit: Optional[int] = Query(10000, description="Maximum number of data points per channel")
+    limit: Optional[int] = Query(10000, description="Maximum number of data points per channel"),
+    format: str = Query("json", description="'json' (list of MeasurementRaw) or 'columnar'")
 ):
     """Get raw measurements for a specific test relation (sensor in a test).
     
@@ -104,31 +182,212 @@ async def get_sensor_measurements_raw(
     - last_minutes: Fetch measurements from the last N minutes relative to latest timestamp
     - None: Fetch all available measurements (still limited by 'limit' per channel)
     
-    Returns up to 'limit' measurements per channel.
+    Returns up to 'limit' measurements per channel. format=columnar returns
+    {channel: {"t": [...], "v": [...]}} with epoch-ms timestamps.
+
+    Responses for finished tests carry an ETag / Last-Modified, answer
+    conditional requests with 304 and are cached (see app/core/http_cache.py).
     """
-    try:
-        # Validate conflicting parameters
-        if last_minutes is not None and (start_time or end_time):
-            raise HTTPException(
-                status_code=400, 
-                detail="Cannot use 'last_minutes' together with 'start_time' or 'end_time'. Choose one filtering method."
+    if format not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'columnar'")
+
+    # Validate conflicting parameters
+    if last_minutes is not None and (start_time or end_time):
+        raise HTTPException(
+            status_code=400, 
+            detail="Cannot use 'last_minutes' together with 'start_time' or 'end_time'. Choose one filtering method."
+        )
+
+    async def build():
+        try:
+            # Pass all parameters to database function - it handles the filtering efficiently
+            records = await measurements_db.fetch_sensor_measurements_raw(
+                test_relation_id=test_relation_id,
+                limit=limit,
+                last_minutes=last_minutes,
+                start_time=start_time,
+                end_time=end_time
             )
-        
-        # Pass all parameters to database function - it handles the filtering efficiently
-        measurements = await measurements_db.get_sensor_measurements_raw(
-            test_relation_id=test_relation_id,
-            limit=limit,
-            last_minutes=last_minutes,
-            start_time=start_time,
-            end_time=end_time
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error fetching raw measurements: {str(e)}")
+
+        if format == "columnar":
+            return RecordJSONResponse(records_to_columnar(records))
+
+        return RecordJSONResponse(records)
+
+    return await conditional_response(request, [test_relation_id], build)
+
+
+@router.get("/test/{test_id}", response_model=dict)
+async def get_test_measurements(
+    request: Request,
+    test_id: int,
+    data_type: str = Query("avg", description="'avg' (10s aggregates) or 'raw'"),
+    relation_ids: Optional[str] = Query(None, description="Comma separated test relation IDs (default: all of the test)"),
+    start_time: Optional[datetime] = Query(None, description="Start time for data range"),
+    end_time: Optional[datetime] = Query(None, description="End time for data range"),
+    last_minutes: Optional[int] = Query(None, description="Raw only: the last N minutes before each relation's latest sample"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of data points per relation and channel (default: 1000 avg, 10000 raw)")
+):
+    """
+    Get the measurements of all relations of a test in one query.
+
+    Returns {"test_id", "data_type", "relations": {"test_relation_id": {channel:
+    {"t": [...], "v": [...]}}}} with epoch-ms timestamps; avg series carry
+    "min" / "max" as well, like format=columnar of /avg and /raw. Relations
+    without data in the range map to {}.
+
+    Responses for finished tests carry an ETag / Last-Modified, answer
+    conditional requests with 304 and are cached (see app/core/http_cache.py).
+    """
+    if data_type not in BATCH_DATA_TYPES:
+        raise HTTPException(status_code=400, detail=f"data_type must be one of {list(BATCH_DATA_TYPES)}")
+    if last_minutes is not None and (data_type != "raw" or start_time or end_time):
+        raise HTTPException(
+            status_code=400,
+            detail="'last_minutes' is only supported for raw data and cannot be combined with 'start_time' or 'end_time'"
         )
-        
-        return measurements
-        
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching raw measurements: {str(e)}")
+
+    test = await get_test_by_id(test_id)
+    if not test:
+        raise HTTPException(status_code=404, detail="Test not found")
+
+    test_relation_ids = [r["id"] for r in await get_test_relations(test_id)]
+    if relation_ids:
+        try:
+            requested = [int(i) for i in relation_ids.split(",") if i.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="relation_ids must be comma separated integers")
+        unknown = sorted(set(requested) - set(test_relation_ids))
+        if unknown:
+            raise HTTPException(status_code=404, detail=f"Relations {unknown} do not belong to this test")
+        test_relation_ids = list(dict.fromkeys(requested))
+    if not test_relation_ids:
+        return {"test_id": test_id, "data_type": data_type, "relations": {}}
+
+    limit = limit or BATCH_DATA_TYPES[data_type]
+
+    async def build():
+        try:
+            if data_type == "avg":
+                records = await measurements_db.fetch_measurements_avg_for_relations(
+                    test_relation_ids, start_time=start_time, end_time=end_time, limit=limit
+                )
+                relations = records_to_grouped_columnar(
+                    records,
+                    test_relation_ids,
+                    value_field="avg_value",
+                    extra_fields={"min": "min_value", "max": "max_value"}
+                )
+            else:
+                records = await measurements_db.fetch_measurements_raw_for_relations(
+                    test_relation_ids, limit=limit, last_minutes=last_minutes, start_time=start_time, end_time=end_time
+                )
+                relations = records_to_grouped_columnar(records, test_relation_ids)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error fetching measurements: {str(e)}")
+
+        return RecordJSONResponse({"test_id": test_id, "data_type": data_type, "relations": relations})
+
+    return await conditional_response(request, test_relation_ids, build)
+
+
+@router.get("/raw/{test_relation_id}/stream")
+async def stream_sensor_measurements_raw(
+    test_relation_id: int,
+    after_timestamp: Optional[datetime] = Query(None, description="Resume after this timestamp (exclusive, together with after_channel)"),
+    after_channel: Optional[str] = Query(None, description="Channel of the last received sample"),
+    end_time: Optional[datetime] = Query(None, description="End time for data range"),
+    page_size: int = Query(5000, ge=1, le=100_000, description="Rows fetched from the database per page"),
+    format: str = Query("ndjson", description="'ndjson' (one sample per line) or 'columnar' (one page per line)")
+):
+    """Stream all raw measurements of a test relation with constant server memory.
+
+    Rows are walked in (timestamp, channel) order with a keyset cursor, so a
+    client can resume an interrupted download by passing the last received
+    sample's timestamp and channel as after_timestamp/after_channel. Every
+    page is its own short query, so a slow client holds no connection.
+
+    - ndjson: one MeasurementRaw object per line
+    - columnar: one line per page, {"data": {channel: {"t": [...], "v": [...]}}, "next_cursor": {...}}
+    """
+    if format not in ["ndjson", "columnar"]:
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'columnar'")
+
+    if after_channel is not None and after_timestamp is None:
+        raise HTTPException(status_code=400, detail="after_channel requires after_timestamp")
+
+    pages = measurements_db.page_sensor_measurements_raw(
+        test_relation_id=test_relation_id,
+        end_time=end_time,
+        page_size=page_size,
+        after_timestamp=after_timestamp,
+        after_channel=after_channel
+    )
+
+    async def body():
+        try:
+            async for page in pages:
+                if format == "ndjson":
+                    yield records_to_ndjson(page)
+                else:
+                    last = page[-1]
+                    yield dumps({
+                        "data": records_to_columnar(page),
+                        "next_cursor": {
+                            "after_timestamp": last["measurement_timestamp"],
+                            "after_channel": last["measurement_channel"]
+                        }
+                    }) + b"\n"
+        finally:
+            await pages.aclose()
+
+    return StreamingResponse(body(), media_type=NDJSON_MEDIA_TYPE)
+
+
+@router.get("/arrow/{test_id}")
+async def stream_test_measurements_arrow(
+    test_id: int,
+    start_time: Optional[datetime] = Query(None, description="Start time for data range"),
+    end_time: Optional[datetime] = Query(None, description="End time for data range"),
+    batch_size: int = Query(50_000, ge=1_000, le=1_000_000, description="Rows per Arrow record batch")
+):
+    """Stream all raw measurements of a test as an Arrow IPC stream.
+
+    One record batch is written per database page, with columns
+    measurement_timestamp (timestamp[ms, UTC]), test_relation_id (int32),
+    measurement_channel (dictionary<int32, string>) and measurement_value (float64).
+    Read it with pyarrow.ipc.open_stream or polars.read_ipc_stream.
+
+    The stream holds a database cursor until it ends and takes one of the
+    export slots; 503 is returned if all are busy.
+    """
+    import database.test_relations as test_relations_db
+
+    test_relations = await test_relations_db.get_test_relations(test_id)
+    if not test_relations:
+        raise HTTPException(status_code=404, detail="No sensors found for this test")
+
+    pages = measurements_db.stream_measurements_raw_for_relations(
+        [relation['id'] for relation in test_relations],
+        start_time=start_time,
+        end_time=end_time,
+        page_size=batch_size
+    )
+    body = await export_slots.open_stream(stream_arrow_ipc(pages), pages)
+    if body is None:
+        raise _export_slots_busy()
+
+    return StreamingResponse(
+        body,
+        media_type=ARROW_STREAM_MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="test_{test_id}_raw.arrows"'}
+    )
 
 
 @router.post("/crop", response_model=dict)
@@ -137,207 +396,153 @@ async def crop_measurements(crop_request: CropRequest):
     Crop (permanently delete) measurements outside the specified time range for a test.
     Deletes data from both raw measurements and aggregated tables.
     
+    The deletion runs as a background job; poll /delete/status/{job_id}.
+    
     ⚠️ WARNING: This operation is permanent and cannot be undone!
     """
+    if crop_request.start_time >= crop_request.end_time:
+        raise HTTPException(
+            status_code=400,
+            detail="Start time must be before end time"
+        )
+    
+    # Import here to avoid circular dependencies
+    import database.test_relations as test_relations_db
+    
     try:
-        if crop_request.start_time >= crop_request.end_time:
-            raise HTTPException(
-                status_code=400,
-                detail="Start time must be before end time"
-            )
-        
-        result = await measurements_db.crop_measurements_by_test(
+        relations = await test_relations_db.get_test_relations(crop_request.test_id)
+        job = await submit_delete_job(
+            "crop",
+            [r["id"] for r in relations],
             test_id=crop_request.test_id,
-            start_time=crop_request.start_time,
-            end_time=crop_request.end_time
+            keep_start=crop_request.start_time,
+            keep_end=crop_request.end_time
         )
-        
-        return {
-            "message": "Measurements cropped successfully",
-            "raw_deleted": result["raw_deleted"],
-            "avg_deleted": result["avg_deleted"],
-            "total_deleted": result["raw_deleted"] + result["avg_deleted"]
-        }
-        
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error cropping measurements: {str(e)}"
         )
+    
+    return {
+        "message": "Crop started",
+        "job_id": job["id"]
+    }
 
 
-async def generate_export_file(job_id: str, export_request: ExportRequest):
-    """Background task to generate export file."""
+@router.get("/delete/status/{job_id}")
+async def get_delete_status(job_id: str):
+    """Get the status of a delete job (crop, test or test relation deletion)."""
     try:
-        export_jobs[job_id]['status'] = 'processing'
-        export_jobs[job_id]['progress'] = 0
-        
-        # Import here to avoid circular dependencies
-        import database.test_relations as test_relations_db
-        import database.test_segments as test_segments_db
-        
-        # Get time range
-        start_time = None
-        end_time = None
-        
-        if export_request.time_range == "segment":
-            segment = await test_segments_db.get_segment_by_id(export_request.segment_id)
-            if not segment:
-                export_jobs[job_id]['status'] = 'failed'
-                export_jobs[job_id]['error'] = 'Segment not found'
-                return
-            start_time = segment['start_time']
-            end_time = segment['end_time']
-        
-        # Get all test relations (sensors in the test)
-        test_relations = await test_relations_db.get_test_relations(export_request.test_id)
-        if not test_relations:
-            export_jobs[job_id]['status'] = 'failed'
-            export_jobs[job_id]['error'] = 'No sensors found for this test'
-            return
-        
-        export_jobs[job_id]['progress'] = 10
-        
-        # Fetch all sensor data
-        sensor_dataframes = []
-        total_sensors = len(test_relations)
-        
-        for idx, relation in enumerate(test_relations):
-            test_relation_id = relation['id']
-            sensor_name = relation['sensor_name']
-            sensor_location = relation.get('sensor_location', 'N/A')
-            sensor_unit = relation['sensor_type_unit']
-            
-            # Fetch measurements
-            if export_request.data_type == "aggregated":
-                measurements = await measurements_db.get_sensor_measurements_avg(test_relation_id)
-            else:
-                measurements = await measurements_db.get_sensor_measurements_raw(
-                    test_relation_id,
-                    limit=1_000_000,
-                    start_time=start_time,
-                    end_time=end_time
-                )
-            
-            # Filter by time if needed (for aggregated data)
-            if start_time and end_time and export_request.data_type == "aggregated":
-                measurements = [
-                    m for m in measurements
-                    if start_time <= m['measurement_timestamp'] <= end_time
-                ]
-            
-            if measurements:
-                # Convert to DataFrame
-                df = pd.DataFrame(measurements)
-                
-                # Rename columns with sensor info
-                df['timestamp'] = pd.to_datetime(df['measurement_timestamp'])
-                df = df.sort_values('timestamp')
-                
-                # Create column names based on data type
-                if export_request.data_type == "aggregated":
-                    # For aggregated: keep avg, min, max with sensor prefix
-                    channel_col = df['measurement_channel'].fillna('value')
-                    df[f"{sensor_name}_{sensor_location}_avg_{sensor_unit}"] = df['avg_value']
-                    df[f"{sensor_name}_{sensor_location}_min_{sensor_unit}"] = df['min_value']
-                    df[f"{sensor_name}_{sensor_location}_max_{sensor_unit}"] = df['max_value']
-                    df = df[['timestamp', f"{sensor_name}_{sensor_location}_avg_{sensor_unit}", 
-                            f"{sensor_name}_{sensor_location}_min_{sensor_unit}", 
-                            f"{sensor_name}_{sensor_location}_max_{sensor_unit}"]]
-                else:
-                    # For raw: just value
-                    df[f"{sensor_name}_{sensor_location}_{sensor_unit}"] = df['measurement_value']
-                    df = df[['timestamp', f"{sensor_name}_{sensor_location}_{sensor_unit}"]]
-                
-                sensor_dataframes.append(df)
-            
-            # Update progress
-            export_jobs[job_id]['progress'] = 10 + int((idx + 1) / total_sensors * 60)
-        
-        export_jobs[job_id]['progress'] = 70
-        
-        # Merge all sensor dataframes on timestamp
-        if sensor_dataframes:
-            merged_df = sensor_dataframes[0]
-            for df in sensor_dataframes[1:]:
-                merged_df = pd.merge(merged_df, df, on='timestamp', how='outer')
-            
-            merged_df = merged_df.sort_values('timestamp')
-            
-            export_jobs[job_id]['progress'] = 80
-            
-            # Save to parquet
-            filename = f"test_{export_request.test_id}_{export_request.data_type}_{job_id}.parquet"
-            filepath = os.path.join(EXPORT_DIR, filename)
-            
-            merged_df.to_parquet(filepath, index=False, compression='snappy')
-            
-            export_jobs[job_id]['status'] = 'completed'
-            export_jobs[job_id]['progress'] = 100
-            export_jobs[job_id]['filename'] = filename
-            export_jobs[job_id]['filepath'] = filepath
-            export_jobs[job_id]['completed_at'] = datetime.now().isoformat()
-        else:
-            export_jobs[job_id]['status'] = 'failed'
-            export_jobs[job_id]['error'] = 'No data to export'
-        
-    except Exception as e:
-        export_jobs[job_id]['status'] = 'failed'
-        export_jobs[job_id]['error'] = str(e)
+        uuid.UUID(job_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    job = await delete_jobs_db.get_delete_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    job["total_deleted"] = job["raw_deleted"] + job["avg_deleted"]
+    return job
 
 
-@router.post("/export")
-async def start_export(export_request: ExportRequest, background_tasks: BackgroundTasks):
-    """
-    Start a background export job.
-    Returns a job_id to track progress.
-    """
-    # Validate inputs
-    if export_request.data_type not in ["aggregated", "raw"]:
+def _validate_export_params(data_type: str, time_range: str, segment_id: Optional[int], format: str):
+    if data_type not in ["aggregated", "raw"]:
         raise HTTPException(status_code=400, detail="data_type must be 'aggregated' or 'raw'")
     
-    if export_request.time_range not in ["whole", "segment"]:
+    if time_range not in ["whole", "segment"]:
         raise HTTPException(status_code=400, detail="time_range must be 'whole' or 'segment'")
     
-    if export_request.time_range == "segment" and not export_request.segment_id:
+    if time_range == "segment" and not segment_id:
         raise HTTPException(status_code=400, detail="segment_id is required when time_range is 'segment'")
     
-    # Create job
-    job_id = str(uuid.uuid4())
-    export_jobs[job_id] = {
-        'status': 'queued',
-        'progress': 0,
-        'created_at': datetime.now().isoformat(),
-        'test_id': export_request.test_id,
-        'data_type': export_request.data_type,
-        'time_range': export_request.time_range
-    }
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {list(EXPORT_FORMATS)}")
     
-    # Start background task
-    background_tasks.add_task(generate_export_file, job_id, export_request)
+    if data_type not in EXPORT_FORMATS[format].data_types:
+        raise HTTPException(status_code=400, detail=f"format '{format}' does not support data_type '{data_type}'")
+
+
+def _validate_alignment(alignment: Optional[ExportAlignment]):
+    if alignment is None:
+        return
+    
+    if alignment.strategy not in ALIGNMENT_STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"alignment strategy must be one of {ALIGNMENT_STRATEGIES}")
+    
+    if alignment.strategy == "resample" and not (alignment.rate_hz and alignment.rate_hz > 0):
+        raise HTTPException(status_code=400, detail="rate_hz > 0 is required for the 'resample' strategy")
+    
+    if alignment.tolerance_ms is not None and alignment.tolerance_ms <= 0:
+        raise HTTPException(status_code=400, detail="tolerance_ms must be positive")
+
+
+@router.post("/export")
+async def start_export(export_request: ExportRequest):
+    """
+    Queue an export job.
+    Returns a job_id to track progress.
+
+    format=wav (raw data only) zips one WAV file per accelerometer channel,
+    resampled to the channel's estimated sample rate. Gaps up to a second
+    are filled with silence, longer ones start a new '<channel>_partN.wav'.
+    """
+    _validate_export_params(
+        export_request.data_type,
+        export_request.time_range,
+        export_request.segment_id,
+        export_request.format
+    )
+    _validate_alignment(export_request.alignment)
+    
+    # Create job, or reuse the export of identical, unchanged data
+    try:
+        job, cached = await submit_export_job(
+            export_request.test_id,
+            export_request.data_type,
+            export_request.time_range,
+            export_request.segment_id,
+            export_request.priority,
+            export_request.format,
+            export_request.alignment.model_dump() if export_request.alignment else None
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating export job: {str(e)}")
     
     return {
-        'job_id': job_id,
-        'message': 'Export job started'
+        'job_id': job['id'],
+        'cached': cached,
+        'message': 'Export served from cache' if cached else 'Export job queued'
     }
 
 
+async def _get_export_job_or_404(job_id: str) -> dict:
+    try:
+        uuid.UUID(job_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    job = await export_jobs_db.get_export_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
 @router.get("/export/status/{job_id}")
 async def get_export_status(job_id: str):
     """Get the status of an export job."""
-    if job_id not in export_jobs:
-        raise HTTPException(status_code=404, detail="Job not found")
-    
-    return export_jobs[job_id]
+    job = await _get_export_job_or_404(job_id)
+    job.pop('filepath', None)
+    return job
 
 
 @router.get("/export/download/{job_id}")
 async def download_export(job_id: str):
     """Download the completed export file."""
-    if job_id not in export_jobs:
-        raise HTTPException(status_code=404, detail="Job not found")
+    job = await _get_export_job_or_404(job_id)
     
-    job = export_jobs[job_id]
+    if job['status'] == 'expired':
+        raise HTTPException(status_code=410, detail="Export file has expired, please export again")
     
     if job['status'] != 'completed':
         raise HTTPException(status_code=400, detail=f"Job status is {job['status']}, not completed")
@@ -348,6 +553,58 @@ async def download_export(job_id: str):
     
     return FileResponse(
         filepath,
-        media_type='application/octet-stream',
+        media_type=get_export_writer(job['format']).media_type,
         filename=job['filename']
     )
+
+
+@router.get("/export/stream/{test_id}")
+async def stream_export_csv(
+    test_id: int,
+    data_type: str = Query("raw", description="'aggregated' or 'raw'"),
+    time_range: str = Query("whole", description="'whole' or 'segment'"),
+    segment_id: Optional[int] = Query(None, description="Segment to export when time_range is 'segment'"),
+    alignment: str = Query("exact", description="'exact', 'resample', 'asof' or 'ffill'"),
+    rate_hz: Optional[float] = Query(None, description="Target sample rate for 'resample'"),
+    tolerance_ms: Optional[float] = Query(None, description="Tolerance for 'asof' / 'ffill'"),
+    reference_relation_id: Optional[int] = Query(None, description="Time axis sensor for 'asof'")
+):
+    """
+    Stream a test export as CSV without going through the job queue.
+
+    Rows are produced by the same bounded-memory merge as the queued exports
+    and sent in chunks while the test is still being read. The download
+    takes one of the export slots the queued exports run in; 503 is
+    returned if all are busy.
+    """
+    _validate_export_params(data_type, time_range, segment_id, "csv")
+    export_alignment = ExportAlignment(
+        strategy=alignment,
+        rate_hz=rate_hz,
+        tolerance_ms=tolerance_ms,
+        reference_relation_id=reference_relation_id
+    )
+    _validate_alignment(export_alignment)
+    
+    try:
+        scope = await load_export_scope(test_id, time_range, segment_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    blocks = iter_export_blocks(
+        scope["relations"],
+        data_type,
+        start_time=scope["start_time"],
+        end_time=scope["end_time"],
+        alignment=export_alignment
+    )
+    body = await export_slots.open_stream(stream_csv(blocks), blocks)
+    if body is None:
+        raise _export_slots_busy()
+
+    filename = f"test_{test_id}_{data_type}.csv"
+    return StreamingResponse(
+        body,
+        media_type=get_export_writer("csv").media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
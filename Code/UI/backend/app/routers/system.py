@@ -8,7 +8,8 @@ status checks and health monitoring.
 import os
 from fastapi import APIRouter
 
-from database import get_all_sensors, get_all_tests
+from app.core.http_cache import response_cache
+from database import get_all_sensors, get_all_tests, metadata_cache
 
 router = APIRouter()
 
@@ -45,6 +46,12 @@ async def get_system_status():
     }
 
 
+@router.get("/cache", response_model=dict)
+async def get_cache_stats():
+    """Hit / miss counters and state of the in-process metadata and measurement response caches."""
+    return {"metadata": metadata_cache.stats(), "responses": response_cache.stats()}
+
+
 @router.get("/health", response_model=dict)
 async def health_check():
     """Simple health check endpoint."""
@@ -18,8 +18,9 @@ from database import (
     delete_test_relation_for_single_relation_id,
     update_test_relation,
     check_test_relation_has_measurements,
-    delete_test_relation_with_measurements
+    detach_test_relation
 )
+from app.maintenance import submit_delete_job
 
 router = APIRouter()
 
@@ -58,11 +59,12 @@ async def delete_single_test_relation_endpoint(test_relation_id: int, force: boo
     If force=True, also deletes all measurements for this relation.
     """
     if force:
-        # Delete with measurements
-        success = await delete_test_relation_with_measurements(test_relation_id)
-        if not success:
+        # Detach now, delete the measurements and the relation in the background
+        relation = await detach_test_relation(test_relation_id)
+        if not relation:
             raise HTTPException(status_code=404, detail="Test relation not found")
-        return {"message": "Test relation and all measurements deleted successfully"}
+        job = await submit_delete_job("relation", [test_relation_id], test_id=relation["test_id"])
+        return {"message": "Test relation removed, deleting its measurements", "job_id": job["id"]}
     else:
         # Check if it has measurements first
         check = await check_test_relation_has_measurements(test_relation_id)
@@ -1,10 +1,22 @@
 """
 API routes for test segments.
+
+Creating, editing or detecting segments queues their statistics; the
+segment statistics worker computes them in the background (see
+app/analysis/segment_stats.py).
 """
 
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
+from datetime import datetime
+from app.analysis import (
+    detect_test_phases,
+    get_segment_statistics,
+    get_test_segment_statistics,
+    segment_stats_worker,
+)
 from app.models.test_segments import TestSegment, TestSegmentCreate, TestSegmentUpdate
+from database import get_test_by_id
 from database import test_segments as segments_db
 
 router = APIRouter()
@@ -20,6 +32,7 @@ async def create_segment(segment: TestSegmentCreate):
             segment.start_time,
             segment.end_time
         )
+        segment_stats_worker.notify()
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -35,6 +48,55 @@ async def get_segments_by_test(test_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/test/{test_id}/detect", response_model=dict)
+async def detect_segments(
+    test_id: int,
+    start_time: Optional[datetime] = Query(None, description="Only detect phases from this time on"),
+    end_time: Optional[datetime] = Query(None, description="Only detect phases up to this time"),
+    dry_run: bool = Query(False, description="Return the candidates without storing them")
+):
+    """
+    Detect the wash-cycle phases (fill, wash, rinse, drain, spin) of a test.
+
+    Works on the 10s aggregates of the test's RPM, current and flow sensors.
+    Stored candidates have segment_source 'detected' and replace the
+    detected segments of an earlier run in the same range.
+    """
+    test = await get_test_by_id(test_id)
+    if not test:
+        raise HTTPException(status_code=404, detail="Test not found")
+
+    try:
+        result = await detect_test_phases(test_id, start_time, end_time, save=not dry_run)
+        if not dry_run:
+            segment_stats_worker.notify()
+        return result
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error detecting phases: {str(e)}")
+
+
+@router.get("/test/{test_id}/stats", response_model=list)
+async def get_test_segment_stats(test_id: int):
+    """
+    Get the precomputed statistics of all segments of a test.
+
+    One entry per segment with its job status and the statistics per
+    relation and channel (count, mean, RMS, std, min/max, 5/50/95th
+    percentiles, dominant frequency). Segments whose statistics are still
+    queued have none yet.
+    """
+    test = await get_test_by_id(test_id)
+    if not test:
+        raise HTTPException(status_code=404, detail="Test not found")
+
+    try:
+        return await get_test_segment_statistics(test_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching segment statistics: {str(e)}")
+
+
 @router.get("/{segment_id}", response_model=TestSegment)
 async def get_segment(segment_id: int):
     """Get a specific segment by ID."""
@@ -59,11 +121,31 @@ async def update_segment(segment_id: int, segment: TestSegmentUpdate):
             segment.start_time,
             segment.end_time
         )
+        segment_stats_worker.notify()
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/{segment_id}/stats", response_model=dict)
+async def get_segment_stats(segment_id: int):
+    """
+    Get the precomputed statistics of a segment per relation and channel.
+
+    stale is set when measurements of the segment changed since the
+    statistics were computed; they are queued again and the old values are
+    returned meanwhile.
+    """
+    segment = await segments_db.get_segment_by_id(segment_id)
+    if not segment:
+        raise HTTPException(status_code=404, detail="Segment not found")
+
+    try:
+        return await get_segment_statistics(segment)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching segment statistics: {str(e)}")
+
+
 @router.delete("/{segment_id}")
 async def delete_segment(segment_id: int):
     """Delete a test segment."""
@@ -14,13 +14,15 @@ from app.models import (
     Test, TestCreate, TestUpdate,
     TestRelation, TestRelationCreate,
 )
+from app.maintenance import submit_delete_job, storage_maintenance
+from app.analysis import submit_spectrogram_jobs
 from database import (
     db_pool,
     get_all_tests,
     get_test_by_id,
     create_test,
     update_test_metadata,
-    delete_test,
+    mark_test_deleting,
     start_test,
     stop_test,
     get_test_relations,
@@ -74,6 +76,20 @@ async def update_test_endpoint(test_id: int, test: TestUpdate):
         
         old_status = current_test.get('test_status')
         
+        # 'deleting' is set by the delete job only and is final
+        if new_status == 'deleting' or old_status == 'deleting':
+            raise HTTPException(
+                status_code=400,
+                detail="Cannot change status: test is being deleted"
+            )
+        
+        # Only finished tests can be archived (raw data may be dropped by retention)
+        if new_status == 'archived' and old_status not in ('idle', 'archived'):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Cannot archive test: test status is '{old_status}', must be 'idle'"
+            )
+        
         # Handle status change to 'running'
         if new_status == 'running' and old_status != 'running':
             logger.info(f"Starting test {test_id} and its worker")
@@ -98,14 +114,20 @@ async def delete_test_endpoint(test_id: int):
     Delete a test and all its related data.
     Test must be in 'idle' status to be deleted.
     Deletes: test_relations, test_runs, and all measurements.
+    
+    The test is marked 'deleting' and removed by a background delete job;
+    its progress is available at /api/measurements/delete/status/{job_id}.
     """
     try:
-        success = await delete_test(test_id)
-        if not success:
-            raise HTTPException(status_code=404, detail="Test not found")
-        return {"message": "Test and all related data deleted successfully"}
+        relation_ids = await mark_test_deleting(test_id)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    
+    if relation_ids is None:
+        raise HTTPException(status_code=404, detail="Test not found")
+    
+    job = await submit_delete_job("test", relation_ids, test_id=test_id)
+    return {"message": "Test deletion started", "job_id": job["id"]}
 
 @router.post("/{test_id}/start", response_model=dict)
 async def start_test_endpoint(test_id: int):
@@ -220,6 +242,15 @@ async def stop_test_endpoint(test_id: int):
             detail="Test not running or already completed"
         )
     
+    # Compress the finished run's chunks in the background
+    storage_maintenance.notify()
+
+    # Precompute the spectrogram tiles of the vibration sensors
+    try:
+        await submit_spectrogram_jobs(relations)
+    except Exception as e:
+        logger.error(f"Could not queue spectrograms of test {test_id}: {e}")
+
     print(f"Test {test_id} stopped in DB, notifying sensors...")
 
     # ✅ Notify devices only AFTER DB is consistent
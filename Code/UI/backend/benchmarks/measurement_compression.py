@@ -0,0 +1,172 @@
+"""
+Benchmark: disk usage and query latency of compressed measurement chunks.
+
+Runs the backend's typical raw queries for one test relation on its chunks
+as they are, compresses those chunks (segmentby test_relation_id,
+measurement_channel; orderby measurement_timestamp) and runs the queries
+again. The chunks are decompressed afterwards unless --keep is given.
+
+Chunks that may still receive inserts (ending less than an hour ago) are
+left alone. Needs a database where schemas/10_schema_compression.sql was
+applied.
+
+Usage (from Code/UI/backend):
+
+    DATABASE_URL=postgresql://... python -m benchmarks.measurement_compression --relation-id 12
+
+Procedure for recorded results: run it against a copy of a production
+database (compress_chunk/decompress_chunk rewrite the chunks and lock
+them meanwhile), on the relation of a finished accelerometer test that
+spans several chunks, with the backend stopped so nothing else competes
+for the disk. The first lines of the output name the TimescaleDB version
+and chunk interval; keep them with the numbers.
+
+Results: none recorded yet. The compression change was made without
+access to a TimescaleDB instance, so its size and latency effects are
+unmeasured. The expectation from the segmentby/orderby layout - several
+times smaller chunks, faster full scans, slower point lookups in the
+newest compressed chunk - still has to be confirmed with this script.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List
+
+import asyncpg
+
+import database.measurements as measurements_db
+
+
+def _chunk_table(chunk: Dict) -> str:
+    return f'"{chunk["chunk_schema"]}"."{chunk["chunk_name"]}"'
+
+
+async def chunk_bytes(conn: asyncpg.Connection, chunks: List[Dict]) -> int:
+    """On-disk size of the chunks, compressed or not."""
+    total = 0
+    for chunk in chunks:
+        compressed = await conn.fetchval("""
+            SELECT after_compression_total_bytes
+            FROM chunk_compression_stats('timeseries.measurements')
+            WHERE chunk_schema = $1 AND chunk_name = $2 AND compression_status = 'Compressed';
+        """, chunk["chunk_schema"], chunk["chunk_name"])
+        if compressed is None:
+            compressed = await conn.fetchval(
+                "SELECT pg_total_relation_size($1::regclass);", _chunk_table(chunk)
+            )
+        total += compressed or 0
+    return total
+
+
+async def measure(fn: Callable[[], Awaitable[int]], repeat: int):
+    timings = []
+    rows = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = await fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), rows
+
+
+def queries(relation_id: int, bounds: Dict[str, datetime]) -> List[tuple]:
+    async def latest():
+        return len(await measurements_db.fetch_sensor_measurements_raw(relation_id, limit=10_000, last_minutes=3))
+
+    async def window():
+        start = bounds["start_time"] + (bounds["end_time"] - bounds["start_time"]) / 2
+        rows = await measurements_db.fetch_sensor_measurements_raw(
+            relation_id, limit=1_000_000, start_time=start, end_time=start + timedelta(minutes=1)
+        )
+        return len(rows)
+
+    async def time_bounds():
+        await measurements_db.get_measurement_time_bounds([relation_id])
+        return 1
+
+    async def full_scan():
+        rows = 0
+        async for page in measurements_db.stream_measurements_raw_for_relations([relation_id]):
+            rows += len(page)
+        return rows
+
+    return [
+        ("last 3 min", latest),
+        ("1 min window", window),
+        ("time bounds", time_bounds),
+        ("full export scan", full_scan),
+    ]
+
+
+async def run(relation_id: int, repeat: int, keep: bool):
+    pool = await asyncpg.create_pool(os.environ["DATABASE_URL"], min_size=1, max_size=4, command_timeout=None)
+    measurements_db.set_db_pool(pool)
+    try:
+        bounds = await measurements_db.get_measurement_time_bounds([relation_id])
+        if not bounds:
+            print(f"No raw measurements for relation {relation_id}")
+            return
+
+        active_after = datetime.now(timezone.utc) - timedelta(hours=1)
+        chunks = [
+            c for c in await measurements_db.get_measurement_chunks(bounds["start_time"], bounds["end_time"])
+            if c["range_end"] < active_after
+        ]
+        if not chunks:
+            print("All chunks of this relation may still receive inserts, nothing to compress")
+            return
+        bounds["end_time"] = min(bounds["end_time"], max(c["range_end"] for c in chunks))
+        to_compress = [c for c in chunks if not c["is_compressed"]]
+
+        async with pool.acquire() as conn:
+            size_before = await chunk_bytes(conn, chunks)
+            version = await conn.fetchval("SELECT extversion FROM pg_extension WHERE extname = 'timescaledb';")
+            interval = await conn.fetchval("""
+                SELECT time_interval FROM timescaledb_information.dimensions
+                WHERE hypertable_schema = 'timeseries' AND hypertable_name = 'measurements';
+            """)
+        print(f"TimescaleDB {version}, chunk interval {interval}")
+
+        print(f"Relation {relation_id}: {len(chunks)} chunk(s), {len(to_compress)} uncompressed, "
+              f"median of {repeat} runs")
+        before = [(name, *await measure(fn, repeat)) for name, fn in queries(relation_id, bounds)]
+
+        start = time.perf_counter()
+        async with pool.acquire() as conn:
+            for chunk in to_compress:
+                await conn.execute("SELECT compress_chunk($1::regclass, if_not_compressed => true);",
+                                   _chunk_table(chunk))
+            compress_seconds = time.perf_counter() - start
+            size_after = await chunk_bytes(conn, chunks)
+
+        after = [(name, *await measure(fn, repeat)) for name, fn in queries(relation_id, bounds)]
+
+        print(f"  disk          {size_before / 1e6:10.1f} MB -> {size_after / 1e6:10.1f} MB  "
+              f"x{size_before / max(size_after, 1):.1f}  (compressed in {compress_seconds:.1f} s)")
+        for (name, t_before, rows), (_, t_after, _) in zip(before, after):
+            print(f"  {name:<16} {t_before * 1000:9.1f} ms -> {t_after * 1000:9.1f} ms  ({rows} rows)")
+
+        if not keep and to_compress:
+            async with pool.acquire() as conn:
+                for chunk in to_compress:
+                    await conn.execute("SELECT decompress_chunk($1::regclass, if_compressed => true);",
+                                       _chunk_table(chunk))
+            print(f"  decompressed {len(to_compress)} chunk(s) again (use --keep to leave them compressed)")
+    finally:
+        await pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--relation-id", type=int, required=True)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="leave the chunks compressed")
+    args = parser.parse_args()
+    asyncio.run(run(args.relation_id, args.repeat, args.keep))
+
+
+if __name__ == "__main__":
+    main()
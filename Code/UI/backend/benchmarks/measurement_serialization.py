@@ -0,0 +1,138 @@
+"""
+Benchmark: the /api/measurements/raw route with large responses.
+
+Requests go through the whole FastAPI app in process (httpx
+ASGITransport): query parsing, the conditional GET check of
+app/core/http_cache.py, encoding and the response. The database is
+stubbed: fetch_sensor_measurements_raw returns prepared rows and the
+relation lookup reports a running test, so no response cache applies.
+
+For comparison the old route is mounted on the same app under
+/bench/raw-pydantic: it returns the rows as dicts and lets FastAPI validate
+them against response_model=List[MeasurementRaw] and encode them with
+stdlib json.
+
+Rows are real asyncpg records of a relation when --relation-id and
+DATABASE_URL are given (fetched once, before timing). Otherwise they are
+synthetic dicts (3-channel accelerometer at 1 kHz); orjson encodes dicts
+natively while records take its default hook, so format=json timings are
+then a lower bound for database records.
+
+Usage (from Code/UI/backend):
+
+    # Real records from the database (recommended)
+    DATABASE_URL=postgresql://... python -m benchmarks.measurement_serialization --relation-id 12
+
+    # Synthetic rows, no database needed
+    python -m benchmarks.measurement_serialization --rows 100000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+import httpx
+
+import app.core.http_cache as http_cache
+import database.measurements as measurements_db
+from app.main import app
+from app.models import MeasurementRaw
+
+
+def synthetic_rows(n: int) -> List[Dict]:
+    """Accelerometer-like rows: 3 channels sampled at 1 kHz."""
+    t0 = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    channels = ["x", "y", "z"]
+    return [
+        {
+            "measurement_timestamp": t0 + timedelta(milliseconds=i // 3),
+            "test_relation_id": 1,
+            "measurement_channel": channels[i % 3],
+            "measurement_value": (i % 997) * 0.001,
+        }
+        for i in range(n)
+    ]
+
+
+async def fetch_rows(relation_id: int, n: int):
+    """Fetch up to n raw records for a relation through the regular DB layer."""
+    import asyncpg
+
+    pool = await asyncpg.create_pool(os.environ["DATABASE_URL"], min_size=1, max_size=2)
+    measurements_db.set_db_pool(pool)
+    try:
+        # limit is per channel; fetch generously and trim
+        rows = await measurements_db.fetch_sensor_measurements_raw(relation_id, limit=n)
+        return rows[:n]
+    finally:
+        await pool.close()
+
+
+def stub_database(rows):
+    """Serve rows from the route's DB function; report a running test to skip the response cache."""
+    async def fetch_sensor_measurements_raw(**kwargs):
+        return rows
+
+    async def get_test_relation_by_id(test_relation_id: int):
+        return {"id": test_relation_id, "active": True, "test_id": None}
+
+    async def old_route(test_relation_id: int):
+        return [dict(row) for row in await fetch_sensor_measurements_raw()]
+
+    measurements_db.fetch_sensor_measurements_raw = fetch_sensor_measurements_raw
+    http_cache.get_test_relation_by_id = get_test_relation_by_id
+    app.add_api_route("/bench/raw-pydantic/{test_relation_id}", old_route, response_model=List[MeasurementRaw])
+
+
+async def measure(client: httpx.AsyncClient, url: str, repeat: int):
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await client.get(url)
+        timings.append(time.perf_counter() - start)
+        response.raise_for_status()
+        size = len(response.content)
+    return statistics.median(timings), size
+
+
+async def run(repeat: int):
+    routes = [
+        ("pydantic + json", "/bench/raw-pydantic/1"),
+        ("format=json", "/api/measurements/raw/1?limit=1000000"),
+        ("format=columnar", "/api/measurements/raw/1?limit=1000000&format=columnar"),
+    ]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        baseline = None
+        for name, url in routes:
+            seconds, size = await measure(client, url, repeat)
+            baseline = baseline or seconds
+            print(f"  {name:<16} {seconds * 1000:8.1f} ms  {size / 1e6:6.2f} MB  x{baseline / seconds:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--relation-id", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.relation_id is not None:
+        rows = asyncio.run(fetch_rows(args.relation_id, args.rows))
+        source = f"relation {args.relation_id}"
+    else:
+        rows = synthetic_rows(args.rows)
+        source = "synthetic"
+
+    stub_database(rows)
+    print(f"{len(rows)} rows ({source}), GET /api/measurements/raw in process, median of {args.repeat} runs")
+    asyncio.run(run(args.repeat))
+
+
+if __name__ == "__main__":
+    main()
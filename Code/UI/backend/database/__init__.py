@@ -8,7 +8,8 @@ This package contains database connection management and all database operation
 db_pool = None
 
 # Import all modules and their functions
-from . import sensors, sensor_types, machines, machine_types, machine_type_sensor_templates, measurements, mqtt, tests, test_relations, test_segments
+from .cache import metadata_cache
+from . import sensors, sensor_types, machines, machine_types, machine_type_sensor_templates, measurements, mqtt, tests, test_relations, test_segments, export_jobs, delete_jobs, storage, analysis
 
 # Import specific functions to maintain compatibility
 from .sensors import (
@@ -67,9 +68,11 @@ from .machine_type_sensor_templates import (
 from .tests import (
     get_all_tests,
     get_test_by_id,
+    get_tests_by_ids,
     create_test,
     update_test_metadata,
     delete_test,
+    mark_test_deleting,
 
     start_test,
     stop_test,
@@ -83,7 +86,7 @@ from .test_relations import (
     get_test_relation_by_id,
     update_test_relation,
     check_test_relation_has_measurements,
-    delete_test_relation_with_measurements,
+    detach_test_relation,
 )
 
 from .mqtt import (
@@ -110,11 +113,16 @@ def set_db_pool(pool):
     tests.set_db_pool(pool)
     test_relations.set_db_pool(pool)
     test_segments.set_db_pool(pool)
+    export_jobs.set_db_pool(pool)
+    delete_jobs.set_db_pool(pool)
+    storage.set_db_pool(pool)
+    analysis.set_db_pool(pool)
 
 __all__ = [
     # Core database management
     'db_pool',
     'set_db_pool',
+    'metadata_cache',
     
     # Module access
     'sensors',
@@ -125,6 +133,10 @@ __all__ = [
     'measurements',
     'mqtt',
     'tests',
+    'export_jobs',
+    'delete_jobs',
+    'storage',
+    'analysis',
     
     # Sensor functions
     'get_all_sensors',
@@ -165,9 +177,11 @@ __all__ = [
     # Tests functions
     'get_all_tests',
     'get_test_by_id',
+    'get_tests_by_ids',
     'create_test',
     'update_test_metadata',
     'delete_test',
+    'mark_test_deleting',
     'start_test',
     'stop_test',
 
@@ -179,7 +193,7 @@ __all__ = [
     'get_test_relation_by_id',
     'update_test_relation',
     'check_test_relation_has_measurements',
-    'delete_test_relation_with_measurements',
+    'detach_test_relation',
     
     # Measurement functions
     'get_sensor_measurements_avg',
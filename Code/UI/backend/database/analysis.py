@@ -0,0 +1,485 @@
+"""
+Database operations for signal analysis results (spectrum cache, spectrogram tiles,
+anomaly events, segment statistics, test comparison cache).
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+# Global variable for database pool - will be set by main database module
+_db_pool = None
+
+def set_db_pool(pool):
+    """Set the database connection pool."""
+    global _db_pool
+    _db_pool = pool
+
+def get_db_pool():
+    """Get the database connection pool."""
+    if _db_pool is None:
+        raise RuntimeError("Database pool not initialized. Call set_db_pool() first.")
+    return _db_pool
+
+
+async def get_cached_spectrum(test_relation_id: int, segment_id: int, params_key: str) -> Optional[Dict]:
+    """Get the cached spectrum of a segment for the given analysis parameters."""
+    async with get_db_pool().acquire() as conn:
+        row = await conn.fetchrow("""
+            SELECT data_key, result, created_at
+            FROM metadata.spectrum_cache
+            WHERE test_relation_id = $1 AND segment_id = $2 AND params_key = $3;
+        """, test_relation_id, segment_id, params_key)
+    return dict(row) if row else None
+
+
+async def save_cached_spectrum(
+    test_relation_id: int,
+    segment_id: int,
+    params_key: str,
+    data_key: str,
+    result: bytes
+):
+    """Store (or replace) the spectrum of a segment for the given analysis parameters."""
+    async with get_db_pool().acquire() as conn:
+        await conn.execute("""
+            INSERT INTO metadata.spectrum_cache (test_relation_id, segment_id, params_key, data_key, result)
+            VALUES ($1, $2, $3, $4, $5)
+            ON CONFLICT (test_relation_id, segment_id, params_key)
+            DO UPDATE SET data_key = EXCLUDED.data_key, result = EXCLUDED.result, created_at = now();
+        """, test_relation_id, segment_id, params_key, data_key, result)
+
+
+def _spectrogram_from_row(row) -> Optional[Dict]:
+    if not row:
+        return None
+    spectrogram = dict(row)
+    spectrogram["channels"] = list(spectrogram["channels"] or [])
+    return spectrogram
+
+
+async def get_spectrogram(test_relation_id: int) -> Optional[Dict]:
+    """Get the spectrogram description (and job state) of a test relation."""
+    async with get_db_pool().acquire() as conn:
+        row = await conn.fetchrow(
+            "SELECT * FROM metadata.spectrograms WHERE test_relation_id = $1;",
+            test_relation_id
+        )
+    return _spectrogram_from_row(row)
+
+
+async def queue_spectrograms(test_relation_ids: List[int], delay: timedelta = timedelta(0)) -> int:
+    """
+    Queue the (re)computation of the spectrograms of several test relations.
+
+    The jobs are not claimed before delay has passed. Existing tiles stay
+    available until a job starts. Returns the number of queued relations.
+    """
+    async with get_db_pool().acquire() as conn:
+        result = await conn.execute("""
+            INSERT INTO metadata.spectrograms (test_relation_id, queued_at)
+            SELECT unnest($1::int[]), now() + $2::interval
+            ON CONFLICT (test_relation_id) DO UPDATE
+            SET status = 'queued',
+                progress = 0,
+                error = NULL,
+                attempts = 0,
+                queued_at = EXCLUDED.queued_at;
+        """, test_relation_ids, delay)
+    return int(result.split()[-1]) if result else 0
+
+
+async def requeue_stale_spectrograms(test_relation_ids: List[int]) -> int:
+    """Queue the existing spectrograms of relations whose measurements changed."""
+    async with get_db_pool().acquire() as conn:
+        result = await conn.execute("""
+            UPDATE metadata.spectrograms
+            SET status = 'queued', progress = 0, error = NULL, attempts = 0, queued_at = now()
+            WHERE test_relation_id = ANY($1::int[]);
+        """, test_relation_ids)
+    return int(result.split()[-1]) if result else 0
+
+
+async def claim_next_spectrogram_job() -> Optional[Dict]:
+    """Atomically take the oldest queued spectrogram and mark it processing."""
+    async with get_db_pool().acquire() as conn:
+        row = await conn.fetchrow("""
+            UPDATE metadata.spectrograms
+            SET status = 'processing',
+                started_at = now(),
+                attempts = attempts + 1
+            WHERE test_relation_id = (
+                SELECT test_relation_id
+                FROM metadata.spectrograms
+                WHERE status = 'queued' AND queued_at <= now()
+                ORDER BY queued_at
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING *;
+        """)
+    return _spectrogram_from_row(row)
+
+
+async def start_spectrogram(test_relation_id: int, settings: Dict) -> None:
+    """Drop the old tiles of a spectrogram and store the settings of the new one."""
+    async with get_db_pool().acquire() as conn:
+        async with conn.transaction():
+            await conn.execute(
+                "DELETE FROM metadata.spectrogram_tiles WHERE test_relation_id = $1;",
+                test_relation_id
+            )
+            await conn.execute("""
+                UPDATE metadata.spectrograms
+                SET origin = $2,
+                    sample_rate_hz = $3,
+                    nperseg = $4,
+                    hop = $5,
+                    tile_frames = $6,
+                    frequency_bins = $7,
+                    levels = $8,
+                    frames = 0,
+                    channels = '{}'
+                WHERE test_relation_id = $1;
+            """,
+                test_relation_id,
+                settings["origin"],
+                settings["sample_rate_hz"],
+                settings["nperseg"],
+                settings["hop"],
+                settings["tile_frames"],
+                settings["frequency_bins"],
+                settings["levels"],
+            )
+
+
+async def insert_spectrogram_tiles(test_relation_id: int, tiles: List[Tuple[str, int, int, bytes]]) -> None:
+    """Store (channel, level, tile index, data) tiles of a spectrogram."""
+    if not tiles:
+        return
+    async with get_db_pool().acquire() as conn:
+        await conn.copy_records_to_table(
+            "spectrogram_tiles",
+            schema_name="metadata",
+            columns=["test_relation_id", "measurement_channel", "level", "tile_index", "data"],
+            records=[(test_relation_id, *tile) for tile in tiles],
+        )
+
+
+async def update_spectrogram_progress(test_relation_id: int, progress: int) -> None:
+    """Store the progress of a spectrogram job."""
+    async with get_db_pool().acquire() as conn:
+        await conn.execute(
+            "UPDATE metadata.spectrograms SET progress = $2 WHERE test_relation_id = $1;",
+            test_relation_id, progress
+        )
+
+
+async def complete_spectrogram(test_relation_id: int, frames: int, channels: List[str]) -> None:
+    """
+    Mark a spectrogram completed.
+
+    Does nothing if it was queued again meanwhile (its data changed while
+    it was computed), so the job runs once more.
+    """
+    async with get_db_pool().acquire() as conn:
+        await conn.execute("""
+            UPDATE metadata.spectrograms
+            SET status = 'completed',
+                progress = 100,
+                frames = $2,
+                channels = $3,
+                error = NULL,
+                completed_at = now()
+            WHERE test_relation_id = $1 AND status = 'processing';
+        """, test_relation_id, frames, channels)
+
+
+async def fail_spectrogram(test_relation_id: int, error: str) -> None:
+    """Mark a spectrogram job failed."""
+    async with get_db_pool().acquire() as conn:
+        await conn.execute("""
+            UPDATE metadata.spectrograms
+            SET status = 'failed',
+                error = $2,
+                completed_at = now()
+            WHERE test_relation_id = $1 AND status = 'processing';
+        """, test_relation_id, error)
+
+
+async def requeue_interrupted_spectrogram_jobs(max_attempts: int) -> int:
+    """
+    Put spectrogram jobs left in 'processing' by a previous backend process back in the queue.
+
+    Returns the number of requeued jobs.
+    """
+    async with get_db_pool().acquire() as conn:
+        async with conn.transaction():
+            await conn.execute("""
+                UPDATE metadata.spectrograms
+                SET status = 'failed',
+                    error = 'Spectrogram interrupted too many times'
+                WHERE status = 'processing' AND attempts >= $1;
+            """, max_attempts)
+            result = await conn.execute("""
+                UPDATE metadata.spectrograms
+                SET status = 'queued'
+                WHERE status = 'processing';
+            """)
+    return int(result.split()[-1]) if result else 0
+
+
+async def get_spectrogram_tile(test_relation_id: int, channel: str, level: int, tile_index: int) -> Optional[bytes]:
+    """Get the data of one spectrogram tile."""
+    async with get_db_pool().acquire() as conn:
+        return await conn.fetchval("""
+            SELECT data
+            FROM metadata.spectrogram_tiles
+            WHERE test_relation_id = $1 AND measurement_channel = $2 AND level = $3 AND tile_index = $4;
+        """, test_relation_id, channel, level, tile_index)
+
+
+async def get_anomaly_events(
+    test_relation_ids: List[int],
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    detector: Optional[str] = None,
+    limit: int = 1000,
+) -> List[Dict]:
+    """Get the anomaly events of test relations in [start_time, end_time], oldest first."""
+    async with get_db_pool().acquire() as conn:
+        rows = await conn.fetch("""
+            SELECT id, test_relation_id, measurement_channel, detector, event_timestamp,
+                   measurement_value, score, baseline, deviation
+            FROM metadata.anomaly_events
+            WHERE test_relation_id = ANY($1::int[])
+              AND ($2::timestamptz IS NULL OR event_timestamp >= $2)
+              AND ($3::timestamptz IS NULL OR event_timestamp <= $3)
+              AND ($4::text IS NULL OR detector = $4)
+            ORDER BY event_timestamp
+            LIMIT $5;
+        """, test_relation_ids, start_time, end_time, detector, limit)
+    return [dict(row) for row in rows]
+
+
+async def delete_anomaly_events_outside(test_relation_ids: List[int], keep_start: datetime, keep_end: datetime) -> int:
+    """Delete the anomaly events of cropped relations outside the kept range."""
+    async with get_db_pool().acquire() as conn:
+        result = await conn.execute("""
+            DELETE FROM metadata.anomaly_events
+            WHERE test_relation_id = ANY($1::int[])
+              AND (event_timestamp < $2 OR event_timestamp > $3);
+        """, test_relation_ids, keep_start, keep_end)
+    return int(result.split()[-1]) if result else 0
+
+
+# Columns of metadata.segment_stats after the key
+SEGMENT_STATS_COLUMNS = [
+    "num_samples", "mean_value", "rms_value", "std_value", "min_value", "max_value",
+    "p05_value", "p50_value", "p95_value", "dominant_frequency_hz",
+]
+
+
+async def get_segment_stats(segment_id: int) -> Optional[Dict]:
+    """Get the job state and the statistics rows of one segment (None if never queued)."""
+    async with get_db_pool().acquire() as conn:
+        job = await conn.fetchrow(
+            "SELECT * FROM metadata.segment_stats_jobs WHERE segment_id = $1;", segment_id
+        )
+        if not job:
+            return None
+        rows = await conn.fetch("""
+            SELECT *
+            FROM metadata.segment_stats
+            WHERE segment_id = $1
+            ORDER BY test_relation_id, measurement_channel;
+        """, segment_id)
+    return {**dict(job), "stats": [dict(row) for row in rows]}
+
+
+async def get_test_segment_stats(test_id: int) -> List[Dict]:
+    """Get the statistics rows of all segments of a test with their segment and job state."""
+    async with get_db_pool().acquire() as conn:
+        rows = await conn.fetch("""
+            SELECT
+                s.id AS segment_id,
+                s.segment_name,
+                s.start_time,
+                s.end_time,
+                j.status,
+                j.completed_at,
+                st.test_relation_id,
+                st.measurement_channel,
+                st.num_samples,
+                st.mean_value,
+                st.rms_value,
+                st.std_value,
+                st.min_value,
+                st.max_value,
+                st.p05_value,
+                st.p50_value,
+                st.p95_value,
+                st.dominant_frequency_hz
+            FROM metadata.test_segments s
+            LEFT JOIN metadata.segment_stats_jobs j ON j.segment_id = s.id
+            LEFT JOIN metadata.segment_stats st ON st.segment_id = s.id
+            WHERE s.test_id = $1
+            ORDER BY s.start_time, s.id, st.test_relation_id, st.measurement_channel;
+        """, test_id)
+    return [dict(row) for row in rows]
+
+
+async def requeue_segment_stats(segment_ids: List[int]) -> int:
+    """Queue the statistics of segments whose measurements changed."""
+    async with get_db_pool().acquire() as conn:
+        result = await conn.execute("""
+            UPDATE metadata.segment_stats_jobs
+            SET status = 'queued', error = NULL, attempts = 0, queued_at = now()
+            WHERE segment_id = ANY($1::int[]) AND status <> 'processing';
+        """, segment_ids)
+    return int(result.split()[-1]) if result else 0
+
+
+async def requeue_segment_stats_of_relations(test_relation_ids: List[int]) -> int:
+    """Queue the statistics of all segments of the tests of relations whose measurements changed."""
+    async with get_db_pool().acquire() as conn:
+        result = await conn.execute("""
+            UPDATE metadata.segment_stats_jobs
+            SET status = 'queued', error = NULL, attempts = 0, queued_at = now()
+            WHERE segment_id IN (
+                SELECT s.id
+                FROM metadata.test_segments s
+                JOIN metadata.test_relations r ON r.test_id = s.test_id
+                WHERE r.id = ANY($1::int[])
+            );
+        """, test_relation_ids)
+    return int(result.split()[-1]) if result else 0
+
+
+async def claim_next_segment_stats_job() -> Optional[Dict]:
+    """Atomically take the oldest queued segment and mark it processing; returns it with its segment."""
+    async with get_db_pool().acquire() as conn:
+        row = await conn.fetchrow("""
+            WITH claimed AS (
+                UPDATE metadata.segment_stats_jobs
+                SET status = 'processing',
+                    started_at = now(),
+                    attempts = attempts + 1
+                WHERE segment_id = (
+                    SELECT segment_id
+                    FROM metadata.segment_stats_jobs
+                    WHERE status = 'queued'
+                    ORDER BY queued_at
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING segment_id
+            )
+            SELECT s.id, s.test_id, s.start_time, s.end_time
+            FROM claimed
+            JOIN metadata.test_segments s ON s.id = claimed.segment_id;
+        """)
+    return dict(row) if row else None
+
+
+async def complete_segment_stats(segment_id: int, data_key: Optional[str], stats: List[Dict]) -> bool:
+    """
+    Replace the statistics of a segment and mark its job completed.
+
+    Stores nothing if the segment was queued again meanwhile (its range or
+    data changed while it was computed), so the job runs once more.
+    Returns whether the statistics were stored.
+    """
+    async with get_db_pool().acquire() as conn:
+        async with conn.transaction():
+            completed = await conn.fetchval("""
+                UPDATE metadata.segment_stats_jobs
+                SET status = 'completed',
+                    data_key = $2,
+                    error = NULL,
+                    completed_at = now()
+                WHERE segment_id = $1 AND status = 'processing'
+                RETURNING segment_id;
+            """, segment_id, data_key)
+            if completed is None:
+                return False
+
+            await conn.execute("DELETE FROM metadata.segment_stats WHERE segment_id = $1;", segment_id)
+            await conn.copy_records_to_table(
+                "segment_stats",
+                schema_name="metadata",
+                columns=["segment_id", "test_relation_id", "measurement_channel", *SEGMENT_STATS_COLUMNS],
+                records=[
+                    (segment_id, row["test_relation_id"], row["measurement_channel"],
+                     *(row[column] for column in SEGMENT_STATS_COLUMNS))
+                    for row in stats
+                ],
+            )
+    return True
+
+
+async def fail_segment_stats(segment_id: int, error: str) -> None:
+    """Mark a segment statistics job failed."""
+    async with get_db_pool().acquire() as conn:
+        await conn.execute("""
+            UPDATE metadata.segment_stats_jobs
+            SET status = 'failed',
+                error = $2,
+                completed_at = now()
+            WHERE segment_id = $1 AND status = 'processing';
+        """, segment_id, error)
+
+
+async def requeue_interrupted_segment_stats_jobs(max_attempts: int) -> int:
+    """
+    Put segment statistics jobs left in 'processing' by a previous backend process back in the queue.
+
+    Returns the number of requeued jobs.
+    """
+    async with get_db_pool().acquire() as conn:
+        async with conn.transaction():
+            await conn.execute("""
+                UPDATE metadata.segment_stats_jobs
+                SET status = 'failed',
+                    error = 'Segment statistics interrupted too many times'
+                WHERE status = 'processing' AND attempts >= $1;
+            """, max_attempts)
+            result = await conn.execute("""
+                UPDATE metadata.segment_stats_jobs
+                SET status = 'queued'
+                WHERE status = 'processing';
+            """)
+    return int(result.split()[-1]) if result else 0
+
+
+async def get_cached_comparison(params_key: str) -> Optional[Dict]:
+    """Get a cached test comparison and mark it used."""
+    async with get_db_pool().acquire() as conn:
+        row = await conn.fetchrow("""
+            UPDATE metadata.comparison_cache
+            SET last_used_at = now()
+            WHERE params_key = $1
+            RETURNING data_key, result, created_at;
+        """, params_key)
+    return dict(row) if row else None
+
+
+async def save_cached_comparison(
+    params_key: str,
+    test_ids: List[int],
+    data_key: str,
+    result: bytes,
+    max_age: timedelta,
+):
+    """Store (or replace) a test comparison and prune the ones unused for max_age."""
+    async with get_db_pool().acquire() as conn:
+        async with conn.transaction():
+            await conn.execute("""
+                INSERT INTO metadata.comparison_cache (params_key, test_ids, data_key, result)
+                VALUES ($1, $2, $3, $4)
+                ON CONFLICT (params_key)
+                DO UPDATE SET test_ids = EXCLUDED.test_ids, data_key = EXCLUDED.data_key,
+                              result = EXCLUDED.result, created_at = now(), last_used_at = now();
+            """, params_key, test_ids, data_key, result)
+            await conn.execute(
+                "DELETE FROM metadata.comparison_cache WHERE last_used_at < now() - $1::interval;", max_age
+            )
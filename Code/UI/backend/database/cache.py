@@ -0,0 +1,206 @@
+"""
+In-process read-through cache of the metadata schema.
+
+Sensors, sensor types, machines, machine types, templates, tests and test
+relations are small and change rarely, yet almost every request reads
+some of them. Read functions decorated with @cached(tables) keep their
+results in memory; every entry remembers the version of each table it was
+read from and is only served while those versions are unchanged.
+
+A table's version is bumped
+- by the write functions of this package (@invalidates), before and after
+  the write, so a request sees its own changes immediately, and
+- by a Postgres NOTIFY on the metadata_changed channel, which triggers on
+  the tables send after every committed change (schemas/19_schema_metadata_notify.sql),
+  so changes made by other processes - the MQTT worker marking sensors
+  online / offline, other backend replicas - invalidate the cache too.
+
+The heartbeat's sensor_last_seen updates do not notify (they would empty
+the cache every few seconds); METADATA_CACHE_TTL_SECONDS bounds how old a
+cached last-seen time can get. While the listener connection is down,
+notifications could be missed, so the cache is bypassed until it is back.
+
+Cached values are deep copies, so callers may modify what they get.
+"""
+
+import asyncio
+import copy
+import functools
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "metadata_changed"
+
+METADATA_CACHE_ENABLED = os.getenv("METADATA_CACHE_ENABLED", "1") not in ("0", "false", "False")
+
+# Upper bound of an entry's age, for the columns that change without a notification
+METADATA_CACHE_TTL_SECONDS = float(os.getenv("METADATA_CACHE_TTL_SECONDS", 30))
+
+# Least recently used entries beyond this are dropped
+METADATA_CACHE_MAX_ENTRIES = int(os.getenv("METADATA_CACHE_MAX_ENTRIES", 10_000))
+
+# Pause before reconnecting a lost listener connection
+LISTEN_RETRY_SECONDS = 5
+
+# Idle time after which the listener connection is checked
+LISTEN_KEEPALIVE_SECONDS = 30
+
+
+class MetadataCache:
+    """Versioned read-through cache with hit / miss counters per cached function."""
+
+    def __init__(self):
+        self.versions: Dict[str, int] = {}
+        # (function, args) -> (table versions, stored at, value)
+        self.entries: "OrderedDict[Tuple, Tuple[Tuple[int, ...], float, Any]]" = OrderedDict()
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self.bypassed = 0
+        self.invalidations: Dict[str, int] = {}
+        self.listening = False
+        self._listener: Optional[asyncio.Task] = None
+
+    @property
+    def active(self) -> bool:
+        return METADATA_CACHE_ENABLED and self.listening
+
+    def _versions(self, tables: Iterable[str]) -> Tuple[int, ...]:
+        return tuple(self.versions.get(table, 0) for table in tables)
+
+    async def get_or_load(self, name: str, tables: Tuple[str, ...], args: Tuple, loader: Callable) -> Any:
+        """Serve name(*args) from memory if its tables did not change, else load and store it."""
+        if not self.active:
+            self.bypassed += 1
+            return await loader(*args)
+
+        key = (name, args)
+        entry = self.entries.get(key)
+        if (
+            entry is not None
+            and entry[0] == self._versions(tables)
+            and time.monotonic() - entry[1] < METADATA_CACHE_TTL_SECONDS
+        ):
+            self.entries.move_to_end(key)
+            self.hits[name] = self.hits.get(name, 0) + 1
+            return copy.deepcopy(entry[2])
+
+        self.misses[name] = self.misses.get(name, 0) + 1
+        # Versions before the read: a change during the read leaves the entry stale
+        versions = self._versions(tables)
+        value = await loader(*args)
+        self.entries[key] = (versions, time.monotonic(), copy.deepcopy(value))
+        self.entries.move_to_end(key)
+        while len(self.entries) > METADATA_CACHE_MAX_ENTRIES:
+            self.entries.popitem(last=False)
+        return value
+
+    def invalidate(self, *tables: str):
+        """Mark everything read from the tables as stale."""
+        for table in tables:
+            self.versions[table] = self.versions.get(table, 0) + 1
+            self.invalidations[table] = self.invalidations.get(table, 0) + 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit / miss counters per cached function and the cache state."""
+        hits, misses = sum(self.hits.values()), sum(self.misses.values())
+        return {
+            "enabled": METADATA_CACHE_ENABLED,
+            "listening": self.listening,
+            "entries": len(self.entries),
+            "hits": hits,
+            "misses": misses,
+            "bypassed": self.bypassed,
+            "hit_ratio": hits / (hits + misses) if hits + misses else None,
+            "functions": {
+                name: {"hits": self.hits.get(name, 0), "misses": self.misses.get(name, 0)}
+                for name in sorted(set(self.hits) | set(self.misses))
+            },
+            "invalidations": dict(sorted(self.invalidations.items())),
+        }
+
+    def _on_notify(self, connection, pid, channel, payload):
+        self.invalidate(payload)
+
+    async def _listen(self, database_url: str):
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(database_url)
+                lost = asyncio.Event()
+                connection.add_termination_listener(lambda _: lost.set())
+                await connection.add_listener(NOTIFY_CHANNEL, self._on_notify)
+                # Anything may have changed while nobody was listening
+                self.clear()
+                self.listening = True
+                logger.info("Metadata cache listening for changes")
+
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), LISTEN_KEEPALIVE_SECONDS)
+                    except asyncio.TimeoutError:
+                        await connection.execute("SELECT 1;", timeout=LISTEN_KEEPALIVE_SECONDS)
+                logger.warning("Metadata cache listener connection lost")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Metadata cache listener failed: {e}")
+            finally:
+                self.listening = False
+                if connection is not None and not connection.is_closed():
+                    connection.terminate()
+            await asyncio.sleep(LISTEN_RETRY_SECONDS)
+
+    async def start(self, database_url: str):
+        """Start listening for metadata changes; the cache serves entries from then on."""
+        if METADATA_CACHE_ENABLED and self._listener is None:
+            self._listener = asyncio.create_task(self._listen(database_url))
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        self.clear()
+
+
+metadata_cache = MetadataCache()
+
+
+def cached(*tables: str):
+    """Cache a metadata read function (positional, hashable arguments) until one of its tables changes."""
+    def decorator(function):
+        name = function.__name__
+
+        @functools.wraps(function)
+        async def wrapper(*args):
+            return await metadata_cache.get_or_load(name, tables, args, function)
+        return wrapper
+    return decorator
+
+
+def invalidates(*tables: str):
+    """Invalidate the cached reads of the tables a write function changes."""
+    def decorator(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            # Before: writes that read their result back (create_* -> get_*_by_id) must not hit an old entry
+            metadata_cache.invalidate(*tables)
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                metadata_cache.invalidate(*tables)
+        return wrapper
+    return decorator
@@ -0,0 +1,146 @@
+"""
+Database operations for the measurement delete job queue.
+"""
+
+from typing import Dict, Optional
+
+# Global variable for database pool - will be set by main database module
+_db_pool = None
+
+def set_db_pool(pool):
+    """Set the database connection pool."""
+    global _db_pool
+    _db_pool = pool
+
+def get_db_pool():
+    """Get the database connection pool."""
+    if _db_pool is None:
+        raise RuntimeError("Database pool not initialized. Call set_db_pool() first.")
+    return _db_pool
+
+
+def _job_from_row(row) -> Optional[Dict]:
+    if not row:
+        return None
+    job = dict(row)
+    job["id"] = str(job["id"])
+    job["relation_ids"] = list(job["relation_ids"] or [])
+    return job
+
+
+async def create_delete_job(job_data: Dict) -> Dict:
+    """Insert a new queued delete job."""
+    async with get_db_pool().acquire() as conn:
+        row = await conn.fetchrow("""
+            INSERT INTO metadata.delete_jobs (
+                id, kind, test_id, relation_ids, keep_start, keep_end
+            )
+            VALUES ($1, $2, $3, $4, $5, $6)
+            RETURNING *;
+        """,
+            job_data["id"],
+            job_data["kind"],
+            job_data.get("test_id"),
+            job_data["relation_ids"],
+            job_data.get("keep_start"),
+            job_data.get("keep_end"),
+        )
+    return _job_from_row(row)
+
+
+async def get_delete_job(job_id: str) -> Optional[Dict]:
+    """Get a delete job by ID."""
+    async with get_db_pool().acquire() as conn:
+        row = await conn.fetchrow(
+            "SELECT * FROM metadata.delete_jobs WHERE id = $1::uuid;",
+            job_id
+        )
+    return _job_from_row(row)
+
+
+async def claim_next_delete_job() -> Optional[Dict]:
+    """Atomically take the oldest queued delete job and mark it processing."""
+    async with get_db_pool().acquire() as conn:
+        row = await conn.fetchrow("""
+            UPDATE metadata.delete_jobs
+            SET status = 'processing',
+                started_at = now(),
+                attempts = attempts + 1
+            WHERE id = (
+                SELECT id
+                FROM metadata.delete_jobs
+                WHERE status = 'queued'
+                ORDER BY created_at
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING *;
+        """)
+    return _job_from_row(row)
+
+
+async def update_delete_job_progress(
+    job_id: str,
+    progress: int,
+    raw_deleted: int,
+    avg_deleted: int,
+    chunks_dropped: int
+) -> None:
+    """Store the progress and running totals of a delete job."""
+    async with get_db_pool().acquire() as conn:
+        await conn.execute("""
+            UPDATE metadata.delete_jobs
+            SET progress = $2,
+                raw_deleted = $3,
+                avg_deleted = $4,
+                chunks_dropped = $5
+            WHERE id = $1::uuid;
+        """, job_id, progress, raw_deleted, avg_deleted, chunks_dropped)
+
+
+async def complete_delete_job(job_id: str) -> None:
+    """Mark a delete job completed."""
+    async with get_db_pool().acquire() as conn:
+        await conn.execute("""
+            UPDATE metadata.delete_jobs
+            SET status = 'completed',
+                progress = 100,
+                error = NULL,
+                completed_at = now()
+            WHERE id = $1::uuid;
+        """, job_id)
+
+
+async def fail_delete_job(job_id: str, error: str) -> None:
+    """Mark a delete job failed."""
+    async with get_db_pool().acquire() as conn:
+        await conn.execute("""
+            UPDATE metadata.delete_jobs
+            SET status = 'failed',
+                error = $2,
+                completed_at = now()
+            WHERE id = $1::uuid;
+        """, job_id, error)
+
+
+async def requeue_interrupted_delete_jobs(max_attempts: int) -> int:
+    """
+    Put delete jobs left in 'processing' by a previous backend process back in the queue.
+
+    Deleting is idempotent, so an interrupted job simply starts over.
+    Returns the number of requeued jobs.
+    """
+    async with get_db_pool().acquire() as conn:
+        async with conn.transaction():
+            await conn.execute("""
+                UPDATE metadata.delete_jobs
+                SET status = 'failed',
+                    error = 'Delete interrupted too many times'
+                WHERE status = 'processing' AND attempts >= $1;
+            """, max_attempts)
+            result = await conn.execute("""
+                UPDATE metadata.delete_jobs
+                SET status = 'queued'
+                WHERE status = 'processing';
+            """)
+    return int(result.split()[-1]) if result else 0
@@ -0,0 +1,213 @@
+"""
+Database operations for the persistent export job queue.
+"""
+
+from datetime import timedelta
+from typing import List, Dict, Optional
+import json
+
+# Global variable for database pool - will be set by main database module
+_db_pool = None
+
+def set_db_pool(pool):
+    """Set the database connection pool."""
+    global _db_pool
+    _db_pool = pool
+
+def get_db_pool():
+    """Get the database connection pool."""
+    if _db_pool is None:
+        raise RuntimeError("Database pool not initialized. Call set_db_pool() first.")
+    return _db_pool
+
+
+def _job_from_row(row) -> Optional[Dict]:
+    """Convert a job row to a dict, deserializing the JSON columns."""
+    if not row:
+        return None
+    job = dict(row)
+    job["id"] = str(job["id"])
+    for key in ("relations", "alignment"):
+        if job.get(key):
+            try:
+                job[key] = json.loads(job[key])
+            except (json.JSONDecodeError, TypeError):
+                job[key] = None
+    return job
+
+
+async def create_export_job(job_data: Dict) -> Dict:
+    """Insert a new queued export job."""
+    async with get_db_pool().acquire() as conn:
+        row = await conn.fetchrow("""
+            INSERT INTO metadata.export_jobs (
+                id, test_id, data_type, time_range, segment_id, priority, cache_key, format, alignment
+            )
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9::jsonb)
+            RETURNING *;
+        """,
+            job_data["id"],
+            job_data["test_id"],
+            job_data["data_type"],
+            job_data["time_range"],
+            job_data.get("segment_id"),
+            job_data.get("priority", 0),
+            job_data.get("cache_key"),
+            job_data.get("format", "parquet"),
+            json.dumps(job_data["alignment"]) if job_data.get("alignment") else None,
+        )
+    return _job_from_row(row)
+
+
+async def get_export_job(job_id: str) -> Optional[Dict]:
+    """Get an export job by ID."""
+    async with get_db_pool().acquire() as conn:
+        row = await conn.fetchrow(
+            "SELECT * FROM metadata.export_jobs WHERE id = $1::uuid;",
+            job_id
+        )
+    return _job_from_row(row)
+
+
+async def find_export_job_by_cache_key(cache_key: str, ttl: timedelta) -> Optional[Dict]:
+    """
+    Get the newest live job (queued, processing or completed) with the given cache key.
+
+    A completed hit has its expiry pushed out by ttl, so frequently
+    downloaded exports stay cached.
+    """
+    async with get_db_pool().acquire() as conn:
+        row = await conn.fetchrow("""
+            SELECT *
+            FROM metadata.export_jobs
+            WHERE cache_key = $1 AND status IN ('queued', 'processing', 'completed')
+            ORDER BY created_at DESC
+            LIMIT 1;
+        """, cache_key)
+
+        if row and row["status"] == "completed":
+            row = await conn.fetchrow("""
+                UPDATE metadata.export_jobs
+                SET expires_at = GREATEST(expires_at, now() + $2::interval)
+                WHERE id = $1 AND status = 'completed'
+                RETURNING *;
+            """, row["id"], ttl)
+    return _job_from_row(row)
+
+
+async def claim_next_export_job() -> Optional[Dict]:
+    """
+    Atomically take the highest-priority queued job and mark it processing.
+
+    FOR UPDATE SKIP LOCKED lets several workers poll the queue without ever
+    claiming the same job twice.
+    """
+    async with get_db_pool().acquire() as conn:
+        row = await conn.fetchrow("""
+            UPDATE metadata.export_jobs
+            SET status = 'processing',
+                progress = 0,
+                started_at = now(),
+                attempts = attempts + 1
+            WHERE id = (
+                SELECT id
+                FROM metadata.export_jobs
+                WHERE status = 'queued'
+                ORDER BY priority DESC, created_at
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING *;
+        """)
+    return _job_from_row(row)
+
+
+async def update_export_job_progress(job_id: str, progress: int, relations: Optional[List[Dict]] = None) -> None:
+    """Store the progress of a running export job."""
+    async with get_db_pool().acquire() as conn:
+        await conn.execute("""
+            UPDATE metadata.export_jobs
+            SET progress = $2,
+                relations = COALESCE($3::jsonb, relations)
+            WHERE id = $1::uuid;
+        """, job_id, progress, json.dumps(relations) if relations is not None else None)
+
+
+async def complete_export_job(job_id: str, filename: str, filepath: str, rows: int, ttl: timedelta) -> None:
+    """Mark an export job completed and schedule its artifact for eviction."""
+    async with get_db_pool().acquire() as conn:
+        await conn.execute("""
+            UPDATE metadata.export_jobs
+            SET status = 'completed',
+                progress = 100,
+                filename = $2,
+                filepath = $3,
+                rows = $4,
+                error = NULL,
+                completed_at = now(),
+                expires_at = now() + $5::interval
+            WHERE id = $1::uuid;
+        """, job_id, filename, filepath, rows, ttl)
+
+
+async def fail_export_job(job_id: str, error: str) -> None:
+    """Mark an export job failed."""
+    async with get_db_pool().acquire() as conn:
+        await conn.execute("""
+            UPDATE metadata.export_jobs
+            SET status = 'failed',
+                error = $2,
+                completed_at = now()
+            WHERE id = $1::uuid;
+        """, job_id, error)
+
+
+async def requeue_interrupted_export_jobs(max_attempts: int) -> int:
+    """
+    Put jobs left in 'processing' by a previous backend process back in the queue.
+
+    Jobs that already used max_attempts are failed instead, so an export that
+    crashes the backend cannot do so forever. Returns the number of requeued jobs.
+    """
+    async with get_db_pool().acquire() as conn:
+        async with conn.transaction():
+            await conn.execute("""
+                UPDATE metadata.export_jobs
+                SET status = 'failed',
+                    error = 'Export interrupted too many times'
+                WHERE status = 'processing' AND attempts >= $1;
+            """, max_attempts)
+            result = await conn.execute("""
+                UPDATE metadata.export_jobs
+                SET status = 'queued',
+                    progress = 0
+                WHERE status = 'processing';
+            """)
+    return int(result.split()[-1]) if result else 0
+
+
+async def expire_export_jobs() -> List[Dict]:
+    """
+    Mark completed jobs past their expires_at as expired.
+
+    Returns the expired jobs so the caller can delete their files.
+    """
+    async with get_db_pool().acquire() as conn:
+        rows = await conn.fetch("""
+            UPDATE metadata.export_jobs
+            SET status = 'expired'
+            WHERE status = 'completed' AND expires_at <= now()
+            RETURNING *;
+        """)
+    return [_job_from_row(row) for row in rows]
+
+
+async def get_export_job_filepaths() -> List[str]:
+    """Get the artifact paths of all completed (downloadable) jobs."""
+    async with get_db_pool().acquire() as conn:
+        rows = await conn.fetch("""
+            SELECT filepath
+            FROM metadata.export_jobs
+            WHERE filepath IS NOT NULL AND status = 'completed';
+        """)
+    return [row["filepath"] for row in rows]
@@ -6,6 +6,8 @@ This module contains all machine type sensor template management functions for P
 
 from typing import List, Dict, Optional
 
+from .cache import cached, invalidates
+
 # Global variable for database pool - will be set by main database module
 _db_pool = None
 
@@ -25,6 +27,7 @@ def get_db_pool():
 # ASYNC MACHINE TYPE SENSOR TEMPLATES (PostgreSQL)
 # ================================
 
+@cached("machine_type_sensor_templates", "sensor_types")
 async def get_templates_by_machine_type(machine_type_id: int) -> List[Dict]:
     """Get all sensor templates for a specific machine type with sensor type details."""
     async with get_db_pool().acquire() as conn:
@@ -41,6 +44,7 @@ async def get_templates_by_machine_type(machine_type_id: int) -> List[Dict]:
     return [dict(row) for row in rows]
 
 
+@cached("machine_type_sensor_templates", "sensor_types")
 async def get_template_by_id(template_id: int) -> Optional[Dict]:
     """Get a specific sensor template by ID."""
     async with get_db_pool().acquire() as conn:
@@ -56,6 +60,7 @@ async def get_template_by_id(template_id: int) -> Optional[Dict]:
     return dict(row) if row else None
 
 
+@invalidates("machine_type_sensor_templates")
 async def create_template(template_data: Dict) -> Dict:
     """Create a new sensor template."""
     fields = []
@@ -85,6 +90,7 @@ async def create_template(template_data: Dict) -> Dict:
         return await get_template_by_id(new_id)
 
 
+@invalidates("machine_type_sensor_templates")
 async def update_template(template_id: int, update_data: Dict) -> Optional[Dict]:
     """Update an existing sensor template."""
     if not update_data:
@@ -113,6 +119,7 @@ async def update_template(template_id: int, update_data: Dict) -> Optional[Dict]
         return await get_template_by_id(updated_id)
 
 
+@invalidates("machine_type_sensor_templates")
 async def delete_template(template_id: int) -> bool:
     """Delete a sensor template."""
     async with get_db_pool().acquire() as conn:
@@ -123,6 +130,7 @@ async def delete_template(template_id: int) -> bool:
     return result == "DELETE 1"
 
 
+@invalidates("machine_type_sensor_templates")
 async def delete_templates_by_machine_type(machine_type_id: int) -> bool:
     """Delete all sensor templates for a machine type."""
     async with get_db_pool().acquire() as conn:
@@ -133,6 +141,7 @@ async def delete_templates_by_machine_type(machine_type_id: int) -> bool:
     return True
 
 
+@invalidates("machine_type_sensor_templates")
 async def bulk_update_template_orders(updates: List[Dict]) -> bool:
     """
     Bulk update display orders for multiple templates.
@@ -7,6 +7,8 @@ This module contains all machine type management functions for PostgreSQL.
 from datetime import datetime
 from typing import Any, List, Dict, Optional
 
+from .cache import cached, invalidates
+
 # Global variable for database pool - will be set by main database module
 _db_pool = None
 
@@ -26,6 +28,7 @@ def get_db_pool():
 # ASYNC MACHINE TYPES (PostgreSQL)
 # ================================
 
+@cached("machine_types")
 async def get_all_machine_types() -> List[Dict]:
     """Get all machine types."""
     async with get_db_pool().acquire() as conn:
@@ -37,6 +40,7 @@ async def get_all_machine_types() -> List[Dict]:
     return [dict(row) for row in rows]
 
 
+@cached("machine_types")
 async def get_machine_type_by_id(type_id: int) -> Optional[Dict]:
     """Get machine type by ID."""
     async with get_db_pool().acquire() as conn:
@@ -48,6 +52,7 @@ async def get_machine_type_by_id(type_id: int) -> Optional[Dict]:
     return dict(row) if row else None
 
 
+@invalidates("machine_types")
 async def create_machine_type(type_data: Dict) -> Dict:
     """Create a new machine type."""
     fields = []
@@ -80,6 +85,7 @@ async def create_machine_type(type_data: Dict) -> Dict:
         return await get_machine_type_by_id(new_id)
 
 
+@invalidates("machine_types")
 async def update_machine_type(type_id: int, type_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """Update machine type."""
     fields = []
@@ -105,6 +111,7 @@ async def update_machine_type(type_id: int, type_data: Dict[str, Any]) -> Option
         return dict(row) if row else None
 
 
+@invalidates("machine_types", "machines", "machine_type_sensor_templates")
 async def delete_machine_type(type_id: int) -> bool:
     """Delete machine type by ID."""
     async with get_db_pool().acquire() as conn:
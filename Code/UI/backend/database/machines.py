@@ -8,6 +8,8 @@ This module contains all machine management functions for PostgreSQL.
 from datetime import datetime
 from typing import List, Dict, Optional
 
+from .cache import cached, invalidates
+
 # Global variable for database pool - will be set by main database module
 _db_pool = None
 
@@ -27,6 +29,7 @@ def get_db_pool():
 # ASYNC MACHINE FUNCTIONS (PostgreSQL)
 # ================================
 
+@cached("machines")
 async def get_all_machines() -> List[Dict]:
     """Get all machines."""
     async with get_db_pool().acquire() as conn:
@@ -37,6 +40,7 @@ async def get_all_machines() -> List[Dict]:
         """)
     return [dict(row) for row in rows]
 
+@cached("machines")
 async def get_machine_by_id(machine_id: int) -> Optional[Dict]:
     """Get machine by ID."""
     async with get_db_pool().acquire() as conn:
@@ -46,6 +50,7 @@ async def get_machine_by_id(machine_id: int) -> Optional[Dict]:
         )
     return dict(row) if row else None
 
+@invalidates("machines")
 async def create_machine(machine_data: Dict) -> Optional[Dict]:
     """Create a new machine."""
 
@@ -78,6 +83,7 @@ async def create_machine(machine_data: Dict) -> Optional[Dict]:
         
         return await get_machine_by_id(new_id)
 
+@invalidates("machines")
 async def update_machine(machine_id: int, machine_data: Dict) -> Optional[Dict]:
     """Update machine."""
     fields = []
@@ -101,6 +107,7 @@ async def update_machine(machine_id: int, machine_data: Dict) -> Optional[Dict]:
         row = await conn.fetchrow(query, *values)
         return dict(row) if row else None
 
+@invalidates("machines", "tests", "test_relations")
 async def delete_machine(machine_id: int) -> bool:
     """Delete machine by ID."""
     async with get_db_pool().acquire() as conn:
@@ -116,6 +123,7 @@ async def delete_machine(machine_id: int) -> bool:
 # ADDITIONAL MACHINE UTILITIES
 #===============================
 
+@cached("machines")
 async def get_machines_by_machine_type(machine_type_id: int) -> List[Dict]:
     """Get all machines of a specific type."""
     async with get_db_pool().acquire() as conn:
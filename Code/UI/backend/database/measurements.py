@@ -1,8 +1,20 @@
 
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional, AsyncIterator, Sequence, Tuple
 import json
 
+import asyncpg
+
+# Continuous aggregates over timeseries.measurements (all bucketed by 10 seconds)
+MEASUREMENT_AGGREGATES = ("timeseries.measurements_avg_10s", "timeseries.measurements_stats_10s")
+
+# Refreshing a long window of an aggregate can exceed the pool's command_timeout
+AGGREGATE_REFRESH_TIMEOUT_SECONDS = 3600
+
+# start_offset of the continuous aggregate refresh policies (schemas/02, 14):
+# buckets up to this old may still be materialized after the last sample
+AGGREGATE_SETTLE_SECONDS = 120
+
 # Global variable for database pool - will be set by main database module
 _db_pool = None
 
@@ -22,11 +34,47 @@ def get_db_pool():
 # ASYNC TESTS FUNCTIONS (PostgreSQL)
 # ================================
 
-async def get_sensor_measurements_avg(test_relation_id: int) -> List[Dict]:
-    """Get sensor measurements for a given test relation ID, grouped by channel."""
-    async with get_db_pool().acquire() as conn:
-        rows = await conn.fetch("""
-            SELECT 
+async def fetch_sensor_measurements_avg(
+    test_relation_id: int,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    limit: Optional[int] = None,
+) -> List[asyncpg.Record]:
+    """
+    Fetch 10s aggregates for a test relation as raw asyncpg records.
+
+    Time filtering and the per-channel limit (most recent `limit` buckets per
+    channel) are done in SQL. Rows are ordered by bucket, then channel.
+    """
+    conditions = ["test_relation_id = $1"]
+    params: List[Any] = [test_relation_id]
+
+    if start_time:
+        params.append(start_time)
+        conditions.append(f"bucket >= ${len(params)}")
+    if end_time:
+        params.append(end_time)
+        conditions.append(f"bucket <= ${len(params)}")
+
+    limit_sql = ""
+    if limit:
+        params.append(limit)
+        limit_sql = f"WHERE rn <= ${len(params)}"
+
+    query = f"""
+        SELECT
+            measurement_timestamp,
+            test_relation_id,
+            measurement_channel,
+            avg_value,
+            min_value,
+            max_value,
+            avg_abs_value,
+            min_abs_value,
+            max_abs_value,
+            num_samples
+        FROM (
+            SELECT
                 bucket AS measurement_timestamp,
                 test_relation_id,
                 measurement_channel,
@@ -36,22 +84,36 @@ async def get_sensor_measurements_avg(test_relation_id: int) -> List[Dict]:
                 avg_abs_value,
                 min_abs_value,
                 max_abs_value,
-                num_samples
+                num_samples,
+                ROW_NUMBER() OVER (
+                    PARTITION BY measurement_channel
+                    ORDER BY bucket DESC
+                ) AS rn
             FROM timeseries.measurements_avg_10s
-            WHERE test_relation_id = $1
-            ORDER BY bucket ASC, measurement_channel
-        """, test_relation_id)
+            WHERE {' AND '.join(conditions)}
+        ) AS aggregated
+        {limit_sql}
+        ORDER BY measurement_timestamp ASC, measurement_channel
+    """
+
+    async with get_db_pool().acquire() as conn:
+        return await conn.fetch(query, *params)
+
+
+async def get_sensor_measurements_avg(test_relation_id: int) -> List[Dict]:
+    """Get sensor measurements for a given test relation ID, grouped by channel."""
+    rows = await fetch_sensor_measurements_avg(test_relation_id)
     return [dict(row) for row in rows]
 
-async def get_sensor_measurements_raw(
+async def fetch_sensor_measurements_raw(
     test_relation_id: int,
     limit: int = 10_000,
     last_minutes: Optional[int] = None,
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None,
-) -> List[Dict]:
+) -> List[asyncpg.Record]:
     """
-    Fetch raw sensor measurements with flexible time filtering.
+    Fetch raw sensor measurements with flexible time filtering, as asyncpg records.
 
     Priority:
     1) If start_time or end_time is provided -> use explicit time range
@@ -151,11 +213,816 @@ async def get_sensor_measurements_raw(
     """
 
     async with get_db_pool().acquire() as conn:
-        rows = await conn.fetch(final_query, *params)
+        return await conn.fetch(final_query, *params)
+
 
+async def get_sensor_measurements_raw(
+    test_relation_id: int,
+    limit: int = 10_000,
+    last_minutes: Optional[int] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> List[Dict]:
+    """Fetch raw sensor measurements as dicts. See fetch_sensor_measurements_raw."""
+    rows = await fetch_sensor_measurements_raw(
+        test_relation_id,
+        limit=limit,
+        last_minutes=last_minutes,
+        start_time=start_time,
+        end_time=end_time,
+    )
     return [dict(row) for row in rows]
 
 
+async def fetch_measurements_avg_for_relations(
+    test_relation_ids: List[int],
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    limit: Optional[int] = None,
+) -> List[asyncpg.Record]:
+    """
+    Fetch the 10s aggregates of several test relations in one query.
+
+    Like fetch_sensor_measurements_avg, with the limit (most recent `limit`
+    buckets) applied per relation and channel. Rows are ordered by
+    relation, channel, then bucket.
+    """
+    # Only the given bounds become predicates, so TimescaleDB can exclude
+    # chunks from a generic plan too
+    conditions = ["test_relation_id = ANY($1::int[])"]
+    params: List[Any] = [test_relation_ids]
+
+    if start_time is not None:
+        params.append(start_time)
+        conditions.append(f"bucket >= ${len(params)}")
+    if end_time is not None:
+        params.append(end_time)
+        conditions.append(f"bucket <= ${len(params)}")
+
+    limit_filter = ""
+    if limit is not None:
+        params.append(limit)
+        limit_filter = f"WHERE rn <= ${len(params)}"
+
+    async with get_db_pool().acquire() as conn:
+        return await conn.fetch(f"""
+            SELECT
+                measurement_timestamp,
+                test_relation_id,
+                measurement_channel,
+                avg_value,
+                min_value,
+                max_value,
+                avg_abs_value,
+                min_abs_value,
+                max_abs_value,
+                num_samples
+            FROM (
+                SELECT
+                    bucket AS measurement_timestamp,
+                    test_relation_id,
+                    measurement_channel,
+                    avg_value,
+                    min_value,
+                    max_value,
+                    avg_abs_value,
+                    min_abs_value,
+                    max_abs_value,
+                    num_samples,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY test_relation_id, measurement_channel
+                        ORDER BY bucket DESC
+                    ) AS rn
+                FROM timeseries.measurements_avg_10s
+                WHERE {' AND '.join(conditions)}
+            ) AS aggregated
+            {limit_filter}
+            ORDER BY test_relation_id, measurement_channel, measurement_timestamp
+        """, *params)
+
+
+async def fetch_measurements_raw_for_relations(
+    test_relation_ids: List[int],
+    limit: int = 10_000,
+    last_minutes: Optional[int] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> List[asyncpg.Record]:
+    """
+    Fetch raw measurements of several test relations in one query.
+
+    Same filtering as fetch_sensor_measurements_raw; last_minutes counts
+    back from each relation's own latest timestamp (looked up by a first
+    query on the same connection) and the limit applies
+    per relation and channel. Rows are ordered by relation, channel, then
+    timestamp.
+    """
+    if last_minutes is not None and (start_time or end_time):
+        raise ValueError(
+            "Use either last_minutes OR start/end time filtering, not both."
+        )
+
+    # ---------- Build dynamic WHERE conditions ----------
+    # Catch-all predicates ($n IS NULL OR ...) would keep TimescaleDB from
+    # excluding chunks once asyncpg switches to a generic plan
+    conditions = ["m.test_relation_id = ANY($1::int[])"]
+    params: List[Any] = [test_relation_ids, limit]
+    window_join = ""
+
+    async with get_db_pool().acquire() as conn:
+        if last_minutes is not None:
+            latest = await conn.fetch("""
+                SELECT r.id AS test_relation_id, last.latest_time
+                FROM unnest($1::int[]) AS r(id)
+                CROSS JOIN LATERAL (
+                    SELECT measurement_timestamp AS latest_time
+                    FROM timeseries.measurements
+                    WHERE test_relation_id = r.id
+                    ORDER BY measurement_timestamp DESC LIMIT 1
+                ) AS last
+            """, test_relation_ids)
+            if not latest:
+                return []
+
+            window = timedelta(minutes=last_minutes)
+            since = [row["latest_time"] - window for row in latest]
+            params[0] = [row["test_relation_id"] for row in latest]
+            params.extend([since, min(since)])
+            window_join = f"""
+                JOIN unnest($1::int[], ${len(params) - 1}::timestamptz[]) AS w(test_relation_id, since)
+                  ON w.test_relation_id = m.test_relation_id
+            """
+            conditions.append("m.measurement_timestamp >= w.since")
+            # Constant lower bound of all windows, for chunk exclusion
+            conditions.append(f"m.measurement_timestamp >= ${len(params)}")
+
+        if start_time is not None:
+            params.append(start_time)
+            conditions.append(f"m.measurement_timestamp >= ${len(params)}")
+        if end_time is not None:
+            params.append(end_time)
+            conditions.append(f"m.measurement_timestamp <= ${len(params)}")
+
+        return await conn.fetch(f"""
+            WITH latest_measurements AS (
+                SELECT
+                    m.measurement_timestamp,
+                    m.test_relation_id,
+                    m.measurement_channel,
+                    m.measurement_value,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY m.test_relation_id, m.measurement_channel
+                        ORDER BY m.measurement_timestamp DESC
+                    ) AS rn
+                FROM timeseries.measurements m
+                {window_join}
+                WHERE {' AND '.join(conditions)}
+            )
+            SELECT
+                measurement_timestamp,
+                test_relation_id,
+                measurement_channel,
+                measurement_value
+            FROM latest_measurements
+            WHERE rn <= $2
+            ORDER BY test_relation_id, measurement_channel, measurement_timestamp
+        """, *params)
+
+
+async def stream_sensor_measurements_avg(
+    test_relation_id: int,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    page_size: int = 5_000,
+) -> AsyncIterator[List[asyncpg.Record]]:
+    """
+    Stream 10s aggregates of a test relation in (bucket, channel) order, page by page.
+
+    The bucket is returned as measurement_timestamp, like in fetch_sensor_measurements_avg.
+    """
+    conditions = ["test_relation_id = $1"]
+    params: List[Any] = [test_relation_id]
+
+    if start_time is not None:
+        params.append(start_time)
+        conditions.append(f"bucket >= ${len(params)}")
+    if end_time is not None:
+        params.append(end_time)
+        conditions.append(f"bucket <= ${len(params)}")
+
+    query = f"""
+        SELECT
+            bucket AS measurement_timestamp,
+            test_relation_id,
+            measurement_channel,
+            avg_value,
+            min_value,
+            max_value,
+            avg_abs_value,
+            min_abs_value,
+            max_abs_value,
+            num_samples
+        FROM timeseries.measurements_avg_10s
+        WHERE {' AND '.join(conditions)}
+        ORDER BY bucket ASC, measurement_channel
+    """
+
+    async for page in _stream_pages(query, params, page_size):
+        yield page
+
+
+async def page_sensor_measurements_raw(
+    test_relation_id: int,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    page_size: int = 5_000,
+    after_timestamp: Optional[datetime] = None,
+    after_channel: Optional[str] = None,
+) -> AsyncIterator[List[asyncpg.Record]]:
+    """
+    Read raw measurements in (timestamp, channel) order, one keyset page at a time.
+
+    No cursor stays open: every page is a separate LIMIT query resuming
+    after the previous page's last row, on a connection that goes back to
+    the pool right after. A consumer that pauses between pages therefore
+    holds no connection. Rows repeating the (timestamp, channel) of a page's
+    last row are skipped. (after_timestamp, after_channel) is an exclusive
+    keyset cursor: pass the last row of a previous read to resume right
+    after it. NULL channels sort as ''.
+    """
+    conditions = ["test_relation_id = $1"]
+    params: List[Any] = [test_relation_id]
+
+    if start_time is not None:
+        params.append(start_time)
+        conditions.append(f"measurement_timestamp >= ${len(params)}")
+    if end_time is not None:
+        params.append(end_time)
+        conditions.append(f"measurement_timestamp <= ${len(params)}")
+
+    select = """
+        SELECT
+            measurement_timestamp,
+            test_relation_id,
+            measurement_channel,
+            measurement_value
+        FROM timeseries.measurements
+    """
+
+    after = (after_timestamp, after_channel or "") if after_timestamp is not None else None
+    async for page in _keyset_pages(select, "measurement_timestamp", conditions, params, page_size, after):
+        yield page
+
+
+async def page_sensor_measurements_avg(
+    test_relation_id: int,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    page_size: int = 5_000,
+) -> AsyncIterator[List[asyncpg.Record]]:
+    """
+    Read 10s aggregates in (bucket, channel) order, one keyset page at a time.
+
+    See page_sensor_measurements_raw; the bucket is returned as measurement_timestamp.
+    """
+    conditions = ["test_relation_id = $1"]
+    params: List[Any] = [test_relation_id]
+
+    if start_time is not None:
+        params.append(start_time)
+        conditions.append(f"bucket >= ${len(params)}")
+    if end_time is not None:
+        params.append(end_time)
+        conditions.append(f"bucket <= ${len(params)}")
+
+    select = """
+        SELECT
+            bucket AS measurement_timestamp,
+            test_relation_id,
+            measurement_channel,
+            avg_value,
+            min_value,
+            max_value,
+            avg_abs_value,
+            min_abs_value,
+            max_abs_value,
+            num_samples
+        FROM timeseries.measurements_avg_10s
+    """
+
+    async for page in _keyset_pages(select, "bucket", conditions, params, page_size):
+        yield page
+
+
+async def page_sensor_measurement_arrays(
+    test_relation_id: int,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    page_size: int = 50_000,
+) -> AsyncIterator[List[asyncpg.Record]]:
+    """
+    Read raw measurements as per-channel arrays, one keyset page at a time.
+
+    A page covers the next page_size rows in (timestamp, channel) order and
+    has one row per channel: measurement_channel ('' for NULL),
+    timestamps_us (bigint[], epoch microseconds) and measurement_values
+    (float8[]), both in time order. asyncpg decodes the arrays in C, so
+    callers build NumPy arrays without touching the individual samples.
+    Like page_sensor_measurements_raw, every page runs on its own pooled
+    connection.
+    """
+    conditions = ["test_relation_id = $1"]
+    params: List[Any] = [test_relation_id]
+
+    if start_time is not None:
+        params.append(start_time)
+        conditions.append(f"measurement_timestamp >= ${len(params)}")
+    if end_time is not None:
+        params.append(end_time)
+        conditions.append(f"measurement_timestamp <= ${len(params)}")
+
+    after = None
+    while True:
+        page_conditions = list(conditions)
+        page_params = list(params)
+        if after is not None:
+            page_params.extend(after)
+            page_conditions.append(f"measurement_timestamp >= ${len(page_params) - 1}")
+            page_conditions.append(
+                f"(measurement_timestamp, COALESCE(measurement_channel, '')) > (${len(page_params) - 1}, ${len(page_params)})"
+            )
+
+        async with get_db_pool().acquire() as conn:
+            page = await conn.fetch(f"""
+                WITH page AS (
+                    SELECT
+                        measurement_timestamp,
+                        COALESCE(measurement_channel, '') AS measurement_channel,
+                        measurement_value
+                    FROM timeseries.measurements
+                    WHERE {' AND '.join(page_conditions)}
+                    ORDER BY measurement_timestamp ASC, COALESCE(measurement_channel, '') ASC
+                    LIMIT {int(page_size)}
+                )
+                SELECT
+                    measurement_channel,
+                    array_agg((EXTRACT(EPOCH FROM measurement_timestamp) * 1000000)::bigint
+                              ORDER BY measurement_timestamp) AS timestamps_us,
+                    array_agg(measurement_value ORDER BY measurement_timestamp) AS measurement_values,
+                    MAX(measurement_timestamp) AS last_timestamp,
+                    COUNT(*) AS num_rows
+                FROM page
+                GROUP BY measurement_channel
+                ORDER BY measurement_channel;
+            """, *page_params)
+
+        if not page:
+            break
+        yield page
+        if sum(row["num_rows"] for row in page) < page_size:
+            break
+        last_timestamp = max(row["last_timestamp"] for row in page)
+        after = (
+            last_timestamp,
+            max(row["measurement_channel"] for row in page if row["last_timestamp"] == last_timestamp),
+        )
+
+
+async def fetch_measurement_avg_series(
+    test_relation_ids: List[int],
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> List[Dict]:
+    """
+    Fetch the 10s aggregates of several relations as one series per relation and channel.
+
+    Each row holds test_relation_id, measurement_channel and the arrays
+    timestamps (bucket starts in epoch seconds) and values (avg_abs_value),
+    ordered by bucket: one row per channel instead of one per bucket keeps
+    a multi-day test cheap to transfer and decode.
+    """
+    conditions = ["test_relation_id = ANY($1::int[])"]
+    params: List[Any] = [test_relation_ids]
+    if start_time is not None:
+        params.append(start_time)
+        conditions.append(f"bucket >= ${len(params)}")
+    if end_time is not None:
+        params.append(end_time)
+        conditions.append(f"bucket <= ${len(params)}")
+
+    async with get_db_pool().acquire() as conn:
+        rows = await conn.fetch(f"""
+            SELECT
+                test_relation_id,
+                measurement_channel,
+                array_agg(extract(epoch FROM bucket)::double precision ORDER BY bucket) AS timestamps,
+                array_agg(avg_abs_value ORDER BY bucket) AS values
+            FROM timeseries.measurements_avg_10s
+            WHERE {' AND '.join(conditions)}
+            GROUP BY test_relation_id, measurement_channel
+            ORDER BY test_relation_id, measurement_channel
+        """, *params)
+    return [dict(row) for row in rows]
+
+
+# RMS, standard deviation and crest factor from summed 10s statistics (see
+# schemas/14_schema_measurement_stats.sql); expects sum_value, sum_squares,
+# max_abs_value and num_samples of the combined buckets
+_DERIVED_STATS_COLUMNS = """
+    num_samples,
+    sum_value / NULLIF(num_samples, 0) AS mean_value,
+    sqrt(sum_squares / NULLIF(num_samples, 0)) AS rms_value,
+    sqrt(GREATEST(sum_squares / NULLIF(num_samples, 0) - (sum_value / NULLIF(num_samples, 0)) ^ 2, 0)) AS std_value,
+    max_abs_value,
+    max_abs_value / NULLIF(sqrt(sum_squares / NULLIF(num_samples, 0)), 0) AS crest_factor
+"""
+
+
+async def fetch_sensor_measurement_stats(
+    test_relation_id: int,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    bucket: timedelta = timedelta(seconds=10),
+) -> List[asyncpg.Record]:
+    """
+    Fetch RMS / std / peak / crest factor per channel and time bucket.
+
+    bucket must be a multiple of 10 seconds; coarser buckets are combined
+    from the 10s statistics aggregate, raw data is never read. Rows are
+    ordered by bucket, then channel.
+    """
+    conditions = ["test_relation_id = $1"]
+    params: List[Any] = [test_relation_id, bucket]
+
+    if start_time:
+        params.append(start_time)
+        conditions.append(f"bucket >= ${len(params)}")
+    if end_time:
+        params.append(end_time)
+        conditions.append(f"bucket <= ${len(params)}")
+
+    async with get_db_pool().acquire() as conn:
+        return await conn.fetch(f"""
+            SELECT
+                bucket AS measurement_timestamp,
+                test_relation_id,
+                measurement_channel,
+                {_DERIVED_STATS_COLUMNS}
+            FROM (
+                SELECT
+                    time_bucket($2::interval, bucket) AS bucket,
+                    test_relation_id,
+                    measurement_channel,
+                    SUM(sum_value) AS sum_value,
+                    SUM(sum_squares) AS sum_squares,
+                    MAX(max_abs_value) AS max_abs_value,
+                    SUM(num_samples)::double precision AS num_samples
+                FROM timeseries.measurements_stats_10s
+                WHERE {' AND '.join(conditions)}
+                GROUP BY 1, test_relation_id, measurement_channel
+            ) AS combined
+            ORDER BY measurement_timestamp ASC, measurement_channel
+        """, *params)
+
+
+async def get_measurement_stats_summary(
+    test_relation_ids: List[int],
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> List[Dict]:
+    """RMS / std / peak / crest factor per relation and channel over a whole time range."""
+    conditions = ["test_relation_id = ANY($1::int[])"]
+    params: List[Any] = [test_relation_ids]
+    if start_time is not None:
+        params.append(start_time)
+        conditions.append(f"bucket >= ${len(params)}")
+    if end_time is not None:
+        params.append(end_time)
+        conditions.append(f"bucket <= ${len(params)}")
+
+    async with get_db_pool().acquire() as conn:
+        rows = await conn.fetch(f"""
+            SELECT
+                test_relation_id,
+                measurement_channel,
+                first_bucket,
+                last_bucket,
+                {_DERIVED_STATS_COLUMNS}
+            FROM (
+                SELECT
+                    test_relation_id,
+                    measurement_channel,
+                    MIN(bucket) AS first_bucket,
+                    MAX(bucket) AS last_bucket,
+                    SUM(sum_value) AS sum_value,
+                    SUM(sum_squares) AS sum_squares,
+                    MAX(max_abs_value) AS max_abs_value,
+                    SUM(num_samples)::double precision AS num_samples
+                FROM timeseries.measurements_stats_10s
+                WHERE {' AND '.join(conditions)}
+                GROUP BY test_relation_id, measurement_channel
+            ) AS combined
+            ORDER BY test_relation_id, measurement_channel
+        """, *params)
+    return [dict(row) for row in rows]
+
+
+async def get_measurement_summary_stats(
+    test_relation_ids: List[int],
+    start_time: datetime,
+    end_time: datetime,
+    timeout: Optional[float] = None,
+) -> List[Dict]:
+    """
+    Count, mean, RMS, standard deviation, min/max and 5/50/95th percentiles
+    of the raw measurements per relation and channel in [start_time, end_time].
+
+    Scans (and sorts, for the percentiles) every raw row of the range; meant
+    for background jobs, which pass a timeout beyond the pool's default.
+    """
+    async with get_db_pool().acquire() as conn:
+        rows = await conn.fetch("""
+            SELECT
+                test_relation_id,
+                measurement_channel,
+                COUNT(measurement_value) AS num_samples,
+                AVG(measurement_value) AS mean_value,
+                sqrt(AVG(measurement_value * measurement_value)) AS rms_value,
+                stddev_pop(measurement_value) AS std_value,
+                MIN(measurement_value) AS min_value,
+                MAX(measurement_value) AS max_value,
+                percentile_cont(ARRAY[0.05, 0.5, 0.95]) WITHIN GROUP (ORDER BY measurement_value) AS percentiles
+            FROM timeseries.measurements
+            WHERE test_relation_id = ANY($1::int[])
+              AND measurement_timestamp >= $2
+              AND measurement_timestamp <= $3
+            GROUP BY test_relation_id, measurement_channel
+            ORDER BY test_relation_id, measurement_channel
+        """, test_relation_ids, start_time, end_time, timeout=timeout)
+    return [dict(row) for row in rows]
+
+
+async def get_measurement_time_bounds(
+    test_relation_ids: List[int],
+) -> Optional[Dict[str, datetime]]:
+    """
+    Get the first and last raw measurement timestamp over several test relations.
+
+    Uses one ORDER BY ... LIMIT 1 lookup per relation and direction, so it is
+    served from the (test_relation_id, measurement_timestamp) index.
+    """
+    if not test_relation_ids:
+        return None
+
+    async with get_db_pool().acquire() as conn:
+        row = await conn.fetchrow("""
+            SELECT
+                MIN(bounds.first_ts) AS start_time,
+                MAX(bounds.last_ts) AS end_time
+            FROM unnest($1::int[]) AS r(id)
+            CROSS JOIN LATERAL (
+                SELECT
+                    (SELECT measurement_timestamp FROM timeseries.measurements
+                     WHERE test_relation_id = r.id
+                     ORDER BY measurement_timestamp ASC LIMIT 1) AS first_ts,
+                    (SELECT measurement_timestamp FROM timeseries.measurements
+                     WHERE test_relation_id = r.id
+                     ORDER BY measurement_timestamp DESC LIMIT 1) AS last_ts
+            ) AS bounds
+        """, test_relation_ids)
+
+    if not row or row["start_time"] is None:
+        return None
+    return dict(row)
+
+
+async def get_measurement_avg_time_bounds(
+    test_relation_ids: List[int],
+) -> Optional[Dict[str, datetime]]:
+    """Get the first and last 10s aggregate bucket over several test relations."""
+    if not test_relation_ids:
+        return None
+
+    async with get_db_pool().acquire() as conn:
+        row = await conn.fetchrow("""
+            SELECT
+                MIN(bounds.first_bucket) AS start_time,
+                MAX(bounds.last_bucket) AS end_time
+            FROM unnest($1::int[]) AS r(id)
+            CROSS JOIN LATERAL (
+                SELECT
+                    (SELECT bucket FROM timeseries.measurements_avg_10s
+                     WHERE test_relation_id = r.id
+                     ORDER BY bucket ASC LIMIT 1) AS first_bucket,
+                    (SELECT bucket FROM timeseries.measurements_avg_10s
+                     WHERE test_relation_id = r.id
+                     ORDER BY bucket DESC LIMIT 1) AS last_bucket
+            ) AS bounds
+        """, test_relation_ids)
+
+    if not row or row["start_time"] is None:
+        return None
+    return dict(row)
+
+
+async def get_measurement_channels(
+    test_relation_ids: List[int],
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> Dict[int, List[str]]:
+    """
+    Get the channels of several test relations from the 10s aggregate.
+
+    Much cheaper than scanning the raw rows; channels that only occur in the
+    not yet materialized tail are missing. NULL channels are returned as ''.
+    """
+    if not test_relation_ids:
+        return {}
+
+    conditions = ["test_relation_id = ANY($1::int[])"]
+    params: List[Any] = [test_relation_ids]
+    if start_time is not None:
+        params.append(start_time)
+        conditions.append(f"bucket >= time_bucket(INTERVAL '10 seconds', ${len(params)}::timestamptz)")
+    if end_time is not None:
+        params.append(end_time)
+        conditions.append(f"bucket <= ${len(params)}")
+
+    async with get_db_pool().acquire() as conn:
+        rows = await conn.fetch(f"""
+            SELECT DISTINCT test_relation_id, COALESCE(measurement_channel, '') AS measurement_channel
+            FROM timeseries.measurements_avg_10s
+            WHERE {' AND '.join(conditions)}
+        """, *params)
+
+    channels: Dict[int, List[str]] = {}
+    for row in rows:
+        channels.setdefault(row["test_relation_id"], []).append(row["measurement_channel"])
+    return channels
+
+
+async def get_measurement_data_version(
+    test_relation_ids: List[int],
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """
+    Get a cheap version stamp of the measurements of several test relations.
+
+    The stamp is the last raw timestamp (index lookup per relation), the
+    sample count summed from the 10s aggregate and the relations'
+    data_generation, so it changes when data is appended, cropped or deleted
+    without counting the raw rows.
+
+    The aggregate lags the raw data by its refresh policy, so the sample
+    count is only final once the last change (last_modified) is older than
+    AGGREGATE_SETTLE_SECONDS. Until settled is set, keys derived from the
+    stamp must not be stored or compared.
+    """
+    if not test_relation_ids:
+        return {"max_timestamp": None, "num_samples": 0, "data_generation": [], "last_modified": None, "settled": True}
+
+    raw_conditions = ["test_relation_id = r.id"]
+    avg_conditions = ["test_relation_id = ANY($1::int[])"]
+    params: List[Any] = [test_relation_ids]
+    if start_time is not None:
+        params.append(start_time)
+        raw_conditions.append(f"measurement_timestamp >= ${len(params)}")
+        avg_conditions.append(f"bucket >= time_bucket(INTERVAL '10 seconds', ${len(params)}::timestamptz)")
+    if end_time is not None:
+        params.append(end_time)
+        raw_conditions.append(f"measurement_timestamp <= ${len(params)}")
+        avg_conditions.append(f"bucket <= ${len(params)}")
+
+    async with get_db_pool().acquire() as conn:
+        row = await conn.fetchrow(f"""
+            SELECT
+                (SELECT MAX(last.ts)
+                 FROM unnest($1::int[]) AS r(id)
+                 CROSS JOIN LATERAL (
+                     SELECT measurement_timestamp AS ts
+                     FROM timeseries.measurements
+                     WHERE {' AND '.join(raw_conditions)}
+                     ORDER BY measurement_timestamp DESC LIMIT 1
+                 ) AS last) AS max_timestamp,
+                (SELECT COALESCE(SUM(num_samples), 0)
+                 FROM timeseries.measurements_avg_10s
+                 WHERE {' AND '.join(avg_conditions)}) AS num_samples,
+                (SELECT array_agg(data_generation ORDER BY id)
+                 FROM metadata.test_relations
+                 WHERE id = ANY($1::int[])) AS data_generation,
+                (SELECT MAX(data_changed_at)
+                 FROM metadata.test_relations
+                 WHERE id = ANY($1::int[])) AS data_changed_at
+        """, *params)
+
+    changes = [t for t in (row["max_timestamp"], row["data_changed_at"]) if t is not None]
+    last_modified = max(changes) if changes else None
+    settled = last_modified is None or (
+        datetime.now(timezone.utc) - last_modified >= timedelta(seconds=AGGREGATE_SETTLE_SECONDS)
+    )
+    return {
+        "max_timestamp": row["max_timestamp"],
+        "num_samples": row["num_samples"],
+        "data_generation": list(row["data_generation"] or []),
+        "last_modified": last_modified,
+        "settled": settled,
+    }
+
+
+async def stream_measurements_raw_for_relations(
+    test_relation_ids: List[int],
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    page_size: int = 50_000,
+) -> AsyncIterator[List[asyncpg.Record]]:
+    """
+    Stream raw measurements of several test relations in timestamp order.
+
+    Rows come from a server-side cursor one page at a time, so memory is
+    bounded by page_size.
+    """
+    conditions = ["test_relation_id = ANY($1::int[])"]
+    params: List[Any] = [test_relation_ids]
+
+    if start_time:
+        params.append(start_time)
+        conditions.append(f"measurement_timestamp >= ${len(params)}")
+    if end_time:
+        params.append(end_time)
+        conditions.append(f"measurement_timestamp <= ${len(params)}")
+
+    query = f"""
+        SELECT
+            measurement_timestamp,
+            test_relation_id,
+            measurement_channel,
+            measurement_value
+        FROM timeseries.measurements
+        WHERE {' AND '.join(conditions)}
+        ORDER BY measurement_timestamp ASC, test_relation_id, measurement_channel
+    """
+
+    async for page in _stream_pages(query, params, page_size):
+        yield page
+
+
+async def _stream_pages(query: str, params: List[Any], page_size: int) -> AsyncIterator[List[asyncpg.Record]]:
+    """Run query through a server-side cursor and yield its rows page by page."""
+    async with get_db_pool().acquire() as conn:
+        # Server-side cursors only live inside a transaction
+        async with conn.transaction():
+            cursor = await conn.cursor(query, *params)
+            while True:
+                page = await cursor.fetch(page_size)
+                if not page:
+                    break
+                yield page
+                if len(page) < page_size:
+                    break
+
+
+async def _keyset_pages(
+    select: str,
+    time_column: str,
+    conditions: List[str],
+    params: List[Any],
+    page_size: int,
+    after: Optional[Tuple[datetime, str]] = None,
+) -> AsyncIterator[List[asyncpg.Record]]:
+    """
+    Yield the rows of select in (time_column, channel) order, one pooled query per page.
+
+    after is an exclusive (time, channel) keyset to start behind.
+    """
+    while True:
+        page_conditions = list(conditions)
+        page_params = list(params)
+        if after is not None:
+            page_params.extend(after)
+            # The plain >= lets TimescaleDB exclude chunks before the last page
+            page_conditions.append(f"{time_column} >= ${len(page_params) - 1}")
+            page_conditions.append(
+                f"({time_column}, COALESCE(measurement_channel, '')) > (${len(page_params) - 1}, ${len(page_params)})"
+            )
+
+        query = f"""
+            {select}
+            WHERE {' AND '.join(page_conditions)}
+            ORDER BY {time_column} ASC, COALESCE(measurement_channel, '') ASC
+            LIMIT {int(page_size)}
+        """
+        async with get_db_pool().acquire() as conn:
+            page = await conn.fetch(query, *page_params)
+
+        if not page:
+            break
+        yield page
+        if len(page) < page_size:
+            break
+        last = page[-1]
+        after = (last["measurement_timestamp"], last["measurement_channel"] or "")
+
 
 async def insert_measurements(measurements: List[Dict]) -> bool:
     """Insert multiple measurements into the database efficiently."""
@@ -185,49 +1052,188 @@ async def insert_measurements(measurements: List[Dict]) -> bool:
     return True
 
 
-async def crop_measurements_by_test(
-    test_id: int,
+async def get_measurement_chunks(
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> List[Dict]:
+    """Get the chunks of the measurements hypertable overlapping [start_time, end_time]."""
+    async with get_db_pool().acquire() as conn:
+        rows = await conn.fetch("""
+            SELECT chunk_schema, chunk_name, range_start, range_end, is_compressed, chunk_tablespace
+            FROM timescaledb_information.chunks
+            WHERE hypertable_schema = 'timeseries'
+              AND hypertable_name = 'measurements'
+              AND ($1::timestamptz IS NULL OR range_end > $1)
+              AND ($2::timestamptz IS NULL OR range_start <= $2)
+            ORDER BY range_start;
+        """, start_time, end_time)
+    return [dict(row) for row in rows]
+
+
+def _chunk_table(chunk: Dict) -> str:
+    return f'"{chunk["chunk_schema"]}"."{chunk["chunk_name"]}"'
+
+
+async def chunk_has_other_relations(chunk: Dict, test_relation_ids: List[int]) -> bool:
+    """
+    Check whether a chunk holds measurements of relations other than the given ones.
+
+    Other relation ids lie in the gaps between the sorted given ids; every
+    gap is probed with one range lookup on idx_measurements_test_relation
+    that stops at its first row, so a chunk holding only the given
+    relations is answered without reading its rows.
+    """
+    ids = sorted(set(test_relation_ids))
+    lower = [-2**31 - 1, *ids]
+    upper = [*ids, 2**31]
+    async with get_db_pool().acquire() as conn:
+        return await conn.fetchval(f"""
+            SELECT EXISTS (
+                SELECT 1
+                FROM unnest($1::bigint[], $2::bigint[]) AS gap(lower_id, upper_id)
+                WHERE EXISTS (
+                    SELECT 1 FROM {_chunk_table(chunk)}
+                    WHERE test_relation_id > gap.lower_id AND test_relation_id < gap.upper_id
+                    LIMIT 1
+                )
+                LIMIT 1
+            );
+        """, lower, upper)
+
+
+async def drop_measurement_chunk(chunk: Dict) -> Optional[int]:
+    """
+    Drop one whole chunk of the measurements hypertable.
+
+    Dropping is a metadata operation: no per-row WAL, no dead tuples.
+    Returns the chunk's estimated row count if it was dropped, else None.
+    """
+    async with get_db_pool().acquire() as conn:
+        rows = await conn.fetchval(
+            "SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE oid = $1::regclass;",
+            _chunk_table(chunk)
+        )
+        dropped = await conn.fetch("""
+            SELECT drop_chunks('timeseries.measurements', older_than => $2, newer_than => $1);
+        """, chunk["range_start"], chunk["range_end"])
+    return (rows or 0) if dropped else None
+
+
+async def delete_measurements_batch(
+    chunk: Dict,
+    test_relation_ids: List[int],
+    after: Optional[datetime] = None,
+    before: Optional[datetime] = None,
+    limit: int = 50_000,
+) -> int:
+    """
+    Delete up to limit measurements of the given relations from one chunk,
+    with timestamp > after and < before (unbounded if None).
+
+    Every call is its own short transaction, so deletes never hold locks or
+    WAL for long. Compressed chunks are deleted in one statement through
+    the hypertable (TimescaleDB decompresses the affected segments).
+    Returns the number of deleted rows.
+    """
+    params: List[Any] = [test_relation_ids]
+    conditions = ["test_relation_id = ANY($1::int[])"]
+    if after is not None:
+        params.append(after)
+        conditions.append(f"measurement_timestamp > ${len(params)}")
+    if before is not None:
+        params.append(before)
+        conditions.append(f"measurement_timestamp < ${len(params)}")
+
+    async with get_db_pool().acquire() as conn:
+        if chunk["is_compressed"]:
+            params += [chunk["range_start"], chunk["range_end"]]
+            result = await conn.execute(f"""
+                DELETE FROM timeseries.measurements
+                WHERE {' AND '.join(conditions)}
+                  AND measurement_timestamp >= ${len(params) - 1}
+                  AND measurement_timestamp < ${len(params)}
+            """, *params)
+        else:
+            params.append(limit)
+            table = _chunk_table(chunk)
+            result = await conn.execute(f"""
+                DELETE FROM {table}
+                WHERE ctid = ANY(ARRAY(
+                    SELECT ctid FROM {table}
+                    WHERE {' AND '.join(conditions)}
+                    LIMIT ${len(params)}
+                ))
+            """, *params)
+    return int(result.split()[-1]) if result else 0
+
+
+async def count_measurements_avg(
+    test_relation_ids: List[int],
     start_time: datetime,
     end_time: datetime
-) -> Dict[str, int]:
+) -> int:
+    """Count the aggregated rows of the given relations with start_time <= bucket < end_time."""
+    async with get_db_pool().acquire() as conn:
+        return await conn.fetchval("""
+            SELECT COUNT(*)
+            FROM timeseries.measurements_avg_10s
+            WHERE test_relation_id = ANY($1::int[])
+              AND bucket >= $2 AND bucket < $3
+        """, test_relation_ids, start_time, end_time)
+
+
+async def refresh_measurement_aggregates(
+    start_time: datetime,
+    end_time: datetime,
+    views: Sequence[str] = MEASUREMENT_AGGREGATES
+):
     """
-    Delete all measurements outside the specified time range for a test.
-    Deletes from both raw measurements and aggregated tables.
-    
-    Returns dict with counts of deleted rows from each table.
+    Re-materialize the 10s aggregates for start_time <= bucket < end_time.
+
+    Continuous aggregates cannot be modified with DELETE; after raw rows are
+    deleted (or chunks dropped) the affected buckets are recomputed from the
+    remaining data instead. Only buckets fully inside the window are
+    refreshed, so the bounds should lie on bucket borders.
     """
+    # refresh_continuous_aggregate refuses to run inside a transaction block,
+    # so it is sent as a plain simple-protocol statement without parameters
     async with get_db_pool().acquire() as conn:
-        async with conn.transaction():
-            # Get all test_relation_ids for this test
-            relation_ids = await conn.fetch("""
-                SELECT id FROM metadata.test_relations
-                WHERE test_id = $1
-            """, test_id)
-            
-            if not relation_ids:
-                return {"raw_deleted": 0, "avg_deleted": 0}
-            
-            relation_id_list = [row['id'] for row in relation_ids]
-            
-            # Delete from raw measurements table (outside the range)
-            raw_deleted = await conn.execute("""
-                DELETE FROM timeseries.measurements
-                WHERE test_relation_id = ANY($1::int[])
-                  AND (measurement_timestamp < $2 OR measurement_timestamp > $3)
-            """, relation_id_list, start_time, end_time)
-            
-            # Delete from aggregated table (outside the range)
-            avg_deleted = await conn.execute("""
-                DELETE FROM timeseries.measurements_avg_10s
+        for view in views:
+            await conn.execute(
+                f"CALL refresh_continuous_aggregate('{view}', "
+                f"'{start_time.isoformat()}'::timestamptz, '{end_time.isoformat()}'::timestamptz);",
+                timeout=AGGREGATE_REFRESH_TIMEOUT_SECONDS
+            )
+
+
+async def delete_measurement_aggregates_materialized(
+    test_relation_ids: List[int],
+    start_time: datetime,
+    end_time: datetime
+) -> int:
+    """
+    Delete aggregated rows of the given relations with start_time <= bucket < end_time
+    directly from the materialization hypertables of the 10s aggregates.
+
+    Only for ranges whose raw data was dropped by retention: there a refresh
+    would wipe every relation's buckets, not just these relations'.
+    Returns the number of rows deleted from measurements_avg_10s.
+    """
+    deleted = {}
+    async with get_db_pool().acquire() as conn:
+        for view in MEASUREMENT_AGGREGATES:
+            schema, name = view.split(".")
+            table = await conn.fetchval("""
+                SELECT format('%I.%I', materialization_hypertable_schema, materialization_hypertable_name)
+                FROM timescaledb_information.continuous_aggregates
+                WHERE view_schema = $1 AND view_name = $2;
+            """, schema, name)
+            if table is None:
+                continue
+            result = await conn.execute(f"""
+                DELETE FROM {table}
                 WHERE test_relation_id = ANY($1::int[])
-                  AND (bucket < $2 OR bucket > $3)
-            """, relation_id_list, start_time, end_time)
-            
-            # Parse the DELETE command results to get row counts
-            raw_count = int(raw_deleted.split()[-1]) if raw_deleted else 0
-            avg_count = int(avg_deleted.split()[-1]) if avg_deleted else 0
-            
-            return {
-                "raw_deleted": raw_count,
-                "avg_deleted": avg_count
-            }
+                  AND bucket >= $2 AND bucket < $3
+            """, test_relation_ids, start_time, end_time)
+            deleted[view] = int(result.split()[-1]) if result else 0
+    return deleted.get(MEASUREMENT_AGGREGATES[0], 0)
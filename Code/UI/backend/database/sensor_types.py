@@ -7,6 +7,8 @@ This module contains all sensor type management functions for PostgreSQL.
 from datetime import datetime
 from typing import Any, List, Dict, Optional
 
+from .cache import cached, invalidates
+
 # Global variable for database pool - will be set by main database module
 _db_pool = None
 
@@ -26,6 +28,7 @@ def get_db_pool():
 # ASYNC SENSOR TYPE FUNCTIONS (PostgreSQL)
 # ================================
 
+@cached("sensor_types")
 async def get_all_sensor_types() -> List[Dict]:
     """Get all sensor types."""
     async with get_db_pool().acquire() as conn:
@@ -37,6 +40,7 @@ async def get_all_sensor_types() -> List[Dict]:
     return [dict(row) for row in rows]
 
 
+@cached("sensor_types")
 async def get_sensor_type_by_id(type_id: int) -> Optional[Dict]:
     """Get sensor type by ID."""
     async with get_db_pool().acquire() as conn:
@@ -48,6 +52,7 @@ async def get_sensor_type_by_id(type_id: int) -> Optional[Dict]:
     return dict(row) if row else None
 
 
+@invalidates("sensor_types")
 async def create_sensor_type(sensor_type: Dict) -> Optional[Dict]:
     """Create a new sensor type."""
     fields = []
@@ -80,6 +85,7 @@ async def create_sensor_type(sensor_type: Dict) -> Optional[Dict]:
         return await get_sensor_type_by_id(new_id)
 
 
+@invalidates("sensor_types")
 async def update_sensor_type(type_id: int, type_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """Update sensor type."""
     fields = []
@@ -106,6 +112,7 @@ async def update_sensor_type(type_id: int, type_data: Dict[str, Any]) -> Optiona
 
 
 
+@invalidates("sensor_types", "sensors")
 async def delete_sensor_type(type_id: int) -> bool:
     """
     Delete sensor type and mark related sensors as invisible.
@@ -6,6 +6,8 @@ This module contains all sensor management functions for PostgreSQL.
 
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
+
+from .cache import cached, invalidates
 import json
 
 # Global variable for database pool - will be set by main database module
@@ -27,6 +29,7 @@ def get_db_pool():
 # ASYNC SENSOR FUNCTIONS (PostgreSQL)
 # ================================
 
+@cached("sensors", "sensor_types", "test_relations")
 async def get_all_sensors() -> List[Dict]:
     """
     Fetch all sensors from the database, ordered by creation time descending.
@@ -68,6 +71,7 @@ async def get_all_sensors() -> List[Dict]:
     return sensors
 
 
+@cached("sensors", "sensor_types", "test_relations")
 async def get_sensor_by_id(sensor_id: int) -> Optional[Dict]:
     """Get sensor by ID with sensor_is_active flag and sensor type details."""
     async with get_db_pool().acquire() as conn:
@@ -102,6 +106,7 @@ async def get_sensor_by_id(sensor_id: int) -> Optional[Dict]:
         return sensor
 
 
+@invalidates("sensors")
 async def create_sensor(sensor_data):
     """Create a new sensor."""
     
@@ -135,6 +140,7 @@ async def create_sensor(sensor_data):
         return await get_sensor_by_id(new_id)
 
 
+@invalidates("sensors")
 async def update_sensor(sensor_id: int, sensor_data: dict) -> bool:
     """Update an existing sensor."""
     
@@ -163,6 +169,7 @@ async def update_sensor(sensor_id: int, sensor_data: dict) -> bool:
         return await conn.fetchrow(query, *values)
 
 
+@invalidates("sensors", "test_relations")
 async def delete_sensor(sensor_id: int) -> bool:
     """Delete a sensor."""
     async with get_db_pool().acquire() as conn:
@@ -180,6 +187,7 @@ async def delete_sensor(sensor_id: int) -> bool:
 
 # get all sensors with specific type id
 
+@cached("sensors")
 async def get_sensors_by_sensor_type(sensor_type_id: int) -> List[Dict]:
     """Get all sensors of a specific type."""
     async with get_db_pool().acquire() as conn:
@@ -209,6 +217,7 @@ async def get_tests_for_sensor(sensor_id: int):
         return [dict(row) for row in test_rows]
 
 
+@invalidates("sensors")
 async def mark_sensor_offline(timeout_seconds: int = 60) -> int:
     """
     Mark sensors as offline if they haven't sent data within the timeout period.
@@ -0,0 +1,207 @@
+"""
+Database operations for measurement storage: chunking, compression and retention.
+"""
+
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional
+
+# Compressing or moving a chunk can take far longer than the pool's command_timeout
+CHUNK_OPERATION_TIMEOUT_SECONDS = 3600
+
+# Global variable for database pool - will be set by main database module
+_db_pool = None
+
+def set_db_pool(pool):
+    """Set the database connection pool."""
+    global _db_pool
+    _db_pool = pool
+
+def get_db_pool():
+    """Get the database connection pool."""
+    if _db_pool is None:
+        raise RuntimeError("Database pool not initialized. Call set_db_pool() first.")
+    return _db_pool
+
+
+async def set_measurement_chunk_interval(interval: timedelta):
+    """Set the chunk interval of the measurements hypertable (applies to new chunks)."""
+    async with get_db_pool().acquire() as conn:
+        await conn.execute(
+            "SELECT set_chunk_time_interval('timeseries.measurements', $1::interval);", interval
+        )
+
+
+async def set_measurement_compression_policy(compress_after: Optional[timedelta]):
+    """
+    Replace the compression policy of the measurements hypertable.
+
+    Chunks are compressed once their newest possible row is older than
+    compress_after. None removes the policy (already compressed chunks stay
+    compressed).
+    """
+    async with get_db_pool().acquire() as conn:
+        async with conn.transaction():
+            await conn.execute(
+                "SELECT remove_compression_policy('timeseries.measurements', if_exists => true);"
+            )
+            if compress_after is not None:
+                await conn.execute(
+                    "SELECT add_compression_policy('timeseries.measurements', compress_after => $1::interval);",
+                    compress_after
+                )
+
+
+async def get_measurement_storage_stats() -> Optional[Dict]:
+    """Chunk counts and on-disk size of the measurements hypertable before and after compression."""
+    async with get_db_pool().acquire() as conn:
+        row = await conn.fetchrow("""
+            SELECT
+                s.total_chunks,
+                s.number_compressed_chunks AS compressed_chunks,
+                s.before_compression_total_bytes,
+                s.after_compression_total_bytes,
+                hypertable_size('timeseries.measurements') AS total_bytes
+            FROM hypertable_compression_stats('timeseries.measurements') s;
+        """)
+    return dict(row) if row else None
+
+
+async def chunk_holds_only_archived_tests(chunk: Dict) -> bool:
+    """
+    Check whether every measurement in a chunk belongs to an archived test.
+
+    Relations without a test (detached, being deleted) count as not archived.
+    On compressed chunks the DISTINCT is answered from the segmentby column.
+    """
+    table = f'"{chunk["chunk_schema"]}"."{chunk["chunk_name"]}"'
+    async with get_db_pool().acquire() as conn:
+        return await conn.fetchval(f"""
+            SELECT NOT EXISTS (
+                SELECT 1
+                FROM (SELECT DISTINCT test_relation_id FROM {table}) m
+                LEFT JOIN metadata.test_relations r ON r.id = m.test_relation_id
+                LEFT JOIN metadata.tests t ON t.id = r.test_id
+                WHERE t.test_status IS DISTINCT FROM 'archived'
+            );
+        """)
+
+
+async def get_chunk_relation_ids(chunk: Dict) -> List[int]:
+    """Get the test relations with measurements in a chunk."""
+    table = f'"{chunk["chunk_schema"]}"."{chunk["chunk_name"]}"'
+    async with get_db_pool().acquire() as conn:
+        rows = await conn.fetch(f"SELECT DISTINCT test_relation_id FROM {table};")
+    return [row["test_relation_id"] for row in rows]
+
+
+async def record_raw_retention(range_start: datetime, range_end: datetime, rows_dropped: int):
+    """Record a time range whose raw measurements were dropped by retention."""
+    async with get_db_pool().acquire() as conn:
+        await conn.execute("""
+            INSERT INTO metadata.measurement_retention (range_start, range_end, rows_dropped)
+            VALUES ($1, $2, $3);
+        """, range_start, range_end, rows_dropped)
+
+
+async def get_raw_retention_ranges(
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None
+) -> List[Dict]:
+    """Get the retained (raw dropped) ranges overlapping [start_time, end_time], oldest first."""
+    async with get_db_pool().acquire() as conn:
+        rows = await conn.fetch("""
+            SELECT range_start, range_end
+            FROM metadata.measurement_retention
+            WHERE ($1::timestamptz IS NULL OR range_end > $1)
+              AND ($2::timestamptz IS NULL OR range_start <= $2)
+            ORDER BY range_start;
+        """, start_time, end_time)
+    return [dict(row) for row in rows]
+
+
+async def get_pending_compression_runs() -> List[Dict]:
+    """Get ended test runs whose chunks were not compressed yet, oldest first."""
+    async with get_db_pool().acquire() as conn:
+        rows = await conn.fetch("""
+            SELECT id, test_id, run_started_at, run_ended_at
+            FROM metadata.test_runs
+            WHERE run_ended_at IS NOT NULL AND run_compressed_at IS NULL
+            ORDER BY run_ended_at;
+        """)
+    return [dict(row) for row in rows]
+
+
+async def mark_run_compressed(run_id: int):
+    """Mark a test run's chunks as compressed (and moved)."""
+    async with get_db_pool().acquire() as conn:
+        await conn.execute(
+            "UPDATE metadata.test_runs SET run_compressed_at = now() WHERE id = $1;", run_id
+        )
+
+
+async def chunk_has_running_tests(chunk: Dict) -> bool:
+    """Check whether a chunk holds measurements of a currently running test."""
+    table = f'"{chunk["chunk_schema"]}"."{chunk["chunk_name"]}"'
+    async with get_db_pool().acquire() as conn:
+        return await conn.fetchval(f"""
+            SELECT EXISTS (
+                SELECT 1 FROM {table}
+                WHERE test_relation_id = ANY(ARRAY(
+                    SELECT r.id
+                    FROM metadata.test_relations r
+                    JOIN metadata.tests t ON t.id = r.test_id
+                    WHERE t.test_status = 'running'
+                ))
+            );
+        """)
+
+
+async def compress_measurement_chunk(chunk: Dict):
+    """Compress one chunk of the measurements hypertable (no-op if it already is)."""
+    table = f'"{chunk["chunk_schema"]}"."{chunk["chunk_name"]}"'
+    async with get_db_pool().acquire() as conn:
+        await conn.execute(
+            "SELECT compress_chunk($1::regclass, if_not_compressed => true);", table,
+            timeout=CHUNK_OPERATION_TIMEOUT_SECONDS
+        )
+
+
+async def move_measurement_chunk(chunk: Dict, tablespace: str):
+    """Move one uncompressed chunk and its indexes to another tablespace."""
+    table = f'"{chunk["chunk_schema"]}"."{chunk["chunk_name"]}"'
+    async with get_db_pool().acquire() as conn:
+        await conn.execute("""
+            SELECT move_chunk(
+                chunk => $1::regclass,
+                destination_tablespace => $2,
+                index_destination_tablespace => $2
+            );
+        """, table, tablespace, timeout=CHUNK_OPERATION_TIMEOUT_SECONDS)
+
+
+async def get_pending_aggregate_backfills() -> List[Dict]:
+    """Get the continuous aggregates whose historic buckets are not materialized yet."""
+    async with get_db_pool().acquire() as conn:
+        rows = await conn.fetch("""
+            SELECT view_name, backfill_end, backfilled_until
+            FROM metadata.aggregate_backfill
+            WHERE completed_at IS NULL
+            ORDER BY view_name;
+        """)
+    return [dict(row) for row in rows]
+
+
+async def update_aggregate_backfill(view_name: str, backfilled_until: datetime):
+    """Record that an aggregate's buckets before backfilled_until are materialized."""
+    async with get_db_pool().acquire() as conn:
+        await conn.execute("""
+            UPDATE metadata.aggregate_backfill SET backfilled_until = $2 WHERE view_name = $1;
+        """, view_name, backfilled_until)
+
+
+async def complete_aggregate_backfill(view_name: str):
+    """Mark an aggregate's backfill as done."""
+    async with get_db_pool().acquire() as conn:
+        await conn.execute("""
+            UPDATE metadata.aggregate_backfill SET completed_at = now() WHERE view_name = $1;
+        """, view_name)
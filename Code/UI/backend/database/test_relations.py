@@ -1,6 +1,8 @@
 
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
+
+from .cache import cached, invalidates
 import json
 
 # Global variable for database pool - will be set by main database module
@@ -18,6 +20,7 @@ def get_db_pool():
     return _db_pool
 
 
+@cached("test_relations", "sensors", "sensor_types")
 async def get_test_relations(test_id: int) -> List[Dict]:
     """Get all test relations for a given test ID."""
     async with get_db_pool().acquire() as conn:
@@ -42,6 +45,7 @@ async def get_test_relations(test_id: int) -> List[Dict]:
         """, test_id)
     return [dict(row) for row in rows]
 
+@invalidates("test_relations")
 async def add_test_relation(test_id: int, relation_data: Dict) -> Optional[Dict]:
     """
     Safely add a new test relation.
@@ -88,6 +92,7 @@ async def add_test_relation(test_id: int, relation_data: Dict) -> Optional[Dict]
         return await get_test_relation_by_id(row["id"])
 
 
+@invalidates("test_relations")
 async def delete_test_relation_for_single_relation_id(relation_id: int) -> bool:
     """Delete a test relation by ID."""
     async with get_db_pool().acquire() as conn:
@@ -97,6 +102,7 @@ async def delete_test_relation_for_single_relation_id(relation_id: int) -> bool:
         )
     return result.endswith("DELETE 1")
 
+@invalidates("test_relations")
 async def delete_all_test_relations_for_single_test(test_id: int) -> bool:
     """Delete all test relations for a given test ID."""
     async with get_db_pool().acquire() as conn:
@@ -107,6 +113,7 @@ async def delete_all_test_relations_for_single_test(test_id: int) -> bool:
     return result.startswith("DELETE")
 
 
+@cached("test_relations")
 async def get_test_relation_by_id(relation_id: int) -> Optional[Dict]:
     """Fetch one test relation by ID."""
     async with get_db_pool().acquire() as conn:
@@ -117,6 +124,7 @@ async def get_test_relation_by_id(relation_id: int) -> Optional[Dict]:
     return dict(row) if row else None
 
 
+@invalidates("test_relations")
 async def update_test_relation(relation_id: int, relation_data: Dict) -> Optional[dict]:
     """
     Update fields in a test_relation record.
@@ -170,23 +178,33 @@ async def check_test_relation_has_measurements(relation_id: int) -> Dict[str, An
     }
 
 
-async def delete_test_relation_with_measurements(relation_id: int) -> bool:
+@invalidates("test_relations")
+async def detach_test_relation(relation_id: int) -> Optional[Dict]:
     """
-    Delete a test_relation and all its measurements.
-    Returns True if successful.
+    Detach a test_relation from its test ahead of deleting its measurements.
+
+    The relation disappears from the test (and frees the test/sensor pair)
+    right away; a delete job removes its measurements and then the row
+    itself. Returns the relation as it was, or None if it does not exist.
     """
     async with get_db_pool().acquire() as conn:
-        async with conn.transaction():
-            # Delete all measurements for this test_relation
-            await conn.execute(
-                "DELETE FROM timeseries.measurements WHERE test_relation_id = $1;",
-                relation_id
-            )
-            
-            # Delete the test_relation itself
-            result = await conn.execute(
-                "DELETE FROM metadata.test_relations WHERE id = $1;",
-                relation_id
-            )
-            
-            return result.endswith("DELETE 1")
\ No newline at end of file
+        row = await conn.fetchrow("""
+            UPDATE metadata.test_relations AS tr
+            SET test_id = NULL, active = false
+            FROM metadata.test_relations AS old
+            WHERE tr.id = $1 AND old.id = tr.id
+            RETURNING old.*;
+        """, relation_id)
+    return dict(row) if row else None
+
+
+@invalidates("test_relations")
+async def bump_data_generation(relation_ids: List[int]) -> None:
+    """Mark stored measurements of relations as changed by a crop or retention (part of their ETag)."""
+    async with get_db_pool().acquire() as conn:
+        await conn.execute("""
+            UPDATE metadata.test_relations
+            SET data_generation = data_generation + 1,
+                data_changed_at = now()
+            WHERE id = ANY($1::int[]);
+        """, relation_ids)
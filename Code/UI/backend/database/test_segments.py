@@ -2,7 +2,7 @@
 Database operations for test segments.
 """
 
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 # Global variable for database pool - will be set by main database module
 _db_pool = None
@@ -19,23 +19,41 @@ def get_db_pool():
     return _db_pool
 
 
+async def _queue_segment_stats(conn, segment_ids: List[int]):
+    """Queue the statistics of segments whose range is new or changed (see metadata.segment_stats_jobs)."""
+    await conn.execute("""
+        INSERT INTO metadata.segment_stats_jobs (segment_id, queued_at)
+        SELECT unnest($1::int[]), now()
+        ON CONFLICT (segment_id) DO UPDATE
+        SET status = 'queued', error = NULL, attempts = 0, queued_at = now();
+    """, segment_ids)
+
+
 async def create_segment(test_id: int, segment_name: str, start_time: datetime, end_time: datetime) -> dict:
-    """Create a new test segment."""
+    """Create a new test segment and queue its statistics."""
     async with get_db_pool().acquire() as conn:
         query = """
             INSERT INTO metadata.test_segments (test_id, segment_name, start_time, end_time, created_at, last_modified_at)
             VALUES ($1, $2, $3, $4, NOW(), NOW())
-            RETURNING id, test_id, segment_name, start_time, end_time, created_at, last_modified_at
+            RETURNING id, test_id, segment_name, start_time, end_time, segment_source, phase, created_at, last_modified_at
         """
-        result = await conn.fetchrow(query, test_id, segment_name, start_time, end_time)
+        async with conn.transaction():
+            result = await conn.fetchrow(query, test_id, segment_name, start_time, end_time)
+            await _queue_segment_stats(conn, [result["id"]])
         return dict(result)
 
 
+async def queue_segment_stats(segment_ids: List[int]):
+    """Queue the statistics of segments (see metadata.segment_stats_jobs)."""
+    async with get_db_pool().acquire() as conn:
+        await _queue_segment_stats(conn, segment_ids)
+
+
 async def get_segments_by_test_id(test_id: int) -> List[dict]:
     """Get all segments for a specific test."""
     async with get_db_pool().acquire() as conn:
         query = """
-            SELECT id, test_id, segment_name, start_time, end_time, created_at, last_modified_at
+            SELECT id, test_id, segment_name, start_time, end_time, segment_source, phase, created_at, last_modified_at
             FROM metadata.test_segments
             WHERE test_id = $1
             ORDER BY start_time ASC
@@ -48,7 +66,7 @@ async def get_segment_by_id(segment_id: int) -> Optional[dict]:
     """Get a specific segment by ID."""
     async with get_db_pool().acquire() as conn:
         query = """
-            SELECT id, test_id, segment_name, start_time, end_time, created_at, last_modified_at
+            SELECT id, test_id, segment_name, start_time, end_time, segment_source, phase, created_at, last_modified_at
             FROM metadata.test_segments
             WHERE id = $1
         """
@@ -58,7 +76,7 @@ async def get_segment_by_id(segment_id: int) -> Optional[dict]:
 
 async def update_segment(segment_id: int, segment_name: Optional[str] = None, 
                         start_time: Optional[datetime] = None, end_time: Optional[datetime] = None) -> dict:
-    """Update a test segment."""
+    """Update a test segment; a changed time range queues its statistics again."""
     async with get_db_pool().acquire() as conn:
         # Build dynamic update query
         updates = []
@@ -81,16 +99,21 @@ async def update_segment(segment_id: int, segment_name: Optional[str] = None,
             param_count += 1
         
         updates.append(f"last_modified_at = NOW()")
+        # An edited candidate is adopted: detection no longer replaces it
+        updates.append("segment_source = 'manual'")
         params.append(segment_id)
         
         query = f"""
             UPDATE metadata.test_segments
             SET {', '.join(updates)}
             WHERE id = ${param_count}
-            RETURNING id, test_id, segment_name, start_time, end_time, created_at, last_modified_at
+            RETURNING id, test_id, segment_name, start_time, end_time, segment_source, phase, created_at, last_modified_at
         """
         
-        result = await conn.fetchrow(query, *params)
+        async with conn.transaction():
+            result = await conn.fetchrow(query, *params)
+            if result and (start_time is not None or end_time is not None):
+                await _queue_segment_stats(conn, [result["id"]])
         return dict(result)
 
 
@@ -100,3 +123,48 @@ async def delete_segment(segment_id: int) -> bool:
         query = "DELETE FROM metadata.test_segments WHERE id = $1"
         result = await conn.execute(query, segment_id)
         return result == "DELETE 1"
+
+
+async def replace_detected_segments(
+    test_id: int,
+    segments: List[Dict],
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None
+) -> List[dict]:
+    """
+    Replace a test's detected segments overlapping [start_time, end_time] with new ones.
+
+    segments are dicts with segment_name, start_time, end_time and phase.
+    Manual segments are kept. The statistics of the new segments are
+    queued. Returns the inserted segments.
+    """
+    conditions = ["test_id = $1", "segment_source = 'detected'"]
+    params: List[Any] = [test_id]
+    if start_time is not None:
+        params.append(start_time)
+        conditions.append(f"end_time > ${len(params)}")
+    if end_time is not None:
+        params.append(end_time)
+        conditions.append(f"start_time < ${len(params)}")
+
+    async with get_db_pool().acquire() as conn:
+        async with conn.transaction():
+            await conn.execute(f"""
+                DELETE FROM metadata.test_segments
+                WHERE {' AND '.join(conditions)}
+            """, *params)
+
+            results = await conn.fetch("""
+                INSERT INTO metadata.test_segments
+                    (test_id, segment_name, start_time, end_time, segment_source, phase, created_at, last_modified_at)
+                SELECT $1, s.segment_name, s.start_time, s.end_time, 'detected', s.phase, NOW(), NOW()
+                FROM unnest($2::text[], $3::timestamptz[], $4::timestamptz[], $5::text[])
+                    AS s(segment_name, start_time, end_time, phase)
+                RETURNING id, test_id, segment_name, start_time, end_time, segment_source, phase, created_at, last_modified_at
+            """, test_id,
+                [seg["segment_name"] for seg in segments],
+                [seg["start_time"] for seg in segments],
+                [seg["end_time"] for seg in segments],
+                [seg["phase"] for seg in segments])
+            await _queue_segment_stats(conn, [row["id"] for row in results])
+    return [dict(row) for row in sorted(results, key=lambda row: row["start_time"])]
@@ -1,6 +1,8 @@
 
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
+
+from .cache import cached, invalidates
 import json
 
 # Global variable for database pool - will be set by main database module
@@ -22,6 +24,7 @@ def get_db_pool():
 # ASYNC TESTS FUNCTIONS (PostgreSQL)
 # ================================
 
+@cached("tests", "test_relations", "machines", "machine_types")
 async def get_all_tests() -> List[Dict]:
     """Get all tests with sensor count and machine information."""
     async with get_db_pool().acquire() as conn:
@@ -47,6 +50,7 @@ async def get_all_tests() -> List[Dict]:
         """)
     return [dict(row) for row in rows]
 
+@cached("tests", "test_relations", "machines", "machine_types")
 async def get_test_by_id(test_id: int) -> Optional[Dict]:
     """Get test by ID with sensor count."""
     async with get_db_pool().acquire() as conn:
@@ -72,6 +76,27 @@ async def get_test_by_id(test_id: int) -> Optional[Dict]:
         """, test_id)
     return dict(row) if row else None
 
+async def get_tests_by_ids(test_ids: List[int]) -> List[Dict]:
+    """Get several tests with their machine and machine type, in the order of test_ids."""
+    async with get_db_pool().acquire() as conn:
+        rows = await conn.fetch("""
+            SELECT
+                t.id,
+                t.test_name,
+                t.test_status,
+                t.machine_id,
+                m.machine_name,
+                m.machine_type_id,
+                mt.machine_type_name
+            FROM unnest($1::int[]) WITH ORDINALITY AS ids(id, position)
+            JOIN metadata.tests AS t ON t.id = ids.id
+            LEFT JOIN metadata.machines AS m ON t.machine_id = m.id
+            LEFT JOIN metadata.machine_types AS mt ON m.machine_type_id = mt.id
+            ORDER BY ids.position;
+        """, test_ids)
+    return [dict(row) for row in rows]
+
+@invalidates("tests")
 async def create_test(test_data: Dict) -> Optional[Dict]:
     """Create a new test."""
     if not test_data:
@@ -112,6 +137,7 @@ async def create_test(test_data: Dict) -> Optional[Dict]:
 
         return await get_test_by_id(new_id)
 
+@invalidates("tests")
 async def update_test_metadata(test_id: int, test_data: Dict) -> Optional[Dict]:
     """Update test."""
     fields = []
@@ -153,39 +179,48 @@ async def update_test_metadata(test_id: int, test_data: Dict) -> Optional[Dict]:
     async with get_db_pool().acquire() as conn:
         return await conn.fetchrow(query, *values)
 
-async def delete_test(test_id: int) -> bool:
+@invalidates("tests")
+async def mark_test_deleting(test_id: int) -> Optional[List[int]]:
     """
-    Delete test by ID only if it's in idle status.
-    Deletes all related data: test_relations, test_runs, and measurements.
+    Mark a test for deletion, only if it's in idle status.
+    Returns the test_relation_ids whose measurements must be deleted,
+    or None if the test does not exist.
     """
     async with get_db_pool().acquire() as conn:
         async with conn.transaction():
             # Check if test exists and is idle
             test = await conn.fetchrow(
-                "SELECT test_status FROM metadata.tests WHERE id = $1;",
+                "SELECT test_status FROM metadata.tests WHERE id = $1 FOR UPDATE;",
                 test_id
             )
             
             if not test:
-                return False
+                return None
             
             if test['test_status'] != 'idle':
                 raise ValueError(f"Cannot delete test: test status is '{test['test_status']}', must be 'idle'")
             
-            # Get all test_relation_ids for this test
+            await conn.execute(
+                "UPDATE metadata.tests SET test_status = 'deleting' WHERE id = $1;",
+                test_id
+            )
+            
             relation_ids = await conn.fetch(
                 "SELECT id FROM metadata.test_relations WHERE test_id = $1;",
                 test_id
             )
-            
-            # Delete measurements for all test relations
-            if relation_ids:
-                relation_id_list = [row['id'] for row in relation_ids]
-                await conn.execute(
-                    "DELETE FROM timeseries.measurements WHERE test_relation_id = ANY($1::int[]);",
-                    relation_id_list
-                )
-            
+            return [row['id'] for row in relation_ids]
+
+
+@invalidates("tests", "test_relations")
+async def delete_test(test_id: int) -> bool:
+    """
+    Delete test by ID with its test_relations and test_runs.
+    Measurements must already be removed by a delete job; deleting them
+    here through the foreign key cascade would be one huge transaction.
+    """
+    async with get_db_pool().acquire() as conn:
+        async with conn.transaction():
             # Delete test relations
             await conn.execute(
                 "DELETE FROM metadata.test_relations WHERE test_id = $1;",
@@ -213,6 +248,7 @@ async def delete_test(test_id: int) -> bool:
 
 
 # Additional test functions
+@invalidates("tests", "test_relations")
 async def start_test(test_id: int) -> Optional[int]:
     """
     Atomically:
@@ -249,6 +285,7 @@ async def start_test(test_id: int) -> Optional[int]:
         return row["id"]
 
 
+@invalidates("tests", "test_relations")
 async def stop_test(test_id: int) -> Optional[int]:
     """
     Atomically:
@@ -0,0 +1,38 @@
+-- =====================================================
+--  Export Jobs Schema
+-- =====================================================
+-- Persistent queue for measurement export jobs. Jobs survive backend
+-- restarts and are claimed by the export workers in priority order.
+
+CREATE TABLE IF NOT EXISTS metadata.export_jobs (
+    id UUID PRIMARY KEY,
+    test_id INT NOT NULL REFERENCES metadata.tests(id) ON DELETE CASCADE,
+    data_type TEXT NOT NULL,
+    time_range TEXT NOT NULL,
+    segment_id INT REFERENCES metadata.test_segments(id) ON DELETE SET NULL,
+    priority INT NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',   -- queued, processing, completed, failed, expired
+    progress INT NOT NULL DEFAULT 0,
+    relations JSONB,                          -- per-relation progress
+    filename TEXT,
+    filepath TEXT,
+    rows BIGINT,
+    error TEXT,
+    attempts INT NOT NULL DEFAULT 0,
+    created_at TIMESTAMPTZ DEFAULT now(),
+    started_at TIMESTAMPTZ,
+    completed_at TIMESTAMPTZ,
+    expires_at TIMESTAMPTZ
+);
+
+-- Queue order for claiming jobs
+CREATE INDEX IF NOT EXISTS idx_export_jobs_queue
+    ON metadata.export_jobs (priority DESC, created_at)
+    WHERE status = 'queued';
+
+-- Artifact eviction
+CREATE INDEX IF NOT EXISTS idx_export_jobs_expires_at
+    ON metadata.export_jobs (expires_at)
+    WHERE status = 'completed';
+
+COMMENT ON TABLE metadata.export_jobs IS 'Queue and results of measurement export jobs';
@@ -0,0 +1,13 @@
+-- =====================================================
+--  Export Cache Schema
+-- =====================================================
+-- Exports are content-addressed: cache_key hashes the export parameters
+-- and a version stamp of the exported data, so an identical request for
+-- unchanged data reuses the finished (or running) job and its file.
+
+ALTER TABLE metadata.export_jobs
+    ADD COLUMN IF NOT EXISTS cache_key TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_export_jobs_cache_key
+    ON metadata.export_jobs (cache_key, created_at DESC)
+    WHERE cache_key IS NOT NULL;
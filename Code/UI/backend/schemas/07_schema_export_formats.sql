@@ -0,0 +1,7 @@
+-- =====================================================
+--  Export Formats Schema
+-- =====================================================
+-- Output format of an export job (parquet, csv, feather, hdf5, wav).
+
+ALTER TABLE metadata.export_jobs
+    ADD COLUMN IF NOT EXISTS format TEXT NOT NULL DEFAULT 'parquet';
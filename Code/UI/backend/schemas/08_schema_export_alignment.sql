@@ -0,0 +1,8 @@
+-- =====================================================
+--  Export Alignment Schema
+-- =====================================================
+-- Time alignment settings of an export job (ExportAlignment as JSON,
+-- NULL for an exact timestamp join).
+
+ALTER TABLE metadata.export_jobs
+    ADD COLUMN IF NOT EXISTS alignment JSONB;
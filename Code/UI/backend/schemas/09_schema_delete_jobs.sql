@@ -0,0 +1,30 @@
+-- =====================================================
+--  Delete Jobs Schema
+-- =====================================================
+-- Background jobs that delete measurements (crop, test and test relation
+-- deletion) chunk by chunk instead of in one long transaction.
+
+CREATE TABLE IF NOT EXISTS metadata.delete_jobs (
+    id UUID PRIMARY KEY,
+    kind TEXT NOT NULL,                      -- crop, test, relation
+    test_id INT,                             -- no FK: 'test' jobs delete the test
+    relation_ids INT[] NOT NULL,
+    keep_start TIMESTAMPTZ,                  -- crop: kept range
+    keep_end TIMESTAMPTZ,
+    status TEXT NOT NULL DEFAULT 'queued',   -- queued, processing, completed, failed
+    progress INT NOT NULL DEFAULT 0,
+    raw_deleted BIGINT NOT NULL DEFAULT 0,
+    avg_deleted BIGINT NOT NULL DEFAULT 0,
+    chunks_dropped INT NOT NULL DEFAULT 0,
+    error TEXT,
+    attempts INT NOT NULL DEFAULT 0,
+    created_at TIMESTAMPTZ DEFAULT now(),
+    started_at TIMESTAMPTZ,
+    completed_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_delete_jobs_queue
+    ON metadata.delete_jobs (created_at)
+    WHERE status = 'queued';
+
+COMMENT ON TABLE metadata.delete_jobs IS 'Queue and results of chunked measurement deletions';
@@ -0,0 +1,31 @@
+-- =====================================================
+--  Measurement Compression and Raw Data Retention
+-- =====================================================
+-- Native compression of the measurements hypertable. Rows are grouped per
+-- sensor channel (segmentby) and stored in time order (orderby), which is
+-- how every query reads them: one relation, a time range, ordered by time.
+--
+-- The chunk interval, the compression policy and raw data retention are
+-- configured from the backend environment (app/maintenance/storage.py).
+
+ALTER TABLE timeseries.measurements SET (
+    timescaledb.compress,
+    timescaledb.compress_segmentby = 'test_relation_id, measurement_channel',
+    timescaledb.compress_orderby = 'measurement_timestamp'
+);
+
+-- Time ranges whose raw chunks were dropped by the retention of archived
+-- tests. The 10s aggregate of these ranges is the only remaining copy of the
+-- data, so it must never be refreshed from the (now empty) raw table.
+CREATE TABLE IF NOT EXISTS metadata.measurement_retention (
+    id SERIAL PRIMARY KEY,
+    range_start TIMESTAMPTZ NOT NULL,
+    range_end TIMESTAMPTZ NOT NULL,
+    rows_dropped BIGINT NOT NULL DEFAULT 0,
+    dropped_at TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_measurement_retention_range
+    ON metadata.measurement_retention (range_start, range_end);
+
+COMMENT ON TABLE metadata.measurement_retention IS 'Raw measurement ranges dropped by retention; only aggregates remain';
@@ -0,0 +1,14 @@
+-- =====================================================
+--  Test Lifecycle Compression
+-- =====================================================
+-- Ended test runs whose measurement chunks were not compressed (and moved
+-- to the cold tablespace) yet form the queue of the lifecycle job in
+-- app/maintenance/storage.py. Runs that ended before this file was applied
+-- are processed as well.
+
+ALTER TABLE metadata.test_runs
+    ADD COLUMN IF NOT EXISTS run_compressed_at TIMESTAMPTZ;
+
+CREATE INDEX IF NOT EXISTS idx_test_runs_compression_pending
+    ON metadata.test_runs (run_ended_at)
+    WHERE run_ended_at IS NOT NULL AND run_compressed_at IS NULL;
@@ -0,0 +1,22 @@
+-- =====================================================
+--  Spectrum Cache Schema
+-- =====================================================
+-- Welch spectra of test segments. One row per relation, segment and
+-- analysis parameters; data_key stamps the segment bounds and the state of
+-- its measurements, so a cached spectrum is recomputed after new data,
+-- crops, deletes or an edited segment.
+
+CREATE TABLE IF NOT EXISTS metadata.spectrum_cache (
+    test_relation_id INT NOT NULL REFERENCES metadata.test_relations(id) ON DELETE CASCADE,
+    segment_id INT NOT NULL REFERENCES metadata.test_segments(id) ON DELETE CASCADE,
+    params_key TEXT NOT NULL,
+    data_key TEXT NOT NULL,
+    result BYTEA NOT NULL,                   -- JSON encoded response body
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (test_relation_id, segment_id, params_key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_spectrum_cache_segment
+    ON metadata.spectrum_cache (segment_id);
+
+COMMENT ON TABLE metadata.spectrum_cache IS 'Cached Welch power spectral densities per test segment';
@@ -0,0 +1,43 @@
+-- =====================================================
+--  Spectrogram Tiles Schema
+-- =====================================================
+-- STFT tile pyramids of test relations (see app/analysis/spectrogram.py).
+-- metadata.spectrograms describes one relation's pyramid and doubles as
+-- the queue of the background job computing it; the tiles are float16 dB
+-- arrays of tile_frames x frequency_bins values.
+
+CREATE TABLE IF NOT EXISTS metadata.spectrograms (
+    test_relation_id INT PRIMARY KEY REFERENCES metadata.test_relations(id) ON DELETE CASCADE,
+    status TEXT NOT NULL DEFAULT 'queued',   -- queued, processing, completed, failed
+    progress INT NOT NULL DEFAULT 0,
+    origin TIMESTAMPTZ,                      -- start of frame 0
+    sample_rate_hz DOUBLE PRECISION,
+    nperseg INT,
+    hop INT,
+    tile_frames INT,
+    frequency_bins INT,
+    levels INT,
+    frames INT,
+    channels TEXT[],
+    error TEXT,
+    attempts INT NOT NULL DEFAULT 0,
+    queued_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    started_at TIMESTAMPTZ,
+    completed_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_spectrograms_queue
+    ON metadata.spectrograms (queued_at)
+    WHERE status = 'queued';
+
+CREATE TABLE IF NOT EXISTS metadata.spectrogram_tiles (
+    test_relation_id INT NOT NULL REFERENCES metadata.spectrograms(test_relation_id) ON DELETE CASCADE,
+    measurement_channel TEXT NOT NULL,
+    level SMALLINT NOT NULL,
+    tile_index INT NOT NULL,
+    data BYTEA NOT NULL,                     -- little-endian float16, time major
+    PRIMARY KEY (test_relation_id, measurement_channel, level, tile_index)
+);
+
+COMMENT ON TABLE metadata.spectrograms IS 'STFT tile pyramids per test relation and their computation queue';
+COMMENT ON TABLE metadata.spectrogram_tiles IS 'Spectrogram tiles (float16 dB) per relation, channel and zoom level';
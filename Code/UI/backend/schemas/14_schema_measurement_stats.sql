@@ -0,0 +1,58 @@
+-- =====================================================
+--  Vibration Statistics Aggregate
+-- =====================================================
+-- Additive 10s statistics for RMS, standard deviation and crest factor.
+-- Sums and counts of any set of buckets combine exactly, so coarser
+-- buckets and whole-range statistics are derived from this aggregate
+-- without reading raw data:
+--
+--   mean  = sum_value / num_samples
+--   rms   = sqrt(sum_squares / num_samples)
+--   std   = sqrt(sum_squares / num_samples - mean^2)
+--   crest = max_abs_value / rms
+--
+-- Continuous aggregates cannot get new columns, and measurements_avg_10s
+-- cannot be rebuilt because it is the only copy of retention-dropped ranges,
+-- so this is a separate aggregate with the same bucketing and refresh policy.
+-- Buckets from before this file was applied are materialized in the
+-- background by app/maintenance/storage.py (see aggregate_backfill).
+COMMIT;  -- continuous aggregates cannot be created inside a transaction block
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS timeseries.measurements_stats_10s
+WITH (timescaledb.continuous) AS
+SELECT
+    time_bucket(INTERVAL '10 seconds', measurement_timestamp) AS bucket,
+    test_relation_id,
+    measurement_channel,
+    SUM(measurement_value) AS sum_value,
+    SUM(measurement_value * measurement_value) AS sum_squares,
+    MAX(ABS(measurement_value)) AS max_abs_value,
+    COUNT(measurement_value) AS num_samples
+FROM timeseries.measurements
+GROUP BY bucket, test_relation_id, measurement_channel
+WITH NO DATA;
+
+CREATE INDEX IF NOT EXISTS idx_measurements_stats_10s_time
+  ON timeseries.measurements_stats_10s (test_relation_id, bucket DESC);
+
+SELECT add_continuous_aggregate_policy(
+    'timeseries.measurements_stats_10s',
+    start_offset => INTERVAL '2 minutes',
+    end_offset => INTERVAL '10 seconds',
+    schedule_interval => INTERVAL '10 seconds',
+    if_not_exists => true
+);
+
+-- One-time materialization of continuous aggregates created on a database
+-- that already holds measurements: buckets before backfill_end are refreshed
+-- slice by slice, backfilled_until records the progress across restarts.
+CREATE TABLE IF NOT EXISTS metadata.aggregate_backfill (
+    view_name TEXT PRIMARY KEY,
+    backfill_end TIMESTAMPTZ NOT NULL,
+    backfilled_until TIMESTAMPTZ,
+    completed_at TIMESTAMPTZ
+);
+
+INSERT INTO metadata.aggregate_backfill (view_name, backfill_end)
+VALUES ('timeseries.measurements_stats_10s', now())
+ON CONFLICT (view_name) DO NOTHING;
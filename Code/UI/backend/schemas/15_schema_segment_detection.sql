@@ -0,0 +1,14 @@
+-- Automatically detected wash-cycle phases (see app/analysis/phases.py).
+-- Detection writes candidate segments with segment_source 'detected'; they
+-- are replaced when detection runs again. Editing a candidate turns it into
+-- a 'manual' segment, which detection never touches.
+ALTER TABLE metadata.test_segments
+    ADD COLUMN IF NOT EXISTS segment_source TEXT NOT NULL DEFAULT 'manual'
+        CHECK (segment_source IN ('manual', 'detected')),
+    ADD COLUMN IF NOT EXISTS phase TEXT
+        CHECK (phase IN ('fill', 'wash', 'rinse', 'drain', 'spin'));
+
+CREATE INDEX IF NOT EXISTS idx_test_segments_detected
+    ON metadata.test_segments(test_id) WHERE segment_source = 'detected';
+
+COMMENT ON TABLE metadata.test_segments IS 'Stores user-defined and detected time segments for test analysis';
@@ -0,0 +1,22 @@
+-- =====================================================
+--  Anomaly Events Schema
+-- =====================================================
+-- Events of the streaming anomaly detectors of the MQTT worker (see
+-- mqtt_worker/anomaly.py): one row per excursion of a relation's channel,
+-- at the sample that started it.
+
+CREATE TABLE IF NOT EXISTS metadata.anomaly_events (
+    id BIGSERIAL PRIMARY KEY,
+    test_relation_id INT NOT NULL REFERENCES metadata.test_relations(id) ON DELETE CASCADE,
+    measurement_channel TEXT,
+    detector TEXT NOT NULL,                -- ewma, limit
+    event_timestamp TIMESTAMPTZ NOT NULL,
+    measurement_value DOUBLE PRECISION NOT NULL,
+    score DOUBLE PRECISION NOT NULL,       -- ewma: z-score, limit: value / limit
+    baseline DOUBLE PRECISION,             -- ewma: running mean
+    deviation DOUBLE PRECISION,            -- ewma: running standard deviation
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_anomaly_events_relation_time
+    ON metadata.anomaly_events (test_relation_id, event_timestamp);
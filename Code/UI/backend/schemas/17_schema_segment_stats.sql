@@ -0,0 +1,48 @@
+-- =====================================================
+--  Segment Statistics Schema
+-- =====================================================
+-- Precomputed per-segment statistics (see app/analysis/segment_stats.py).
+-- metadata.segment_stats_jobs is the queue of the background job and holds
+-- the data_key (segment bounds + measurement version) the stored
+-- statistics were computed from. Creating or editing a segment queues it,
+-- crops queue the segments of the cropped test.
+
+CREATE TABLE IF NOT EXISTS metadata.segment_stats_jobs (
+    segment_id INT PRIMARY KEY REFERENCES metadata.test_segments(id) ON DELETE CASCADE,
+    status TEXT NOT NULL DEFAULT 'queued',   -- queued, processing, completed, failed
+    data_key TEXT,
+    error TEXT,
+    attempts INT NOT NULL DEFAULT 0,
+    queued_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    started_at TIMESTAMPTZ,
+    completed_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_segment_stats_jobs_queue
+    ON metadata.segment_stats_jobs (queued_at)
+    WHERE status = 'queued';
+
+CREATE TABLE IF NOT EXISTS metadata.segment_stats (
+    segment_id INT NOT NULL REFERENCES metadata.test_segments(id) ON DELETE CASCADE,
+    test_relation_id INT NOT NULL REFERENCES metadata.test_relations(id) ON DELETE CASCADE,
+    measurement_channel TEXT NOT NULL,       -- 'value' for measurements without a channel
+    num_samples BIGINT NOT NULL,
+    mean_value DOUBLE PRECISION,
+    rms_value DOUBLE PRECISION,
+    std_value DOUBLE PRECISION,
+    min_value DOUBLE PRECISION,
+    max_value DOUBLE PRECISION,
+    p05_value DOUBLE PRECISION,
+    p50_value DOUBLE PRECISION,
+    p95_value DOUBLE PRECISION,
+    dominant_frequency_hz DOUBLE PRECISION,  -- peak of the Welch spectrum, NULL if too few samples
+    PRIMARY KEY (segment_id, test_relation_id, measurement_channel)
+);
+
+-- Segments that existed before
+INSERT INTO metadata.segment_stats_jobs (segment_id)
+SELECT id FROM metadata.test_segments
+ON CONFLICT (segment_id) DO NOTHING;
+
+COMMENT ON TABLE metadata.segment_stats IS 'Statistics per test segment, relation and channel';
+COMMENT ON TABLE metadata.segment_stats_jobs IS 'Computation queue and state of the segment statistics';
@@ -0,0 +1,23 @@
+-- =====================================================
+--  Test Comparison Cache Schema
+-- =====================================================
+-- Overlaid series and envelopes of several tests of one machine type (see
+-- app/analysis/comparison.py). params_key identifies the tests and the
+-- alignment; data_key stamps the alignment origins and the state of the
+-- measurements of every test, so a comparison is recomputed after new
+-- data, crops, deletes or re-detected phases. Entries not used for a while
+-- are pruned when new ones are stored.
+
+CREATE TABLE IF NOT EXISTS metadata.comparison_cache (
+    params_key TEXT PRIMARY KEY,
+    test_ids INT[] NOT NULL,
+    data_key TEXT NOT NULL,
+    result BYTEA NOT NULL,                   -- JSON encoded response body
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    last_used_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_comparison_cache_last_used
+    ON metadata.comparison_cache (last_used_at);
+
+COMMENT ON TABLE metadata.comparison_cache IS 'Cached cross-test comparisons per machine type';
@@ -0,0 +1,58 @@
+-- =====================================================
+--  Metadata Change Notifications
+-- =====================================================
+-- Every committed change of a cached metadata table sends its table name
+-- on the metadata_changed channel; the backend's metadata cache listens
+-- and drops what it read from that table (see database/cache.py).
+-- Trigger arguments name columns whose changes are not announced: the
+-- heartbeat touches sensor_last_seen every few seconds.
+
+CREATE OR REPLACE FUNCTION metadata.notify_metadata_change()
+RETURNS trigger AS $$
+DECLARE
+    ignored TEXT[];
+BEGIN
+    ignored := COALESCE(TG_ARGV, '{}'::TEXT[]);
+    IF TG_OP = 'UPDATE' AND to_jsonb(OLD) - ignored = to_jsonb(NEW) - ignored THEN
+        RETURN NULL;
+    END IF;
+    -- Identical notifications of one transaction are delivered once
+    PERFORM pg_notify('metadata_changed', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS notify_metadata_change ON metadata.sensors;
+CREATE TRIGGER notify_metadata_change
+    AFTER INSERT OR UPDATE OR DELETE ON metadata.sensors
+    FOR EACH ROW EXECUTE FUNCTION metadata.notify_metadata_change('sensor_last_seen');
+
+DROP TRIGGER IF EXISTS notify_metadata_change ON metadata.sensor_types;
+CREATE TRIGGER notify_metadata_change
+    AFTER INSERT OR UPDATE OR DELETE ON metadata.sensor_types
+    FOR EACH ROW EXECUTE FUNCTION metadata.notify_metadata_change();
+
+DROP TRIGGER IF EXISTS notify_metadata_change ON metadata.machines;
+CREATE TRIGGER notify_metadata_change
+    AFTER INSERT OR UPDATE OR DELETE ON metadata.machines
+    FOR EACH ROW EXECUTE FUNCTION metadata.notify_metadata_change();
+
+DROP TRIGGER IF EXISTS notify_metadata_change ON metadata.machine_types;
+CREATE TRIGGER notify_metadata_change
+    AFTER INSERT OR UPDATE OR DELETE ON metadata.machine_types
+    FOR EACH ROW EXECUTE FUNCTION metadata.notify_metadata_change();
+
+DROP TRIGGER IF EXISTS notify_metadata_change ON metadata.machine_type_sensor_templates;
+CREATE TRIGGER notify_metadata_change
+    AFTER INSERT OR UPDATE OR DELETE ON metadata.machine_type_sensor_templates
+    FOR EACH ROW EXECUTE FUNCTION metadata.notify_metadata_change();
+
+DROP TRIGGER IF EXISTS notify_metadata_change ON metadata.tests;
+CREATE TRIGGER notify_metadata_change
+    AFTER INSERT OR UPDATE OR DELETE ON metadata.tests
+    FOR EACH ROW EXECUTE FUNCTION metadata.notify_metadata_change();
+
+DROP TRIGGER IF EXISTS notify_metadata_change ON metadata.test_relations;
+CREATE TRIGGER notify_metadata_change
+    AFTER INSERT OR UPDATE OR DELETE ON metadata.test_relations
+    FOR EACH ROW EXECUTE FUNCTION metadata.notify_metadata_change();
@@ -0,0 +1,12 @@
+-- =====================================================
+--  Measurement Data Generation
+-- =====================================================
+-- Counts the changes of a relation's stored measurements other than
+-- appended samples: crops and raw data retention. Together with the last
+-- timestamp and the sample count it makes up the ETag of measurement
+-- responses (see app/core/http_cache.py); data_changed_at is the
+-- Last-Modified time of such a change.
+
+ALTER TABLE metadata.test_relations
+    ADD COLUMN IF NOT EXISTS data_generation INT NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS data_changed_at TIMESTAMPTZ;
@@ -164,12 +164,20 @@ export const measurementsAPI = {
     api.get(`${measurementsAPIprefix}/avg/${testRelationId}`, { params }),
   getSensorDataRaw: (testRelationId, params = {}) =>
     api.get(`${measurementsAPIprefix}/raw/${testRelationId}`, { params }),
+  getTestData: (testId, params = {}) =>
+    api.get(`${measurementsAPIprefix}/test/${testId}`, { params }),
+  getSensorStats: (testRelationId, params = {}) =>
+    api.get(`${measurementsAPIprefix}/stats/${testRelationId}`, { params }),
+  getSensorStatsSummary: (testRelationId, params = {}) =>
+    api.get(`${measurementsAPIprefix}/stats/${testRelationId}/summary`, { params }),
   cropMeasurements: (testId, startTime, endTime) =>
     api.post(`${measurementsAPIprefix}/crop`, {
       test_id: testId,
       start_time: startTime,
       end_time: endTime
     }),
+  getDeleteStatus: (jobId) =>
+    api.get(`${measurementsAPIprefix}/delete/status/${jobId}`),
   exportMeasurements: (params) =>
     api.post(`${measurementsAPIprefix}/export`, params),
   getExportStatus: (jobId) =>
@@ -186,6 +194,45 @@ export const testSegmentsAPI = {
   create: (segment) => api.post(testSegmentsAPIprefix, segment),
   update: (segmentId, segment) => api.put(`${testSegmentsAPIprefix}/${segmentId}`, segment),
   delete: (segmentId) => api.delete(`${testSegmentsAPIprefix}/${segmentId}`),
+  detect: (testId, params = {}) => api.post(`${testSegmentsAPIprefix}/test/${testId}/detect`, null, { params }),
+  getStats: (segmentId) => api.get(`${testSegmentsAPIprefix}/${segmentId}/stats`),
+  getTestStats: (testId) => api.get(`${testSegmentsAPIprefix}/test/${testId}/stats`),
+};
+
+// Live API (WebSocket push of running tests' samples)
+const liveAPIprefix = '/api/live';
+export const liveAPI = {
+  connect: (relationIds, rateHz) => {
+    const url = new URL(`${liveAPIprefix}/ws`, new URL(API_BASE_URL, window.location.href));
+    url.protocol = url.protocol === 'https:' ? 'wss:' : 'ws:';
+    url.searchParams.set('relation_ids', relationIds.join(','));
+    if (rateHz) {
+      url.searchParams.set('rate_hz', rateHz);
+    }
+    return new WebSocket(url.toString());
+  },
+};
+
+// Analysis API (spectra and spectrogram tiles)
+const analysisAPIprefix = '/api/analysis';
+export const analysisAPI = {
+  getSpectrum: (relationId, params) =>
+    api.get(`${analysisAPIprefix}/spectrum/${relationId}`, { params }),
+  getSpectrogram: (relationId) => api.get(`${analysisAPIprefix}/spectrogram/${relationId}`),
+  computeSpectrogram: (relationId) => api.post(`${analysisAPIprefix}/spectrogram/${relationId}`),
+  // Tile body: little-endian float16 dB values, tile_frames x frequency_bins (204 = no data)
+  getSpectrogramTile: (relationId, level, tileIndex, channel) =>
+    api.get(`${analysisAPIprefix}/spectrogram/${relationId}/tiles/${level}/${tileIndex}`, {
+      params: channel ? { channel } : undefined,
+      responseType: 'arraybuffer',
+    }),
+  getAnomalies: (relationId, params = {}) =>
+    api.get(`${analysisAPIprefix}/anomalies/${relationId}`, { params }),
+  getTestAnomalies: (testId, params = {}) =>
+    api.get(`${analysisAPIprefix}/anomalies/test/${testId}`, { params }),
+  // params: align ('start' | 'phase'), phase, occurrence, offset_seconds, duration_seconds, points
+  compareTests: (testIds, params = {}) =>
+    api.get(`${analysisAPIprefix}/compare`, { params: { ...params, test_ids: testIds.join(',') } }),
 };
 
 // MQTT API
@@ -253,12 +253,24 @@ const TestAnalysis = () => {
         endTime.toISOString()
       );
       
+      // The crop runs as a background delete job; wait for it to finish
+      const jobId = response.data.job_id;
+      let status;
+      do {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        status = (await measurementsAPI.getDeleteStatus(jobId)).data;
+      } while (status.status === 'queued' || status.status === 'processing');
+      
+      if (status.status === 'failed') {
+        throw new Error(status.error || 'Delete job failed');
+      }
+      
       alert(
         `✅ Crop successful!\n\n` +
         `Deleted:\n` +
-        `- ${response.data.raw_deleted} raw measurements\n` +
-        `- ${response.data.avg_deleted} aggregated measurements\n` +
-        `- Total: ${response.data.total_deleted} measurements`
+        `- ${status.raw_deleted} raw measurements\n` +
+        `- ${status.avg_deleted} aggregated measurements\n` +
+        `- Total: ${status.total_deleted} measurements`
       );
       
       // Reload data
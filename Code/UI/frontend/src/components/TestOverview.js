@@ -18,7 +18,13 @@ import {
   WifiOff,
   Sparkles
 } from 'lucide-react';
-import { testsAPI, testRelationsAPI, sensorsAPI, machinesAPI, measurementsAPI } from '../api';
+import { testsAPI, testRelationsAPI, sensorsAPI, machinesAPI, measurementsAPI, liveAPI } from '../api';
+
+// Live raw view of running tests: samples per second per sensor, redraw
+// interval and visible time window
+const LIVE_RATE_HZ = 20;
+const LIVE_FLUSH_MS = 500;
+const LIVE_WINDOW_MS = 3 * 60 * 1000;
 
 const TestOverview = () => {
   const { testId } = useParams();
@@ -185,6 +191,7 @@ const TestOverview = () => {
           mode: 'lines',
           name: baseTraceName,
           sensorId: sensor.id,
+          channel: channel,
           line: { color: color, width: 1 },
           hovertemplate: `<b>%{fullData.name}</b><br>` +
             `Time: %{x}<br>` +
@@ -302,6 +309,70 @@ const TestOverview = () => {
     return traces; // Return traces instead of updating state here
   }, [buildTracesFromMeasurements, aggregationType]);
 
+  // Append pushed live samples to the raw traces, keeping the last LIVE_WINDOW_MS
+  const appendLiveSamples = useCallback((traces, messages) => {
+    const rows = {};
+    messages.forEach(message => {
+      message.timestamps.forEach((ts, i) => {
+        message.channels.forEach((channel, c) => {
+          const key = `${message.relation_id}_${channel || 'main'}`;
+          if (!rows[key]) rows[key] = [];
+          rows[key].push({
+            measurement_timestamp: ts,
+            measurement_channel: channel,
+            measurement_value: message.values[i][c]
+          });
+        });
+      });
+    });
+
+    const updated = traces.map(trace => {
+      const key = `${trace.sensorId}_${trace.channel}`;
+      if (!rows[key]) return trace;
+      // Skip samples the initial fetch already returned
+      const last = trace.x.length > 0 ? trace.x[trace.x.length - 1] : -Infinity;
+      const newRows = rows[key].filter(r => r.measurement_timestamp > last);
+      delete rows[key];
+      const x = [...trace.x, ...newRows.map(r => new Date(r.measurement_timestamp))];
+      const y = [...trace.y, ...newRows.map(r => r.measurement_value)];
+      const start = x.findIndex(t => t >= x[x.length - 1] - LIVE_WINDOW_MS);
+      return { ...trace, x: x.slice(start), y: y.slice(start) };
+    });
+
+    // Channels without a trace yet (e.g. the test just started)
+    const selected = Array.from(selectedSensorIds);
+    Object.keys(rows).forEach(key => {
+      const sensor = testSensors.find(s => s.id === parseInt(key));
+      if (sensor) {
+        updated.push(...buildTracesFromMeasurements(sensor, rows[key], selected.indexOf(sensor.id), 'raw'));
+      }
+    });
+    return updated;
+  }, [selectedSensorIds, testSensors, buildTracesFromMeasurements]);
+
+  // Push live samples into the raw view while the test is running
+  useEffect(() => {
+    if (test?.test_status !== 'running' || dataMode !== 'raw' || selectedSensorIds.size === 0) return;
+
+    let pending = [];
+    const socket = liveAPI.connect(Array.from(selectedSensorIds), LIVE_RATE_HZ);
+    socket.onmessage = (event) => pending.push(JSON.parse(event.data));
+    socket.onerror = (event) => console.error('Live stream error:', event);
+
+    // Redraw in batches, not per message
+    const flush = setInterval(() => {
+      if (pending.length === 0) return;
+      const messages = pending;
+      pending = [];
+      setPlotData(prev => appendLiveSamples(prev, messages));
+    }, LIVE_FLUSH_MS);
+
+    return () => {
+      clearInterval(flush);
+      socket.close();
+    };
+  }, [test, dataMode, selectedSensorIds, appendLiveSamples]);
+
   // Handle sensor toggle with current data mode
   const handleSensorToggle = async (sensorId, event) => {
     const multi = event && (event.ctrlKey || event.metaKey);
@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import { testsAPI, machinesAPI, machineTypesAPI } from '../api';
-import { Plus, Edit, Square, Eye, Play, Search, Filter, X, Calendar, Clock, Trash2 } from 'lucide-react';
+import { Plus, Edit, Square, Eye, Play, Search, Filter, X, Calendar, Clock, Trash2, Archive, ArchiveRestore } from 'lucide-react';
 
 const Tests = () => {
   const [tests, setTests] = useState([]);
@@ -176,6 +176,21 @@ const Tests = () => {
     }
   };
 
+  const handleArchiveTest = async (testId, archive) => {
+    const message = archive
+      ? 'Archive this test?\n\nRaw measurements of archived tests may be removed after the retention period; the 10s aggregates are kept.'
+      : 'Restore this test from the archive?';
+    if (window.confirm(message)) {
+      try {
+        await testsAPI.update(testId, { test_status: archive ? 'archived' : 'idle' });
+        loadData();
+      } catch (error) {
+        console.error('Error archiving test:', error);
+        alert('Failed to update test: ' + (error.response?.data?.detail || error.message));
+      }
+    }
+  };
+
   const handleDeleteTest = async (testId, testName, testStatus) => {
     if (testStatus !== 'idle') {
       alert(`Cannot delete test "${testName}":\nTest must be in idle status.\nCurrent status: ${testStatus}`);
@@ -204,7 +219,7 @@ const Tests = () => {
 
     try {
       await testsAPI.delete(testId);
-      alert(`✅ Test "${testName}" and all related data deleted successfully.`);
+      alert(`✅ Deletion of test "${testName}" started. Its data is removed in the background.`);
       loadData();
     } catch (error) {
       console.error('Error deleting test:', error);
@@ -299,6 +314,7 @@ const Tests = () => {
               <option value="running">Running</option>
               <option value="completed">Completed</option>
               <option value="failed">Failed</option>
+              <option value="archived">Archived</option>
             </select>
           </div>
 
@@ -529,6 +545,15 @@ const Tests = () => {
                             <Play size={14} />
                           </button>
                         )}
+                        {(test.test_status === 'idle' || test.test_status === 'archived') && (
+                          <button
+                            className="btn btn-secondary btn-sm"
+                            onClick={() => handleArchiveTest(test.id, test.test_status === 'idle')}
+                            title={test.test_status === 'idle' ? 'Archive Test' : 'Restore Test'}
+                          >
+                            {test.test_status === 'idle' ? <Archive size={14} /> : <ArchiveRestore size={14} />}
+                          </button>
+                        )}
                         {test.test_status === 'running' && (
                           <button
                             className="btn btn-danger btn-sm"
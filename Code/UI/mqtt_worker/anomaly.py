@@ -0,0 +1,167 @@
+"""
+Streaming anomaly detectors of the ingest worker.
+
+Every detector keeps a constant amount of state per (test_relation_id,
+channel) and is fed one channel column of a sensor payload at a time, so
+detection adds a single tight loop per column to the ingest path and no
+database round trip. Detectors return anomaly events; the worker publishes
+them on anomalies/<test_relation_id> and stores them in
+metadata.anomaly_events together with the next buffer flush.
+
+A detector reports an excursion once, when it starts, and stays quiet
+until the signal is back to normal.
+
+Adding a detector: subclass AnomalyDetector and register it in DETECTORS;
+ANOMALY_DETECTORS selects the active ones.
+"""
+
+import math
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# (test_relation_id, channel)
+DetectorKey = Tuple[int, str]
+
+
+class AnomalyDetector(ABC):
+    """Base class of the streaming detectors."""
+
+    name = "base"
+
+    def __init__(self):
+        self.state: Dict[DetectorKey, list] = {}
+
+    @abstractmethod
+    def update(self, key: DetectorKey, timestamps: List[float], values: List[float]) -> List[Dict]:
+        """Feed one channel's samples of a payload (time order); returns new anomaly events."""
+
+    def retain(self, relation_ids: Iterable[int]):
+        """Drop the state of relations that are no longer recorded."""
+        keep = set(relation_ids)
+        for key in [key for key in self.state if key[0] not in keep]:
+            del self.state[key]
+
+    def event(self, key: DetectorKey, timestamp_ms: float, value: float, score: float,
+              baseline: Optional[float] = None, deviation: Optional[float] = None) -> Dict:
+        return {
+            "test_relation_id": key[0],
+            "channel": key[1],
+            "detector": self.name,
+            "timestamp_ms": timestamp_ms,
+            "value": value,
+            "score": score,
+            "baseline": baseline,
+            "deviation": deviation,
+        }
+
+
+class EWMADetector(AnomalyDetector):
+    """
+    Z-score against an exponentially weighted mean and variance.
+
+    State per key: [mean, variance, samples seen, in excursion]. Samples
+    beyond the threshold are clipped to it before they update the
+    statistics, so a spike does not inflate the variance it is judged by,
+    while a lasting level change still becomes the new baseline. An
+    excursion ends once |z| falls below half the threshold.
+    """
+
+    name = "ewma"
+
+    def __init__(self, alpha: float = 0.05, threshold: float = 8.0, warmup: int = 200):
+        super().__init__()
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+
+    def update(self, key: DetectorKey, timestamps: List[float], values: List[float]) -> List[Dict]:
+        state = self.state.get(key)
+        if state is None:
+            state = self.state[key] = [values[0] if values else 0.0, 0.0, 0, False]
+        mean, var, seen, active = state
+        alpha, threshold, warmup = self.alpha, self.threshold, self.warmup
+        events = []
+
+        for ts, x in zip(timestamps, values):
+            if seen >= warmup:
+                # Floor: a perfectly constant signal must not turn every tiny change into an anomaly
+                std = max(math.sqrt(var), 1e-3 * abs(mean), 1e-6)
+                z = (x - mean) / std
+                if abs(z) >= threshold:
+                    if not active:
+                        active = True
+                        events.append(self.event(key, ts, x, z, mean, std))
+                    x = mean + math.copysign(threshold * std, z)
+                elif active and abs(z) < threshold / 2:
+                    active = False
+            seen += 1
+            d = x - mean
+            mean += alpha * d
+            var = (1 - alpha) * (var + alpha * d * d)
+
+        state[:] = mean, var, seen, active
+        return events
+
+
+class LimitDetector(AnomalyDetector):
+    """
+    Absolute limits per channel name, e.g. overcurrent or overspeed.
+
+    State per key: [in excursion]. score is value / limit.
+    """
+
+    name = "limit"
+
+    def __init__(self, limits: Dict[str, float]):
+        super().__init__()
+        self.limits = limits
+
+    def update(self, key: DetectorKey, timestamps: List[float], values: List[float]) -> List[Dict]:
+        limit = self.limits.get(key[1])
+        if limit is None:
+            return []
+        state = self.state.setdefault(key, [False])
+        active = state[0]
+        events = []
+        for ts, x in zip(timestamps, values):
+            if abs(x) > limit:
+                if not active:
+                    active = True
+                    events.append(self.event(key, ts, x, x / limit))
+            elif active:
+                active = False
+        state[0] = active
+        return events
+
+
+def _parse_limits(spec: str) -> Dict[str, float]:
+    """'RPM:1600,current:10' -> {'RPM': 1600.0, 'current': 10.0}"""
+    limits = {}
+    for item in spec.split(","):
+        channel, _, limit = item.rpartition(":")
+        if channel.strip() and limit.strip():
+            limits[channel.strip()] = float(limit)
+    return limits
+
+
+DETECTORS = {
+    "ewma": lambda: EWMADetector(
+        alpha=float(os.environ.get("ANOMALY_EWMA_ALPHA", 0.05)),
+        threshold=float(os.environ.get("ANOMALY_Z_THRESHOLD", 8)),
+        warmup=int(os.environ.get("ANOMALY_WARMUP_SAMPLES", 200)),
+    ),
+    "limit": lambda: LimitDetector(_parse_limits(os.environ.get("ANOMALY_LIMITS", ""))),
+}
+
+
+def build_detectors(names: str) -> List[AnomalyDetector]:
+    """Instantiate the comma separated detectors of ANOMALY_DETECTORS."""
+    detectors = []
+    for name in (n.strip() for n in names.split(",")):
+        if not name:
+            continue
+        if name not in DETECTORS:
+            raise ValueError(f"Unknown anomaly detector '{name}', available: {list(DETECTORS)}")
+        detectors.append(DETECTORS[name]())
+    return detectors
@@ -1,12 +1,16 @@
 import asyncio
 import json
+import math
 import os
 import time
+from itertools import repeat
 from typing import Dict, Optional, List, Tuple
 
 import asyncpg
 import paho.mqtt.client as mqtt
 
+from anomaly import build_detectors
+
 
 # =========================
 # ENV CONFIG
@@ -24,6 +28,18 @@ MAX_BUFFER_SIZE = int(os.environ.get("MAX_BUFFER_SIZE", 5000))
 
 HEARTBEAT_OFFLINE_SEC = int(os.environ.get("HEARTBEAT_OFFLINE_SEC", 30))
 
+# Live stream: decimated samples per test relation for the backend's
+# WebSocket/SSE subscribers, published on live/<test_relation_id>.
+# 0 disables publishing.
+LIVE_PUBLISH_HZ = float(os.environ.get("LIVE_PUBLISH_HZ", 50))
+LIVE_TOPIC_PREFIX = "live"
+
+# Streaming anomaly detection (see anomaly.py): comma separated detectors,
+# empty disables. Events are published on anomalies/<test_relation_id>
+# and stored in metadata.anomaly_events.
+ANOMALY_DETECTORS = os.environ.get("ANOMALY_DETECTORS", "ewma")
+ANOMALY_TOPIC_PREFIX = "anomalies"
+
 
 DEAD_LETTER_FILE = "/app/dead_letters.log"
 
@@ -45,6 +61,13 @@ class MQTTWorker:
         # buffering: list of tuples (timestamp_ms, test_relation_id, channel, value)
         self.buffer: List[Tuple[float, int, str, float]] = []
 
+        # test_relation_id -> timestamp_ms of the last sample published live
+        self.live_last_ts: Dict[int, float] = {}
+
+        # streaming anomaly detectors and their events waiting for the next flush
+        self.detectors = build_detectors(ANOMALY_DETECTORS)
+        self.anomaly_buffer: List[Dict] = []
+
         # asyncio loop reference
         self.loop: Optional[asyncio.AbstractEventLoop] = None
 
@@ -133,6 +156,8 @@ class MQTTWorker:
         new_map = {row["sensor_id"]: row["id"] for row in rows}
         if new_map != self.bindings:
             print("[DB] Active bindings updated:", new_map)
+            for detector in self.detectors:
+                detector.retain(new_map.values())
         self.bindings = new_map
 
     # =========================
@@ -140,6 +165,8 @@ class MQTTWorker:
     # =========================
 
     async def flush_buffer(self):
+        await self.flush_anomalies()
+
         if not self.buffer:
             return
 
@@ -173,6 +200,107 @@ class MQTTWorker:
             for rec in records_to_insert:
                 self.dead_letter("flush_buffer", rec)
 
+    async def flush_anomalies(self):
+        if not self.anomaly_buffer:
+            return
+
+        events = self.anomaly_buffer
+        self.anomaly_buffer = []
+
+        sql = """
+        INSERT INTO metadata.anomaly_events (
+            test_relation_id,
+            measurement_channel,
+            detector,
+            event_timestamp,
+            measurement_value,
+            score,
+            baseline,
+            deviation
+        )
+        VALUES ($1, $2, $3, to_timestamp($4::double precision / 1000), $5, $6, $7, $8)
+        """
+
+        try:
+            async with self.db_pool.acquire() as conn:
+                await conn.executemany(sql, [
+                    (e["test_relation_id"], e["channel"], e["detector"], e["timestamp_ms"],
+                     e["value"], e["score"], e["baseline"], e["deviation"])
+                    for e in events
+                ])
+            print(f"[DB] Stored {len(events)} anomaly events")
+        except Exception as e:
+            print(f"[ERROR] Anomaly flush failed: {e}, sending {len(events)} events to dead-letter")
+            for event in events:
+                self.dead_letter("flush_anomalies", event)
+
+    # =========================
+    # ANOMALY DETECTION
+    # =========================
+
+    def detect_anomalies(self, test_relation_id: int, channel: str, timestamps: list, values: list):
+        """Run the detectors over one channel column of a payload and publish their events."""
+        if not all(map(math.isfinite, values)):
+            finite = [(ts, v) for ts, v in zip(timestamps, values) if math.isfinite(v)]
+            timestamps = [ts for ts, _ in finite]
+            values = [v for _, v in finite]
+            if not values:
+                return
+
+        key = (test_relation_id, channel)
+        for detector in self.detectors:
+            try:
+                events = detector.update(key, timestamps, values)
+            except Exception as e:
+                print(f"[ERROR] Anomaly detector {detector.name}:", e)
+                continue
+            for event in events:
+                print(f"[ANOMALY] {event}")
+                self.mqtt.publish(f"{ANOMALY_TOPIC_PREFIX}/{test_relation_id}", json.dumps(event), qos=1)
+                self.anomaly_buffer.append(event)
+
+    # =========================
+    # LIVE STREAM
+    # =========================
+
+    def publish_live(self, test_relation_id: int, timestamps: list, values: list, channels: list):
+        """
+        Publish the samples of one payload decimated to LIVE_PUBLISH_HZ.
+
+        QoS 0: a lost live message is only a gap in a dashboard, the samples
+        themselves are stored through the buffer.
+        """
+        if LIVE_PUBLISH_HZ <= 0:
+            return
+
+        interval_ms = 1000.0 / LIVE_PUBLISH_HZ
+        last_ts = self.live_last_ts.get(test_relation_id, float("-inf"))
+        live_timestamps = []
+        live_values = []
+        for ts, sample_values in zip(timestamps, values):
+            if not isinstance(ts, (int, float)):
+                continue
+            if ts < last_ts - 1000:
+                # Sensor clock jumped back (restart, NTP resync)
+                last_ts = float("-inf")
+            if ts < last_ts + interval_ms:
+                continue
+            live_timestamps.append(ts)
+            live_values.append(sample_values)
+            last_ts = ts
+
+        if not live_timestamps:
+            return
+        self.live_last_ts[test_relation_id] = last_ts
+
+        message = {
+            "relation_id": test_relation_id,
+            "channels": channels,
+            "timestamps": live_timestamps,
+            "values": live_values,
+        }
+        self.mqtt.publish(f"{LIVE_TOPIC_PREFIX}/{test_relation_id}", json.dumps(message), qos=0)
+
     # =========================
     # DEAD LETTER
     # =========================
@@ -214,19 +342,30 @@ class MQTTWorker:
                 self.dead_letter(sensor_name, payload)
                 continue
 
-            # Flatten arrays into (timestamp, channel, value) tuples
-            for i, ts in enumerate(timestamps):
-                try:
-                    sample_values = values[i]
-                except IndexError:
-                    continue
-
-                for ch_idx, ch in enumerate(channels):
+            # Split the payload into one column per channel, buffered as
+            # (timestamp, test_relation_id, channel, value) tuples
+            for ch_idx, ch in enumerate(channels):
+                column_ts = []
+                column_values = []
+                for ts, sample_values in zip(timestamps, values):
                     try:
                         val = float(sample_values[ch_idx])
                     except (IndexError, ValueError, TypeError):
                         continue
-                    self.buffer.append((ts, test_relation_id, ch, val))
+                    column_ts.append(ts)
+                    column_values.append(val)
+
+                if not column_values:
+                    continue
+                self.buffer.extend(zip(column_ts, repeat(test_relation_id), repeat(ch), column_values))
+
+                if self.detectors:
+                    self.detect_anomalies(test_relation_id, ch, column_ts, column_values)
+
+            try:
+                self.publish_live(test_relation_id, timestamps, values, channels)
+            except Exception as e:
+                print("[ERROR] Live publish:", e)
 
             if len(self.buffer) >= MAX_BUFFER_SIZE:
                 await self.flush_buffer()